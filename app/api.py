@@ -0,0 +1,182 @@
+# app/api.py
+"""
+HTTP service for ingestion, retrieval and test-case generation.
+
+    uvicorn api:app --workers 4 --port 8000      (from the app/ directory)
+
+Each worker process opens one VectorDBClient (and its embedder) at startup.
+Chroma, embedding and LLM calls are blocking, so they run on a per-process
+thread pool and the event loop keeps serving other requests meanwhile.
+
+    POST /ingest/bulk?source=docs   NDJSON body, one {"id", "content", "metadata"} per line
+    POST /retrieve                  {"queries": [...], "top_k": 3, "where": {...}}
+    POST /generate                  {"stories": [{"key": ..., "text": ...}], "concurrency": 4}
+    GET  /metrics                   Prometheus text
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from batch_generate import generate_batch, summarize
+from metrics import METRICS
+from utils import clean_metadata
+from vector_db import VectorDBClient
+
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./vector_store")
+# Threads per worker process for blocking Chroma / embedding / LLM calls
+API_THREADS = int(os.getenv("API_THREADS", "8"))
+# Lines listed individually in a bulk-ingest response; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+class RetrieveRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    top_k: int = Field(3, ge=1, le=100)
+    where: Optional[Dict[str, Any]] = None
+    hybrid: bool = True
+
+
+class Story(BaseModel):
+    key: str
+    text: str
+
+
+class GenerateRequest(BaseModel):
+    stories: List[Story] = Field(..., min_length=1)
+    concurrency: int = Field(4, ge=1, le=32)
+
+
+def _parse_line(line: bytes, lineno: int):
+    """(doc_id, content, metadata) for one NDJSON record; ValueError names the problem."""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e.msg}")
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    content = record.get("content")
+    if not isinstance(content, str) or not content:
+        raise ValueError("missing 'content'")
+    doc_id = record.get("id") or f"line-{lineno}"
+    metadata = record.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("'metadata' must be an object")
+    return str(doc_id), content, clean_metadata(metadata)
+
+
+def create_app(db: VectorDBClient = None, generator=None, threads: int = API_THREADS) -> FastAPI:
+    """
+    Build the service. `db` and `generator` default to a store at
+    VECTOR_STORE_PATH and an Azure-backed TestCaseGenerator, created once
+    per process on startup.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api")
+        app.state.db = db or VectorDBClient(path=VECTOR_STORE_PATH)
+        app.state.generator = generator
+        try:
+            yield
+        finally:
+            app.state.pool.shutdown(wait=True)
+
+    app = FastAPI(title="Test case generation service", lifespan=lifespan)
+
+    async def _blocking(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(app.state.pool, fn, *args)
+
+    def _generator():
+        if app.state.generator is None:
+            from test_case_generator import TestCaseGenerator
+            app.state.generator = TestCaseGenerator(app.state.db)
+        return app.state.generator
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "documents": await _blocking(app.state.db.count)}
+
+    @app.post("/ingest/bulk")
+    async def ingest_bulk(request: Request, source: str = "api", upsert: bool = False):
+        """
+        Stream an NDJSON body into batched writes. The body is parsed as it
+        arrives; while one batch is embedded and written on the pool the next
+        one is being read, and at most one write is in flight.
+        """
+        db = app.state.db
+        write = db.upsert_documents if upsert else db.add_documents
+        received, written, failed, errors = 0, 0, 0, []
+        batch, pending = [], None
+        buffer, lineno = b"", 0
+
+        async def _flush():
+            nonlocal pending, batch, written
+            if pending is not None:
+                written += await pending
+                pending = None
+            if batch:
+                pending = asyncio.ensure_future(_blocking(write, source, batch))
+                batch = []
+
+        def _take(line: bytes):
+            nonlocal received, failed, lineno
+            lineno += 1
+            if not line.strip():
+                return
+            received += 1
+            try:
+                batch.append(_parse_line(line, lineno))
+            except ValueError as e:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": lineno, "error": str(e)})
+
+        try:
+            async for part in request.stream():
+                buffer += part
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    _take(line)
+                if len(batch) >= db.batch_size:
+                    await _flush()
+            _take(buffer)
+            await _flush()  # start the last batch
+            await _flush()  # and wait for it
+        finally:
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+        return {"received": received, "written": written, "failed": failed, "errors": errors}
+
+    @app.post("/retrieve")
+    async def retrieve(body: RetrieveRequest):
+        """Run every query concurrently on the pool; results keep the request order."""
+        search = app.state.db.hybrid_query if body.hybrid else app.state.db.query
+        results = await asyncio.gather(*(_blocking(search, q, body.top_k, body.where) for q in body.queries))
+        return {"results": [{"query": q, "documents": docs} for q, docs in zip(body.queries, results)]}
+
+    @app.post("/generate")
+    async def generate(body: GenerateRequest):
+        try:
+            generator = await _blocking(_generator)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"LLM unavailable: {e}")
+        # Runs on the shared API thread pool, so concurrent requests never add threads
+        records = await generate_batch(generator, [s.model_dump() for s in body.stories],
+                                       concurrency=min(body.concurrency, threads), executor=app.state.pool)
+        return {"records": records, "summary": summarize(records)}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return METRICS.to_prometheus()
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,212 @@
+# app/batch_generate.py
+"""
+Generate test cases for many Jira stories at once.
+
+    python batch_generate.py --jql "project=TEST AND sprint in openSprints()" --out cases.jsonl
+    python batch_generate.py --keys TEST-1 TEST-2 --out cases.xlsx --concurrency 4 --rate 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from sources.jira import iter_jira_issues
+
+# Stories between rewrites of an .xlsx output file
+EXCEL_FLUSH_EVERY = int(os.getenv("BATCH_EXCEL_FLUSH_EVERY", "10"))
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def story_from_issue(issue: dict) -> dict:
+    fields = issue.get("fields", {})
+    description = fields.get("description") or ""
+    if not isinstance(description, str):
+        description = json.dumps(description, ensure_ascii=False)
+    return {"key": issue.get("key"), "text": f"{fields.get('summary', '')}\n{description}".strip()}
+
+
+def fetch_stories(keys: Iterable[str] = None, jql: str = None) -> List[dict]:
+    if keys:
+        jql = f"key in ({', '.join(keys)})"
+    if not jql:
+        raise ValueError("Provide issue keys or a JQL query")
+    return [story_from_issue(issue) for issue in iter_jira_issues(jql)]
+
+
+class JsonlResultWriter:
+    """Appends one JSON line per story and flushes, so partial runs keep their output."""
+
+    def __init__(self, path: str):
+        self._fh = open(path, "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class ExcelResultWriter:
+    """
+    One row per test case. An .xlsx file cannot be appended to, so the sheet is
+    rewritten (to a temporary file, then moved into place) every `flush_every`
+    stories and on close; a crash loses at most that many stories. Use the
+    JSONL writer to keep every story as soon as it completes.
+    """
+
+    def __init__(self, path: str, flush_every: int = EXCEL_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.rows = []
+        self._unflushed = 0
+
+    def write(self, record: dict):
+        cases = record.get("test_cases")
+        if not isinstance(cases, list):
+            cases = [{"error": record.get("error") or cases}]
+        for case in cases:
+            row = {"story": record["key"], "latency_s": record["latency_s"]}
+            row.update({k: v if isinstance(v, (str, int, float)) else json.dumps(v, ensure_ascii=False)
+                        for k, v in (case.items() if isinstance(case, dict) else {"test_case": case}.items())})
+            self.rows.append(row)
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        import pandas as pd
+        root, ext = os.path.splitext(self.path)
+        tmp = f"{root}.tmp{ext}"
+        pd.DataFrame(self.rows).to_excel(tmp, index=False, sheet_name="TestCases")
+        os.replace(tmp, self.path)
+        self._unflushed = 0
+
+    def close(self):
+        if self._unflushed or not os.path.exists(self.path):
+            self.flush()
+
+
+def make_writer(path: str):
+    return ExcelResultWriter(path) if path.lower().endswith(".xlsx") else JsonlResultWriter(path)
+
+
+async def generate_batch(generator, stories: List[dict], writer=None,
+                         concurrency: int = 4, rate: float = 0.0, burst: int = 1,
+                         executor: Executor = None) -> List[dict]:
+    """
+    Run retrieval + LLM generation for each story with at most `concurrency` in flight
+    and at most `rate` LLM starts per second (0 disables the limiter).
+    Each record is handed to `writer` as soon as its story completes.
+    Generation runs on `executor` when given (a long-lived service pool, left
+    open); otherwise on a pool of `concurrency` threads made for this batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate, burst)
+    # TestCaseGenerator is synchronous; give it one thread per concurrent story
+    pool = executor or ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    records = []
+
+    async def _one(story):
+        async with semaphore:
+            await bucket.acquire()
+            started = time.perf_counter()
+            record = {"key": story["key"]}
+            try:
+                record["test_cases"] = await loop.run_in_executor(pool, generator.generate_test_cases, story["text"])
+            except Exception as e:
+                record["error"] = str(e)
+            record["latency_s"] = round(time.perf_counter() - started, 3)
+        records.append(record)
+        if writer:
+            writer.write(record)
+        return record
+
+    try:
+        await asyncio.gather(*(_one(story) for story in stories))
+    finally:
+        if executor is None:
+            pool.shutdown(wait=False)
+    return records
+
+
+def summarize(records: List[dict]) -> dict:
+    latencies = sorted(r["latency_s"] for r in records)
+    if not latencies:
+        return {"stories": 0, "failed": 0}
+    p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+    return {
+        "stories": len(records),
+        "failed": sum(1 for r in records if "error" in r),
+        "latency_p50_s": round(statistics.median(latencies), 3),
+        "latency_p95_s": p95,
+        "latency_max_s": latencies[-1],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch test-case generation for Jira stories")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--keys", nargs="+", help="Jira issue keys")
+    source.add_argument("--jql", help="JQL query selecting the stories")
+    parser.add_argument("--out", required=True, help="Output .jsonl or .xlsx path")
+    parser.add_argument("--concurrency", type=int, default=4, help="Stories generated at once")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max LLM calls per second (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=1, help="Token bucket capacity")
+    args = parser.parse_args(argv)
+
+    from vector_db import VectorDBClient
+    from test_case_generator import TestCaseGenerator
+
+    stories = fetch_stories(keys=args.keys, jql=args.jql)
+    generator = TestCaseGenerator(VectorDBClient())
+    writer = make_writer(args.out)
+    try:
+        records = asyncio.run(generate_batch(generator, stories, writer,
+                                             concurrency=args.concurrency, rate=args.rate, burst=args.burst))
+    finally:
+        writer.close()
+
+    for record in records:
+        if "error" in record:
+            status = f"error: {record['error']}"
+        elif isinstance(record["test_cases"], list):
+            status = f"{len(record['test_cases'])} cases"
+        else:
+            status = "unparsed output"
+        print(f"{record['key']}: {status} in {record['latency_s']}s")
+    print(json.dumps(summarize(records)))
+
+
+if __name__ == "__main__":
+    main()
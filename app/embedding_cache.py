@@ -0,0 +1,121 @@
+# app/embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils import embedding_functions
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# SQLite caps the number of bound parameters per statement
+_SQL_CHUNK = 500
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys; whitespace runs do not change the tokens the model sees."""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def embedding_key(text: str, model_id: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Wraps an embedding function with a persistent, content-addressed vector cache.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by sha256(model id + normalized text),
+    so identical text is embedded once across processes and restarts. The table is kept
+    under `max_entries` by evicting the least recently used rows.
+    """
+
+    def __init__(self, inner: EmbeddingFunction = None, path: str = "./embedding_cache.db",
+                 model_id: str = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.inner = inner or embedding_functions.DefaultEmbeddingFunction()
+        self.model_id = model_id or self._default_model_id(self.inner)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            vec BLOB NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _default_model_id(inner) -> str:
+        name = inner.name() if hasattr(inner, "name") else type(inner).__name__
+        model = getattr(inner, "model_name", None) or getattr(inner, "MODEL_NAME", None)
+        return f"{name}:{model}" if model else str(name)
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        keys = [embedding_key(text, self.model_id) for text in input]
+        found = self._lookup(set(keys))
+
+        # Embed each distinct missing text once, in a single call
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, input):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            vectors = self.inner(list(missing.values()))
+            fresh = {key: np.asarray(vec, dtype=np.float32) for key, vec in zip(missing, vectors)}
+            self._store(fresh)
+            found.update(fresh)
+
+        return [found[key] for key in keys]
+
+    # ---------------- Storage ----------------
+    def _lookup(self, keys) -> Dict[str, np.ndarray]:
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock, self._conn:
+            for start in range(0, len(keys), _SQL_CHUNK):
+                part = keys[start:start + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                self._conn.execute(f"UPDATE embeddings SET last_used=? WHERE key IN ({marks})", [now, *part])
+        return found
+
+    def _store(self, vectors: Dict[str, np.ndarray]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, last_used) VALUES (?, ?, ?)",
+                [(key, vec.tobytes(), now) for key, vec in vectors.items()],
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (overflow,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,35 @@
+# app/fake_embedding.py
+import hashlib
+from chromadb.api.types import EmbeddingFunction
+
+
+class FakeEmbeddingFunction(EmbeddingFunction):
+    """
+    Deterministic, offline embedder for tests and benchmarks: a hash of each
+    text spread over `dim` floats. Counts calls and texts embedded.
+    """
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        self.texts += len(input)
+        vectors = []
+        for text in input:
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=32).digest()
+            vectors.append([(digest[i % 32] + 1) / 257.0 for i in range(self.dim)])
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "fake"
+
+    def get_config(self):
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config):
+        return FakeEmbeddingFunction(**config)
@@ -1,40 +1,269 @@
 import sqlite3
 import os
+import json
 import hashlib
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "hashstore.db")
 
+# SQLite caps the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+
+class HashStore:
+    """
+    Key -> content-hash store backed by one long-lived SQLite connection (WAL mode).
+
+    An optional in-memory LRU of key -> hash sits in front of SQLite, so re-syncs
+    where most keys are unchanged mostly never touch the database. It is dropped
+    whenever another connection (a job worker, the API) has written to the file.
+    """
+
+    def __init__(self, path: str = DB_PATH, cache_size: int = 100_000):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS hashes (
+            key TEXT PRIMARY KEY,
+            hash TEXT,
+            meta TEXT
+        )
+        """)
+        self._conn.commit()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ---------------- Memory front ----------------
+    def _sync_cache(self):
+        """Drop the memory front if another connection committed since. Caller holds the lock."""
+        # data_version changes only for commits made through other connections
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._cache.clear()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        if not self.cache_size:
+            return None
+        h = self._cache.get(key)
+        if h is not None:
+            self._cache.move_to_end(key)
+        return h
+
+    def _cache_put(self, key: str, hash_val: str):
+        if not self.cache_size:
+            return
+        self._cache[key] = hash_val
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def warm(self, prefix: str = None) -> int:
+        """Preload up to `cache_size` stored hashes (optionally by key prefix) in one scan."""
+        if not self.cache_size:
+            return 0
+        with self._lock:
+            self._sync_cache()
+            if prefix:
+                rows = self._conn.execute(
+                    "SELECT key, hash FROM hashes WHERE key >= ? AND key < ? LIMIT ?",
+                    (prefix, prefix + "\uffff", self.cache_size))
+            else:
+                rows = self._conn.execute("SELECT key, hash FROM hashes LIMIT ?", (self.cache_size,))
+            n = 0
+            for key, h in rows:
+                self._cache_put(key, h)
+                n += 1
+            return n
+
+    # ---------------- Single-key API ----------------
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, hash_val: str, meta: str = None):
+        self.set_many([(key, hash_val, meta)])
+
+    def is_changed(self, key: str, content: str, meta: str = None) -> bool:
+        return self.is_changed_many([(key, content, meta)])[0]
+
+    # ---------------- Batch API ----------------
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return stored hashes for the given keys; unknown keys are omitted."""
+        found, missing = {}, []
+        with self._lock:
+            self._sync_cache()
+            for key in keys:
+                h = self._cache_get(key)
+                if h is not None:
+                    found[key] = h
+                else:
+                    missing.append(key)
+            for start in range(0, len(missing), _SQL_CHUNK):
+                part = missing[start:start + _SQL_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, hash FROM hashes WHERE key IN ({','.join('?' * len(part))})", part)
+                for key, h in rows:
+                    found[key] = h
+                    self._cache_put(key, h)
+        return found
+
+    def set_many(self, items: Iterable[Tuple[str, str, Optional[str]]]):
+        """Upsert (key, hash, meta) rows in a single transaction."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("""
+            INSERT INTO hashes (key, hash, meta) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET hash=excluded.hash, meta=excluded.meta
+            """, items)
+            for key, h, _ in items:
+                self._cache_put(key, h)
+
+    def check_many(self, items: Iterable[Tuple[str, str, Optional[str]]]) -> List[Optional[Tuple[str, str, Optional[str]]]]:
+        """
+        Check (key, content, meta) tuples against stored hashes without writing.
+        Returns, per item, the (key, hash, meta) row to `record_many` once the
+        content is stored, or None if it is unchanged (or repeats an earlier item).
+        """
+        items = [(key, compute_hash(content), meta) for key, content, meta in items]
+        stored = self.get_many(key for key, _, _ in items)
+        rows = []
+        for key, h, meta in items:
+            if stored.get(key) == h:
+                rows.append(None)
+            else:
+                stored[key] = h
+                rows.append((key, h, meta))
+        return rows
+
+    def record_many(self, rows: Iterable[Optional[Tuple[str, str, Optional[str]]]]):
+        """Store rows returned by `check_many`; None entries are ignored."""
+        self.set_many(row for row in rows if row is not None)
+
+    def is_changed_many(self, items: Iterable[Tuple[str, str, Optional[str]]]) -> List[bool]:
+        """
+        Check (key, content, meta) tuples against stored hashes and record the
+        changed ones right away; returns one flag per item.
+        """
+        rows = self.check_many(items)
+        self.record_many(rows)
+        return [row is not None for row in rows]
+
+    # ---------------- File fingerprints ----------------
+    def changed_files(self, paths: Iterable[str], force: bool = False,
+                      present: Callable[[List[str]], set] = None) -> Dict[str, dict]:
+        """
+        Fingerprints of the files that are new or changed since `record_file`.
+        A file whose size and mtime match its stored fingerprint is unchanged
+        without being read; otherwise its content hash decides, and a file that
+        was only touched gets its new mtime stored here.
+        With `present` (chunk ids -> the subset still stored), an unchanged file
+        whose recorded chunks were deleted since is returned as changed too.
+        Each fingerprint carries `previous`: the stored one, or None.
+        force=True returns every existing file.
+        """
+        stats = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[file_key(path)] = (path, st.st_size, st.st_mtime_ns)
+        stored = self._rows(list(stats))
+        changed, touched, unchanged = {}, [], []
+        for key, (path, size, mtime_ns) in stats.items():
+            old_hash, old_meta = stored.get(key, (None, None))
+            previous = json.loads(old_meta) if old_meta else None
+            fingerprint = {"key": key, "hash": old_hash, "size": size, "mtime_ns": mtime_ns,
+                           "previous": previous}
+            if not force and previous and previous.get("size") == size and previous.get("mtime_ns") == mtime_ns:
+                unchanged.append((path, fingerprint))
+                continue
+            fingerprint["hash"] = file_content_hash(path)
+            if not force and previous and old_hash == fingerprint["hash"]:
+                touched.append(_fingerprint_row(fingerprint, previous.get("chunks", [])))
+                unchanged.append((path, fingerprint))
+            else:
+                changed[path] = fingerprint
+        self.set_many(touched)
+        if present is not None and unchanged:
+            have = present([i for _, fp in unchanged for i in fp["previous"].get("chunks", [])])
+            for path, fingerprint in unchanged:
+                if not have.issuperset(fingerprint["previous"].get("chunks", [])):
+                    changed[path] = fingerprint
+        return changed
+
+    def record_file(self, fingerprint: dict, chunks: List[str]):
+        """Store a file's fingerprint with the ids its chunks were stored under."""
+        self.set_many([_fingerprint_row(fingerprint, chunks)])
+
+    def _rows(self, keys: List[str]) -> Dict[str, Tuple[str, str]]:
+        """key -> (hash, meta), read from SQLite (the memory front holds hashes only)."""
+        rows = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_CHUNK):
+                part = keys[start:start + _SQL_CHUNK]
+                for key, h, meta in self._conn.execute(
+                        f"SELECT key, hash, meta FROM hashes WHERE key IN ({','.join('?' * len(part))})", part):
+                    rows[key] = (h, meta)
+        return rows
+
+    # ---------------- Content membership ----------------
+    @staticmethod
+    def content_key(content: Any) -> str:
+        if isinstance(content, str):
+            return compute_hash(content)
+        return compute_hash(json.dumps(content, sort_keys=True, ensure_ascii=False, default=str))
+
+    def is_new(self, content: Any) -> bool:
+        """True if this exact content has not been added before."""
+        key = self.content_key(content)
+        return key not in self.get_many([key])
+
+    def add(self, content: Any, meta: str = None):
+        key = self.content_key(content)
+        self.set(key, key, meta)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_store: Optional[HashStore] = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> HashStore:
+    """Process-wide store on DB_PATH, opened (and its memory front warmed) on first use."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = HashStore(DB_PATH)
+            _default_store.warm()
+        return _default_store
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS hashes (
-        key TEXT PRIMARY KEY,
-        hash TEXT,
-        meta TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    get_store()
 
 def get_hash(key: str) -> Optional[str]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT hash FROM hashes WHERE key=?", (key,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else None
+    return get_store().get(key)
 
 def set_hash(key: str, hash_val: str, meta: str = None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    INSERT INTO hashes (key, hash, meta) VALUES (?, ?, ?)
-    ON CONFLICT(key) DO UPDATE SET hash=excluded.hash, meta=excluded.meta
-    """, (key, hash_val, meta))
-    conn.commit()
-    conn.close()
+    get_store().set(key, hash_val, meta)
 
 # -------------------------------
 # ✅ Missing helper functions
@@ -43,15 +272,41 @@ def compute_hash(content: str) -> str:
     """Return a stable hash for given content."""
     return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
+def file_key(path: str) -> str:
+    return f"file::{os.path.abspath(path)}"
+
+def file_content_hash(path: str, block_size: int = 1 << 20) -> str:
+    """blake2b of the file's bytes, read in blocks."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _fingerprint_row(fingerprint: dict, chunks: List[str]) -> Tuple[str, str, str]:
+    meta = {"size": fingerprint["size"], "mtime_ns": fingerprint["mtime_ns"], "chunks": chunks}
+    return fingerprint["key"], fingerprint["hash"], json.dumps(meta)
+
+def changed_files(paths: Iterable[str], force: bool = False,
+                  present: Callable[[List[str]], set] = None) -> Dict[str, dict]:
+    return get_store().changed_files(paths, force=force, present=present)
+
+def record_file(fingerprint: dict, chunks: List[str]):
+    get_store().record_file(fingerprint, chunks)
+
 def is_changed(key: str, content: str, meta: str = None) -> bool:
     """
     Check if content for a given key has changed compared to stored hash.
     Updates the DB if changed.
     """
-    new_hash = compute_hash(content)
-    old_hash = get_hash(key)
+    return get_store().is_changed(key, content, meta)
+
+def is_changed_many(items: Iterable[Tuple[str, str, Optional[str]]]) -> List[bool]:
+    """Batch form of `is_changed` over (key, content, meta) tuples."""
+    return get_store().is_changed_many(items)
+
+def check_many(items: Iterable[Tuple[str, str, Optional[str]]]) -> List[Optional[Tuple[str, str, Optional[str]]]]:
+    return get_store().check_many(items)
 
-    if old_hash != new_hash:
-        set_hash(key, new_hash, meta)
-        return True
-    return False
+def record_many(rows: Iterable[Optional[Tuple[str, str, Optional[str]]]]):
+    get_store().record_many(rows)
@@ -1,21 +1,24 @@
 import json
 import os
-from sources.jira import fetch_jira_issues
-from sources.documents import load_documents
+from datetime import datetime, timezone
+from sources.jira import iter_jira_issues, incremental_jql, parse_jira_datetime
+from sources.documents import list_files, load_documents, load_files, web_chunk_id
+from sources.http_cache import CrawlCache
 from sources.ui_crawl import load_ui_crawl
-from vector_db import VectorDBClient
-from ingest_utils import ingest_artifact
+from vector_db import VectorDBClient, store_id
+from ingest_utils import ingest_artifacts
+from hashstore import changed_files, get_hash, record_file, set_hash
 from utils import clean_metadata
-from metadata_utils import prepare_artifact_and_metadata_for_ingest
-from fastapi import FastAPI, Request
 from parse_playwright import parse_playwright_code
+from metrics import METRICS
 
 
 db = VectorDBClient()
 jql_query = "project=TEST ORDER BY created DESC"
-
-# app = FastAPI()
-# db = VectorDBClient()
+# Processes used to parse local documents (PDF/DOCX parsing is CPU bound)
+DOCUMENT_PARSE_WORKERS = int(os.getenv("DOCUMENT_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Conditional-GET cache for website re-crawls, relative to the store directory
+WEB_CACHE_FILE = os.getenv("WEB_CACHE_FILE", "http_cache.db")
 
 JSON_FLOW_DIR = r"./app/saved_flows"
 os.makedirs(JSON_FLOW_DIR, exist_ok=True)
@@ -51,21 +54,43 @@ def ingest_playwright_flow(code: str, flow_name: str, db_client: VectorDBClient)
     doc_id = f"playwright_{abs(hash(flow_name))}"
 
     # Ingest into Vector DB
-    db_client.add_document(
-        source="ui_flow",
-        doc_id=doc_id,
-        content=json.dumps(artifact),
-        metadata=metadata
-    )
+    db_client.add_documents("ui_flow", [(doc_id, json.dumps(artifact), metadata)])
 
     print(f"✅ Flow '{flow_name}' ingested successfully (doc_id={doc_id})")
     return doc_id, json_path
 
 
 
-def ingest_jira(jql_query):
-    stories = fetch_jira_issues(jql_query)
-    results = []
+def ingest_jira(jql_query, incremental: bool = False):
+    """
+    Stream issues for a JQL query into the vector DB.
+    Every run records the newest `updated` timestamp seen for this JQL in the
+    hashstore; with incremental=True only issues changed since then are fetched.
+    """
+    watermark_key = f"jira-watermark::{jql_query}"
+    query = jql_query
+    since = get_hash(watermark_key) if incremental else None
+    if since:
+        query = incremental_jql(jql_query, datetime.fromisoformat(since))
+
+    newest = []
+
+    def _track_updated(stories):
+        for story in stories:
+            updated = story.get("fields", {}).get("updated")
+            if updated:
+                ts = parse_jira_datetime(updated)
+                if not newest or ts > newest[0]:
+                    newest[:] = [ts]
+            yield story
+
+    stories = _track_updated(iter_jira_issues(query))
+    results = [r["id"] for r in ingest_artifacts("jira", _jira_artifacts(stories))]
+    if newest:
+        set_hash(watermark_key, newest[0].astimezone(timezone.utc).isoformat())
+    return results
+
+def _jira_artifacts(stories):
     for story in stories:
         key = story.get("key")
         fields = story.get("fields", {})
@@ -80,32 +105,88 @@ def ingest_jira(jql_query):
             "project": project_key
         })
         content = f"{summary}\n{description}"
-        ingest_artifact("jira", {"id": key, "content": content}, metadata, provided_id=key)
-        results.append(key)
-    return results
+        yield {"id": key, "content": content}, metadata, key
+
+def _report_near_duplicates(near_dups, source: str):
+    """Persist a run's near-duplicate sketches once its chunks are stored, and count the skips."""
+    if near_dups is None:
+        return
+    near_dups.commit()
+    if near_dups.skipped:
+        METRICS.incr("near_duplicates_skipped", near_dups.skipped)
+        print(f"⏭️ Skipped {near_dups.skipped} near-duplicate {source} chunks")
+
+def _forget_deleted_pages(cache: CrawlCache):
+    """
+    Pages none of whose chunks are stored any more (deleted since the last
+    crawl) are dropped from the crawl cache, so the crawl restores them.
+    """
+    chunk_ids = {url: [store_id("website", web_chunk_id(url, i)) for i in range(n)]
+                 for url, n in cache.chunk_counts().items()}
+    present = db.existing_ids([i for ids in chunk_ids.values() for i in ids])
+    gone = [url for url, ids in chunk_ids.items() if present.isdisjoint(ids)]
+    if gone:
+        cache.forget(gone)
 
-def ingest_web_site(base_url: str, max_depth: int = 1, max_pages: int = 50):
+def ingest_web_site(base_url: str, max_depth: int = 1, max_pages: int = 50, force: bool = False,
+                    crawl_stats: dict = None):
+    """
+    Crawl and store a site. Pages that answer 304, or whose body hash matches
+    the last crawl, are not extracted, chunked or embedded, unless their
+    chunks were deleted from the store since; a changed page's chunks are
+    overwritten. force=True re-ingests every page. `crawl_stats` is filled
+    with the crawl's page counts.
+    """
     docs = []
-    for doc_id, content, metadata in load_documents(
-        base_url,
-        crawl_depth=max_depth,
-        max_pages=max_pages
-    ):
-        # ✅ Add artifact type + source
-        metadata.update({
-            "artifact_type": "website_doc",
-            "source": "website",
-            "url": base_url,
-        })
+    near_dups = db.near_duplicate_filter()
+    cache = CrawlCache(os.path.join(db.path, WEB_CACHE_FILE))
+    stats = crawl_stats if crawl_stats is not None else {}
+    chunk_counts = {}
 
-        db.add_document(
-            source="website",
-            doc_id=doc_id,
-            content=content,
-            metadata=metadata
-        )
-        docs.append({"id": doc_id, "content": content, "metadata": metadata})
+    def _chunks():
+        for doc_id, content, metadata in load_documents(
+            base_url,
+            crawl_depth=max_depth,
+            max_pages=max_pages,
+            http_cache=cache,
+            revalidate=not force,
+            crawl_stats=stats,
+        ):
+            page = metadata["url"]
+            chunk_counts[page] = chunk_counts.get(page, 0) + 1
+            # Repeated page templates and navigation are not embedded twice
+            if near_dups and near_dups.duplicate_of(store_id("website", doc_id), content):
+                continue
+            # ✅ Add artifact type + source
+            metadata.update({
+                "artifact_type": "website_doc",
+                "source": "website",
+                "url": base_url,
+            })
+            docs.append({"id": doc_id, "content": content, "metadata": metadata})
+            yield doc_id, content, metadata
 
+    try:
+        if not force:
+            _forget_deleted_pages(cache)
+        # Pages reaching here are new or changed, so their chunks replace the stored ones
+        db.upsert_documents("website", _chunks())
+        # A page that shrank leaves chunks past its new count behind, and a
+        # chunk now skipped as a near-duplicate still holds its old content
+        stale = [store_id("website", web_chunk_id(url, i))
+                 for url, entry in cache.staged.items() if entry["changed"]
+                 for i in range(chunk_counts.get(url, 0), entry["previous_chunks"])]
+        stale += near_dups.skipped_ids if near_dups else []
+        if stale:
+            db.delete_where(ids=stale)
+        _report_near_duplicates(near_dups, "website")
+        cache.commit(chunk_counts)
+    finally:
+        cache.close()
+    for key in ("fetched", "not_modified", "unchanged", "changed"):
+        METRICS.incr(f"pages_{key}", stats.get(key, 0))
+    print(f"🌐 Crawl: {stats.get('fetched', 0)} fetched, {stats.get('not_modified', 0)} not modified, "
+          f"{stats.get('unchanged', 0)} unchanged, {stats.get('changed', 0)} changed")
     return docs
 
 def flatten_metadata(meta: dict) -> dict:
@@ -124,30 +205,97 @@ def flatten_metadata(meta: dict) -> dict:
     return flat
 
 
-def ingest_document(file_path: str):
+def ingest_document(file_path: str, workers: int = DOCUMENT_PARSE_WORKERS, force: bool = False):
+    """Ingest a file, or every file under a directory, parsing in `workers` processes."""
+    return ingest_documents(list_files(file_path), workers=workers, force=force)
+
+def ingest_documents(file_paths, workers: int = DOCUMENT_PARSE_WORKERS, force: bool = False, on_file=None):
+    """
+    Ingest several files in one pass, parsing them in `workers` processes.
+    Files whose fingerprint (size, mtime, content hash) matches the last ingest
+    are skipped without parsing, unless their chunks were deleted from the
+    store since; a changed file's previous chunks are replaced.
+    force=True re-ingests every file. `on_file(path, chunks)` is called for
+    each file once its chunks are stored (or it was found unchanged).
+    """
+    file_paths = list(file_paths)
+    changed = changed_files(file_paths, force=force, present=db.existing_ids)
+    unchanged = len(file_paths) - len(changed)
+    if unchanged:
+        METRICS.incr("files_unchanged", unchanged)
+        print(f"⏭️ Skipped {unchanged} unchanged file(s)")
+        if on_file:
+            for path in file_paths:
+                if path not in changed:
+                    on_file(path, 0)
+    if not changed:
+        return []
+
+    # Chunk ids are scoped to their file; ids recorded by older versions (not
+    # file-scoped, and possibly shared with other files) are left in place
+    stale = [i for path, fp in changed.items() if fp["previous"]
+             for i in fp["previous"].get("chunks", []) if i.startswith(store_id("document", f"{path}::"))]
+    if stale:
+        db.delete_where(ids=stale)
+
+    by_file = {}
+    written = set()
+    loaded = []  # files read to the end whose last chunks may still be in an unwritten batch
+
+    def _settle(ids=()):
+        written.update(ids)
+        for path in [p for p in loaded if written.issuperset(by_file.get(p, ()))]:
+            loaded.remove(path)
+            # Only files that produced chunks are recorded, so a failed parse is retried next time
+            if path in by_file:
+                record_file(changed[path], list(dict.fromkeys(by_file[path])))
+            if on_file:
+                on_file(path, len(by_file.get(path, ())))
+
+    def _loaded(path):
+        loaded.append(path)
+        _settle()
+
+    chunks = load_files(list(changed), workers=workers, on_file=_loaded)
+    return _ingest_document_chunks(chunks, by_file, on_written=_settle)
+
+def _ingest_document_chunks(chunks, by_file=None, on_written=None):
+    """
+    Embed and store chunks; with `by_file`, collect the stored ids per source
+    file. `on_written` gets the ids of each batch once it is stored.
+    """
     docs = []
-    for doc_id, chunk, metadata in load_documents(file_path):
-        artifact, meta, new_doc_id = prepare_artifact_and_metadata_for_ingest(chunk, metadata)
-        final_doc_id = new_doc_id if new_doc_id else doc_id
+    near_dups = db.near_duplicate_filter()
 
-        safe_meta = flatten_metadata(meta)
+    def _chunks():
+        for doc_id, chunk, metadata in chunks:
+            # The loader's id (file, page, chunk) keeps chunks of different files apart
+            ids = by_file.setdefault(metadata.get("file"), []) if by_file is not None else None
+            # Sketch the chunk text itself; repeated headers and exports are not embedded twice
+            if near_dups and near_dups.duplicate_of(store_id("document", doc_id), chunk):
+                continue
+            if ids is not None:
+                ids.append(store_id("document", doc_id))
 
-        db.add_document(
-            source="document",
-            doc_id=final_doc_id,
-            content=json.dumps(artifact, ensure_ascii=False),
-            metadata=safe_meta
-        )
+            # The chunk text is what gets embedded and indexed; the loader's
+            # file and span fields stay top-level so they can be filtered on
+            safe_meta = flatten_metadata({**metadata, "artifact_type": "document", "source": "document"})
 
-        docs.append((final_doc_id, chunk))
+            docs.append((doc_id, chunk))
+            yield doc_id, chunk, safe_meta
+
+    # End-to-end wall time over load, parse, chunk, embed and write; items give chunks/s
+    with METRICS.timer("ingest_documents") as ctx:
+        db.add_documents("document", _chunks(), on_written=on_written)
+        ctx["items"] = len(docs)
+    _report_near_duplicates(near_dups, "document")
     return docs
 
 def ingest_ui_crawl(path: str):
     data = load_ui_crawl(path)
-    results = []
-    for entry in data:
-        metadata = {"type": "ui", "flow": entry["flow"]}
-        ingest_artifact("ui_crawl", entry, metadata, provided_id=entry["id"])
-        results.append(entry["id"])
-    return results
+    artifacts = (
+        (entry, {"type": "ui", "flow": entry["flow"]}, entry["id"])
+        for entry in data
+    )
+    return [r["id"] for r in ingest_artifacts("ui_crawl", artifacts)]
 
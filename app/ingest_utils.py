@@ -1,6 +1,9 @@
 # app/ingest_utils.py
+from itertools import islice
+from typing import Iterable, List, Tuple
 from vector_db import VectorDBClient
-from hashstore import compute_hash, is_changed
+from hashstore import check_many, compute_hash, record_many
+from metrics import METRICS
 
 db = VectorDBClient()
 
@@ -8,12 +11,39 @@ def ingest_artifact(source_type: str, content_obj: dict, metadata: dict, provide
     """
     Generic ingestion helper. Handles hashing, deduplication, and storage in VectorDB.
     """
-    # Use provided_id if available, else derive from hash
-    doc_id = provided_id or compute_hash(str(content_obj))
-    content_str = str(content_obj)
+    return ingest_artifacts(source_type, [(content_obj, metadata, provided_id)])[0]
 
-    if not is_changed(doc_id, content_str):
-        return {"id": doc_id, "status": "skipped"}
+def ingest_artifacts(source_type: str, artifacts: Iterable[Tuple[dict, dict, str]]) -> List[dict]:
+    """
+    Bulk variant of `ingest_artifact` for (content_obj, metadata, provided_id) tuples.
+    Unchanged artifacts are skipped; changed ones are streamed into batched upserts.
+    """
+    results = []
+    it = iter(artifacts)
+    # Hashes are checked one chunk at a time and recorded only once that chunk
+    # is written, so a failed write leaves its artifacts to be retried
+    while True:
+        chunk = []
+        for content_obj, metadata, provided_id in islice(it, db.batch_size):
+            content_str = str(content_obj)
+            # Use provided_id if available, else derive from hash
+            doc_id = provided_id or compute_hash(content_str)
+            chunk.append((doc_id, content_str, metadata))
+        if not chunk:
+            return results
+
+        rows = check_many((doc_id, content_str, None) for doc_id, content_str, _ in chunk)
+        changed = []
+        for (doc_id, content_str, metadata), row in zip(chunk, rows):
+            if row is None:
+                METRICS.incr("artifacts_skipped")
+                results.append({"id": doc_id, "status": "skipped"})
+                continue
+
+            METRICS.incr("artifacts_updated")
+            results.append({"id": doc_id, "status": "updated"})
+            changed.append((doc_id, content_str, metadata))
 
-    db.add_document(source_type, doc_id, content_str, metadata)
-    return {"id": doc_id, "status": "updated"}
+        if changed:
+            db.upsert_documents(source_type, changed)
+            record_many(rows)
@@ -0,0 +1,411 @@
+# app/jobs.py
+"""
+Persistent ingestion job queue.
+
+Handlers in the Streamlit app `submit()` a job and return at once; worker
+processes claim jobs from a SQLite table, run the ingest and report progress
+there. A job whose worker stops heartbeating is claimed again and resumes
+from its last checkpoint.
+
+    python jobs.py worker --workers 2
+"""
+import argparse
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from metrics import METRICS, Metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv("JOB_DB_PATH", os.path.join(os.path.dirname(__file__), "jobs.db"))
+# One worker by default so ingests never contend on the store's SQLite files
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "2"))
+# A running job without a heartbeat for this long is considered orphaned and re-claimed
+STALE_AFTER_SECONDS = float(os.getenv("JOB_STALE_AFTER_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+ACTIVE = ("queued", "running")
+
+
+class JobQueue:
+    """SQLite job table shared by the app and the worker processes."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            items INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            steps_done INTEGER NOT NULL DEFAULT 0,
+            steps_total INTEGER,
+            rate REAL,
+            checkpoint TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created REAL NOT NULL,
+            started REAL,
+            heartbeat REAL,
+            finished REAL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS worker_metrics (
+            worker TEXT PRIMARY KEY,
+            raw TEXT NOT NULL,
+            updated REAL NOT NULL
+        )
+        """)
+
+    # ---------------- Submit / read ----------------
+    def submit(self, kind: str, params: dict) -> int:
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO jobs (kind, params, created) VALUES (?, ?, ?)",
+                (kind, json.dumps(params, ensure_ascii=False), time.time())).lastrowid
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def list_jobs(self, limit: int = 20, statuses: Optional[List[str]] = None) -> List[dict]:
+        sql, args = "SELECT * FROM jobs", []
+        if statuses:
+            sql += f" WHERE status IN ({','.join('?' * len(statuses))})"
+            args += list(statuses)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id DESC LIMIT ?", args + [limit]).fetchall()
+        return [_job(r) for r in rows]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status='cancelled', finished=? WHERE id=? AND status='queued'",
+                (time.time(), job_id))
+        return cur.rowcount == 1
+
+    # ---------------- Worker side ----------------
+    def claim(self, worker: str, stale_after: float = STALE_AFTER_SECONDS) -> Optional[dict]:
+        """
+        Atomically take the oldest queued job, or a running one whose worker
+        went quiet for `stale_after` seconds (it keeps its checkpoint).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Orphans that already used every attempt are failed instead of retried forever
+                self._conn.execute(
+                    "UPDATE jobs SET status='failed', error=coalesce(error, 'worker lost'), finished=? "
+                    "WHERE status='running' AND heartbeat < ? AND attempts >= ?",
+                    (now, now - stale_after, MAX_ATTEMPTS))
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status='queued' OR (status='running' AND heartbeat < ?) "
+                    "ORDER BY id LIMIT 1", (now - stale_after,)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status='running', worker=?, started=coalesce(started, ?), heartbeat=?, "
+                    "attempts=attempts+1, error=NULL WHERE id=?", (worker, now, now, row["id"]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: int, worker: str, **progress) -> bool:
+        """
+        Record liveness plus any of items / skipped / steps_done / steps_total /
+        rate / checkpoint. False means the job is no longer this worker's.
+        """
+        fields = {k: v for k, v in progress.items() if v is not None}
+        if "checkpoint" in fields:
+            fields["checkpoint"] = json.dumps(fields["checkpoint"], ensure_ascii=False)
+        assignments = "".join(f", {k}=?" for k in fields)
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE jobs SET heartbeat=?{assignments} WHERE id=? AND worker=? AND status='running'",
+                [time.time(), *fields.values(), job_id, worker])
+        return cur.rowcount == 1
+
+    def finish(self, job_id: int, worker: str, result: dict = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, finished=? WHERE id=? AND worker=?",
+                ("failed" if error else "done", json.dumps(result, ensure_ascii=False, default=str),
+                 error, time.time(), job_id, worker))
+
+    # ---------------- Worker metrics ----------------
+    def merge_metrics(self, worker: str, raw: dict):
+        """Fold a worker's drained `Metrics` observations into its stored totals."""
+        if not raw["stages"] and not raw["counters"]:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT raw FROM worker_metrics WHERE worker=?", (worker,)).fetchone()
+                totals = Metrics()
+                if row:
+                    totals.merge(json.loads(row["raw"]))
+                totals.merge(raw)
+                self._conn.execute("INSERT OR REPLACE INTO worker_metrics (worker, raw, updated) VALUES (?, ?, ?)",
+                                   (worker, json.dumps(totals.export()), time.time()))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def worker_metrics(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT raw FROM worker_metrics").fetchall()
+        return [json.loads(r["raw"]) for r in rows]
+
+    def clear_metrics(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM worker_metrics")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    for key in ("params", "checkpoint", "result"):
+        job[key] = json.loads(job[key]) if job[key] else ({} if key != "result" else None)
+    return job
+
+
+# ---------------- Handlers ----------------
+class JobContext:
+    """What a handler sees: the checkpoint to resume from and a way to save progress."""
+
+    def __init__(self, queue: JobQueue, job: dict, worker: str):
+        self.queue = queue
+        self.job_id = job["id"]
+        self.worker = worker
+        self.checkpoint: dict = job["checkpoint"] or {}
+        self.steps_total: Optional[int] = None
+        self.steps_done = job["steps_done"]
+
+    def step(self, checkpoint: dict = None, total: int = None):
+        """Mark one unit of work finished and persist the resume point."""
+        self.steps_done += 1
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        self.steps_total = total if total is not None else self.steps_total
+        self.queue.heartbeat(self.job_id, self.worker, steps_done=self.steps_done,
+                             steps_total=self.steps_total, checkpoint=self.checkpoint)
+
+
+def _run_jira(params: dict, ctx: JobContext) -> dict:
+    # Re-running is cheap: unchanged issues are skipped by their stored hash
+    from ingest import ingest_jira
+    return {"issues": len(ingest_jira(params["jql"], incremental=params.get("incremental", False)))}
+
+
+def _run_website(params: dict, ctx: JobContext) -> dict:
+    # Re-running after a restart re-crawls; pages already stored answer from the crawl cache
+    from ingest import ingest_web_site
+    stats = {}
+    chunks = ingest_web_site(params["url"], params.get("max_depth", 1), params.get("max_pages", 50),
+                             force=params.get("force", False), crawl_stats=stats)
+    return {"chunks": len(chunks), "pages": stats}
+
+
+def _run_documents(params: dict, ctx: JobContext) -> dict:
+    """Files are ingested in one pass; each file is checkpointed once stored and skipped on resume."""
+    from ingest import ingest_documents
+    paths = params["paths"]
+    done = set(ctx.checkpoint.get("done", []))
+    todo = [p for p in paths if p not in done]
+    chunks = ctx.checkpoint.get("chunks", 0)
+
+    def _file_done(path, stored):
+        nonlocal chunks
+        chunks += stored
+        done.add(path)
+        ctx.step({"done": sorted(done), "chunks": chunks}, total=len(paths))
+
+    if todo:
+        ingest_documents(todo, workers=params.get("workers", 1), on_file=_file_done)
+    return {"files": len(paths), "chunks": chunks}
+
+
+def _run_ui_crawl(params: dict, ctx: JobContext) -> dict:
+    from ingest import ingest_ui_crawl
+    return {"flows": len(ingest_ui_crawl(params["path"]))}
+
+
+def _run_lexical_index(params: dict, ctx: JobContext) -> dict:
+    # Re-running after a restart starts the scan over; the index is cleared first
+    import ingest
+    return {"documents": ingest.db.rebuild_lexical_index()}
+
+
+def _run_legacy_stamp(params: dict, ctx: JobContext) -> dict:
+    # Re-running after a restart rescans; the store is marked done only at the end
+    import ingest
+    return {"documents": ingest.db.stamp_legacy_documents()}
+
+
+def _run_playwright(params: dict, ctx: JobContext) -> dict:
+    import ingest
+    doc_id, json_path = ingest.ingest_playwright_flow(params["code"], params["flow_name"], ingest.db)
+    return {"doc_id": doc_id, "json_path": json_path}
+
+
+HANDLERS: Dict[str, Callable[[dict, JobContext], dict]] = {
+    "jira": _run_jira,
+    "website": _run_website,
+    "documents": _run_documents,
+    "ui_crawl": _run_ui_crawl,
+    "playwright": _run_playwright,
+    "lexical_index": _run_lexical_index,
+    "legacy_stamp": _run_legacy_stamp,
+}
+
+
+# ---------------- Workers ----------------
+def run_job(queue: JobQueue, job: dict, worker: str, heartbeat_seconds: float = HEARTBEAT_SECONDS):
+    """
+    Run one claimed job, heartbeating until it ends. Each beat drains this
+    process's metrics into the queue; chunks written and artifacts or
+    near-duplicate chunks skipped in the drained delta are the job's progress.
+    """
+    ctx = JobContext(queue, job, worker)
+    queue.merge_metrics(worker, METRICS.drain())  # anything recorded before this job
+    items, skipped = job["items"], job["skipped"]  # carried over from an earlier attempt
+    written = 0
+    started = time.monotonic()
+    stop = threading.Event()
+    beat_lock = threading.Lock()
+
+    def _beat():
+        nonlocal items, skipped, written
+        with beat_lock:
+            raw = METRICS.drain()
+            store = raw["stages"].get("store_write")
+            written += store[2] if store else 0
+            skipped += int(raw["counters"].get("artifacts_skipped", 0)
+                           + raw["counters"].get("near_duplicates_skipped", 0))
+            elapsed = time.monotonic() - started
+            queue.heartbeat(ctx.job_id, worker, items=items + written, skipped=skipped,
+                            rate=round(written / elapsed, 2) if elapsed > 0 else None)
+            queue.merge_metrics(worker, raw)
+
+    def _beat_loop():
+        while not stop.wait(heartbeat_seconds):
+            _beat()
+
+    beater = threading.Thread(target=_beat_loop, name=f"job-{ctx.job_id}-heartbeat", daemon=True)
+    beater.start()
+    result, error = None, None
+    try:
+        result = HANDLERS[job["kind"]](job["params"], ctx)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", ctx.job_id, job["kind"])
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        beater.join()
+        _beat()
+        queue.finish(ctx.job_id, worker, result, error)
+
+
+def run_worker(path: str = DEFAULT_PATH, poll: float = 1.0, stop: Optional[threading.Event] = None,
+               once: bool = False):
+    """Claim and run jobs until `stop` is set (or the queue is empty, with once=True)."""
+    worker = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    queue = JobQueue(path)
+    try:
+        while not (stop and stop.is_set()):
+            job = queue.claim(worker)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll)
+                continue
+            run_job(queue, job, worker)
+    finally:
+        queue.close()
+
+
+def start_workers(n: int = JOB_WORKERS, path: str = DEFAULT_PATH) -> List[multiprocessing.Process]:
+    """
+    Start `n` worker processes. Spawned (not forked) so they do not inherit
+    the caller's threads or open SQLite handles. They are not daemonic, since
+    a document job starts its own parser processes, and are terminated when
+    the caller exits; a job cut short is resumed by the next worker.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    for i in range(n):
+        proc = ctx.Process(target=run_worker, args=(path,), name=f"ingest-worker-{i}")
+        proc.start()
+        procs.append(proc)
+    if procs:
+        atexit.register(_terminate, procs)
+    return procs
+
+
+def _terminate(procs: List[multiprocessing.Process]):
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in procs:
+        proc.join(timeout=5)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingestion job workers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("worker", help="Run workers in the foreground")
+    work.add_argument("--workers", type=int, default=JOB_WORKERS)
+    work.add_argument("--db", default=DEFAULT_PATH)
+    status = sub.add_parser("status", help="Print recent jobs")
+    status.add_argument("--db", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for job in JobQueue(args.db).list_jobs():
+            print(json.dumps({k: job[k] for k in ("id", "kind", "status", "items", "skipped", "steps_done",
+                                                   "steps_total", "rate", "error")}))
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    procs = start_workers(args.workers, args.db)
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
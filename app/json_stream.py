@@ -0,0 +1,70 @@
+# app/json_stream.py
+import json
+from typing import Any, Iterable, Iterator, List
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON array arriving in arbitrary text chunks.
+
+    Anything before the first `[` (prose, code fences) is ignored. Each top-level
+    element is decoded and returned by `feed` as soon as its closing brace arrives,
+    so a truncated response still yields every element completed before the cut.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self.errors = 0
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Any]:
+        items = []
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                self.started = ch == "["
+                continue
+            if self._depth == 0:
+                # Between elements: only an opening bracket or the closing `]` matters
+                if ch in "{[":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self.done = True
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads("".join(self._buf)))
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                    self._buf = []
+        return items
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Yield array elements from a stream of text chunks as each one completes."""
+    parser = JSONArrayStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
@@ -0,0 +1,171 @@
+# app/lexical_index.py
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# Words, plus identifiers such as TEST-123, invoice_number or v1.2 kept whole
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[-_.][A-Za-z0-9]+)*")
+_SQL_CHUNK = 500
+# Postings scored per query term, highest term frequency first; bounds the cost of common terms
+MAX_POSTINGS_PER_TERM = int(os.getenv("LEXICAL_MAX_POSTINGS_PER_TERM", "2000"))
+# Dropped from queries (they stay indexed, so exact lookups still see them)
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have i if in into is it its my no not of on
+or our should so than that the their then this to was we were when will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; compound identifiers are indexed whole and by their parts."""
+    tokens = []
+    for match in _TOKEN.finditer(text or ""):
+        token = match.group(0).lower()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_.]", token) if part)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index kept next to the Chroma collection in SQLite.
+    Postings reference integer document keys and are updated per document,
+    so adds, upserts and deletes stay incremental.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._stats = None
+        self._stats_version = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS docs (
+            doc INTEGER PRIMARY KEY,
+            id TEXT UNIQUE NOT NULL,
+            length INTEGER NOT NULL
+        )
+        """)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS postings (
+            term TEXT NOT NULL,
+            doc INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (term, doc)
+        ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc)")
+        # Lets search read a term's highest-tf postings without sorting all of them
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term_tf ON postings(term, tf)")
+        self._conn.commit()
+
+    # ---------------- Writes ----------------
+    def upsert_many(self, docs: Iterable[Tuple[str, str]], replace: bool = True):
+        """Index (id, text) pairs in one transaction; replace=False leaves existing ids alone."""
+        with self._lock, self._conn:
+            for doc_id, text in docs:
+                row = self._conn.execute("SELECT doc FROM docs WHERE id=?", (doc_id,)).fetchone()
+                if row and not replace:
+                    continue
+                if row:
+                    self._conn.execute("DELETE FROM postings WHERE doc=?", (row[0],))
+                    self._conn.execute("DELETE FROM docs WHERE doc=?", (row[0],))
+                tokens = tokenize(text)
+                doc = self._conn.execute(
+                    "INSERT INTO docs (id, length) VALUES (?, ?)", (doc_id, len(tokens))).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                    [(term, doc, tf) for term, tf in Counter(tokens).items()])
+            self._stats = None
+
+    def delete(self, ids: List[str]):
+        with self._lock, self._conn:
+            for start in range(0, len(ids), _SQL_CHUNK):
+                part = ids[start:start + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                self._conn.execute(
+                    f"DELETE FROM postings WHERE doc IN (SELECT doc FROM docs WHERE id IN ({marks}))", part)
+                self._conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", part)
+            self._stats = None
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._stats = None
+
+    # ---------------- Reads ----------------
+    def __len__(self) -> int:
+        with self._lock:
+            return self._collection_stats()[0]
+
+    def _collection_stats(self) -> Tuple[int, float]:
+        # data_version changes when another connection (e.g. a job worker) commits to the file
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._stats is None or self._stats_version != data_version:
+            n, avgdl = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            self._stats = (n, avgdl or 0.0)
+            self._stats_version = data_version
+        return self._stats
+
+    def search(self, query: str, top_k: int = 10,
+               max_postings: int = MAX_POSTINGS_PER_TERM) -> List[Tuple[str, float]]:
+        """
+        Return up to top_k (id, bm25 score) pairs, best first. Stopwords are
+        ignored unless the query has nothing else, and each term scores at most
+        `max_postings` documents (those where it is most frequent).
+        """
+        terms = set(tokenize(query))
+        terms = (terms - STOPWORDS) or terms
+        if not terms:
+            return []
+        with self._lock:
+            n, avgdl = self._collection_stats()
+            if not n:
+                return []
+            scores: Dict[int, float] = {}
+            for term in terms:
+                df = self._conn.execute("SELECT COUNT(*) FROM postings WHERE term=?", (term,)).fetchone()[0]
+                if not df:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                postings = self._conn.execute(
+                    "SELECT p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.doc = p.doc "
+                    "WHERE p.term=? ORDER BY p.tf DESC LIMIT ?", (term, max_postings))
+                for doc, tf, length in postings:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+            best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+            ids = dict(self._conn.execute(
+                f"SELECT doc, id FROM docs WHERE doc IN ({','.join('?' * len(best))})",
+                [doc for doc, _ in best]).fetchall()) if best else {}
+        return [(ids[doc], score) for doc, score in best]
+
+    def lookup(self, token: str, limit: int = 10) -> List[str]:
+        """Ids of documents containing an exact token (e.g. a Jira key), shortest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id FROM postings p JOIN docs d ON d.doc = p.doc WHERE p.term=? "
+                "ORDER BY d.length LIMIT ?", (token.lower(), limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum(1 / (k + rank)), best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,185 @@
+# app/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, Optional
+
+DEFAULT_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.db"))
+DEFAULT_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+def make_cache_key(**parts) -> str:
+    """Stable sha256 over the JSON encoding of the named key parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of LLM completions with TTL and size eviction.
+
+    `get_or_compute` and `stream_or_compute` also coalesce concurrent identical
+    requests in this process: the first caller runs the LLM call, the others wait
+    for and share its result.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl_seconds and now - created > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (overflow,))
+
+    def _claim(self, key: str):
+        """(future, leader): the first caller for a key leads, later ones wait on its future."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def _release(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def get_or_compute(self, key: str, compute: Callable[[], str],
+                       cacheable: Callable[[str], bool] = None) -> str:
+        """
+        Cached value for `key`, else compute it once for every concurrent caller.
+        A computed value is stored only if `cacheable(value)` holds (default: always),
+        so a truncated or unparseable completion is not replayed.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        future, leader = self._claim(key)
+        if not leader:
+            self.hits += 1
+            return future.result()
+
+        try:
+            # Another leader may have stored the value between our miss and the claim
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    def stream_or_compute(self, key: str, stream: Callable[[], Iterator[str]],
+                          cacheable: Callable[[str], bool] = None) -> Iterator[str]:
+        """
+        Streaming form of `get_or_compute`, yielding text pieces. A cached value is
+        replayed as one piece; the leader's pieces are yielded as they arrive and
+        its finished text is stored and handed to waiting callers in one piece.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            yield cached
+            return
+
+        future, leader = self._claim(key)
+        if not leader:
+            self.hits += 1
+            yield future.result()
+            return
+
+        try:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                future.set_result(value)
+                yield value
+                return
+            self.misses += 1
+            parts = []
+            for part in stream():
+                parts.append(part)
+                yield part
+            value = "".join(parts)
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            future.set_result(value)
+        except BaseException as e:
+            if not future.done():
+                # A consumer that stops reading early leaves the waiters without a result
+                future.set_exception(RuntimeError("the leading stream stopped before it finished")
+                                     if isinstance(e, GeneratorExit) else e)
+            raise
+        finally:
+            self._release(key)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMResponseCache:
+    """Process-wide cache, so single-flight spans every session of the app."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
@@ -3,7 +3,8 @@ import json
 import hashlib
 import time
 import uuid
-from typing import Any, Dict, Tuple, List, Set
+from json.encoder import encode_basestring as _encode_json_string
+from typing import Any, Dict, Iterator, Tuple, List, Set
 
 DEFAULT_SENSITIVE_SELECTORS = {"password", "token", "secret", "card", "ssn"}
 
@@ -31,22 +32,105 @@ def sanitize_events(events: List[Dict], custom_sensitive: Set[str] = None) -> Tu
         sanitized.append(ev_copy)
     return sanitized, sorted(list(masked))
 
+_CANONICAL_JSON = json.JSONEncoder(sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+# Lists with at least this many items (and dicts holding one) are hashed piece by piece;
+# anything smaller is cleaned and encoded in one json.dumps call.
+_STREAM_MIN_ITEMS = 64
+# Encoded text is handed to the hash in pieces of about this many characters
+_HASH_BUFFER_CHARS = 1 << 16
+
+
+def _clean_for_hash(x):
+    """Drop None / "" dict values recursively (tuples are left as they are)."""
+    if isinstance(x, dict):
+        return {k: _clean_for_hash(v) for k, v in sorted(x.items()) if v is not None and v != ""}
+    if isinstance(x, list):
+        return [_clean_for_hash(i) for i in x]
+    return x
+
+
 def canonicalize_for_hash(obj: Any) -> str:
-    def _clean(x):
-        if isinstance(x, dict):
-            return {k: _clean(v) for k, v in sorted(x.items()) if v is not None and v != ""}
-        if isinstance(x, list):
-            return [_clean(i) for i in x]
-        return x
-    cleaned = _clean(obj)
-    return json.dumps(cleaned, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return _CANONICAL_JSON.encode(_clean_for_hash(obj))
 
 def compute_sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-def generate_stable_flow_id(flow_name: str, canonical_json: str, shorten: int = 8) -> str:
+
+def _streamable(x) -> bool:
+    if isinstance(x, list):
+        items = x
+    elif isinstance(x, dict):
+        items = x.values()
+    else:
+        return False
+    return len(x) >= _STREAM_MIN_ITEMS or any(
+        isinstance(i, (list, dict)) and _streamable(i) for i in items)
+
+
+def _json_key(k) -> str:
+    # json.dumps turns int/float/bool/None keys into their JSON text
+    if isinstance(k, str):
+        return _encode_json_string(k)
+    if k is None or isinstance(k, (int, float)):
+        return _encode_json_string(json.dumps(k))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(k).__name__}")
+
+
+def _iter_canonical(x) -> Iterator[str]:
+    """The text of `canonicalize_for_hash(x)`, in pieces, without building it whole."""
+    if not _streamable(x):
+        yield _CANONICAL_JSON.encode(_clean_for_hash(x))
+    elif isinstance(x, dict):
+        sep = "{"
+        for k, v in sorted(x.items()):
+            if v is not None and v != "":
+                yield sep + _json_key(k) + ":"
+                yield from _iter_canonical(v)
+                sep = ","
+        yield "}" if sep == "," else "{}"
+    else:
+        # Runs of small items are encoded together, brackets stripped
+        sep, run = "[", []
+        for item in x:
+            large = _streamable(item)
+            if not large:
+                run.append(_clean_for_hash(item))
+                if len(run) < _STREAM_MIN_ITEMS:
+                    continue
+            if run:
+                yield sep + _CANONICAL_JSON.encode(run)[1:-1]
+                sep, run = ",", []
+            if large:
+                yield sep
+                yield from _iter_canonical(item)
+                sep = ","
+        if run:
+            yield sep + _CANONICAL_JSON.encode(run)[1:-1]
+            sep = ","
+        yield "]" if sep == "," else "[]"
+
+
+def canonical_sha256(obj: Any) -> str:
+    """
+    Same digest as `compute_sha256(canonicalize_for_hash(obj))`, streamed into
+    the hash so a long flow is never held as one cleaned copy, string and bytes.
+    """
+    h = hashlib.sha256()
+    parts, size = [], 0
+    for part in _iter_canonical(obj):
+        parts.append(part)
+        size += len(part)
+        if size >= _HASH_BUFFER_CHARS:
+            h.update("".join(parts).encode("utf-8"))
+            parts, size = [], 0
+    h.update("".join(parts).encode("utf-8"))
+    return h.hexdigest()
+
+def generate_stable_flow_id(flow_name: str, canonical_json: str = None, shorten: int = 8,
+                            digest: str = None) -> str:
+    """`digest` is the canonical hash when already known; otherwise `canonical_json` is hashed."""
     if flow_name:
-        h = compute_sha256(canonical_json)
+        h = digest or compute_sha256(canonical_json)
         return f"flow::{flow_name}::{h[:shorten]}"
     return f"flow::unnamed::{uuid.uuid4().hex[:shorten]}"
 
@@ -94,9 +178,8 @@ def prepare_artifact_and_metadata_for_ingest(raw_events: List[Dict],
         "url": None,
         "meta": {"recorded_by": user}
     }
-    canonical_json = canonicalize_for_hash(artifact)
-    h = compute_sha256(canonical_json)
-    doc_id = generate_stable_flow_id(flow_name or "unnamed", canonical_json)
+    h = canonical_sha256(artifact)
+    doc_id = generate_stable_flow_id(flow_name or "unnamed", digest=h)
     metadata = build_metadata(
         source_type=source_type,
         origin=origin,
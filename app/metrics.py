@@ -0,0 +1,153 @@
+# app/metrics.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Recent samples kept per stage for percentiles; totals cover the whole process lifetime
+DEFAULT_WINDOW = 2048
+
+
+class _Stage:
+    __slots__ = ("count", "seconds", "items", "samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.samples = deque(maxlen=window)
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+class Metrics:
+    """
+    In-process stage timings and counters.
+
+        with METRICS.timer("embed", items=len(batch)):
+            ...
+        METRICS.incr("artifacts_skipped")
+
+    A timer records its duration and how many items it handled, so a snapshot
+    gives p50/p95 per call and items per second of busy time.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _Stage] = {}
+        self._counters: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float, items: int = 0):
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = _Stage(self.window)
+            s.count += 1
+            s.seconds += seconds
+            s.items += items
+            s.samples.append(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 0) -> Iterator[dict]:
+        """Time a block; set `ctx["items"]` inside when the count is only known at the end."""
+        ctx = {"items": items}
+        started = time.perf_counter()
+        try:
+            yield ctx
+        finally:
+            self.observe(stage, time.perf_counter() - started, ctx["items"])
+
+    def incr(self, name: str, n: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def export(self) -> dict:
+        """Raw observations that `merge` can fold into another registry."""
+        with self._lock:
+            return {
+                "stages": {name: (s.count, s.seconds, s.items, list(s.samples)) for name, s in self._stages.items()},
+                "counters": dict(self._counters),
+            }
+
+    def drain(self) -> dict:
+        """`export` and clear, e.g. to ship observations from a worker process."""
+        with self._lock:
+            raw = {
+                "stages": {name: (s.count, s.seconds, s.items, list(s.samples)) for name, s in self._stages.items()},
+                "counters": dict(self._counters),
+            }
+            self._stages.clear()
+            self._counters.clear()
+        return raw
+
+    def merge(self, raw: dict):
+        """Fold in observations from `drain()`."""
+        with self._lock:
+            for name, (count, seconds, items, samples) in raw.get("stages", {}).items():
+                s = self._stages.get(name)
+                if s is None:
+                    s = self._stages[name] = _Stage(self.window)
+                s.count += count
+                s.seconds += seconds
+                s.items += items
+                s.samples.extend(samples)
+            for name, value in raw.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: (s.count, s.seconds, s.items, sorted(s.samples)) for name, s in self._stages.items()}
+            counters = dict(self._counters)
+        return {
+            "stages": {
+                name: {
+                    "count": count,
+                    "total_s": round(total, 6),
+                    "p50_s": round(_percentile(samples, 0.50), 6),
+                    "p95_s": round(_percentile(samples, 0.95), 6),
+                    "max_s": round(samples[-1], 6) if samples else 0.0,
+                    "items": items,
+                    "items_per_s": round(items / total, 2) if items and total else None,
+                }
+                for name, (count, total, items, samples) in sorted(stages.items())
+            },
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def to_prometheus(self, prefix: str = "testgen") -> str:
+        """Prometheus text exposition: one summary per stage plus plain counters."""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, s in snap["stages"].items():
+            label = f'stage="{name}"'
+            lines += [
+                f'{prefix}_stage_seconds{{{label},quantile="0.5"}} {s["p50_s"]}',
+                f'{prefix}_stage_seconds{{{label},quantile="0.95"}} {s["p95_s"]}',
+                f"{prefix}_stage_seconds_sum{{{label}}} {s['total_s']}",
+                f"{prefix}_stage_seconds_count{{{label}}} {s['count']}",
+            ]
+        lines += [f"# HELP {prefix}_stage_items_total Items handled per stage.",
+                  f"# TYPE {prefix}_stage_items_total counter"]
+        lines += [f'{prefix}_stage_items_total{{stage="{name}"}} {s["items"]}' for name, s in snap["stages"].items()]
+        for name, value in snap["counters"].items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every instrumented module
+METRICS = Metrics()
+
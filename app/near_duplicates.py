@@ -0,0 +1,209 @@
+# app/near_duplicates.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Estimated Jaccard similarity (of word 3-gram sets) at or above which a chunk is a near-duplicate
+DEFAULT_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+# 16 bands x 8 rows: pairs at 0.85 share a band with p > 0.99, pairs below ~0.6 rarely do
+BANDS = 16
+_ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240601)  # fixed: signatures are persisted
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+_WORD = re.compile(r"\w+")
+_SQL_CHUNK = 500
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32) of the text's lower-cased word 3-grams."""
+    words = _WORD.findall((text or "").lower())
+    if len(words) <= SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a*x stays below 2**63, so uint64 arithmetic does not wrap
+    return ((x[:, None] * _A + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit key per LSH band; the band number is part of the key."""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * _ROWS:(band + 1) * _ROWS].tobytes(),
+                                 digest_size=8, person=band.to_bytes(2, "little")).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: the share of equal signature slots."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    Persisted MinHash LSH index of stored chunks, kept next to the Chroma
+    collection in SQLite. Chunks are matched on their text, so ingestion can
+    skip one that nearly repeats something already stored; the skipped id is
+    recorded as a link to the kept one.
+    """
+
+    def __init__(self, path: str, threshold: float = DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS docs (
+            doc INTEGER PRIMARY KEY,
+            id TEXT UNIQUE NOT NULL,
+            sig BLOB NOT NULL
+        )
+        """)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS bands (
+            key INTEGER NOT NULL,
+            doc INTEGER NOT NULL,
+            PRIMARY KEY (key, doc)
+        ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_doc ON bands(doc)")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS links (
+            id TEXT PRIMARY KEY,
+            kept TEXT NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_links_kept ON links(kept)")
+        self._conn.commit()
+
+    # ---------------- Reads ----------------
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def find(self, sig: np.ndarray, keys: List[int] = None, exclude: str = None) -> Optional[Tuple[str, float]]:
+        """Most similar stored (id, similarity) at or above the threshold, other than `exclude`, else None."""
+        keys = keys or band_keys(sig)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT d.id, d.sig FROM bands b JOIN docs d ON d.doc = b.doc "
+                f"WHERE b.key IN ({','.join('?' * len(keys))})", keys).fetchall()
+        best = None
+        for doc_id, blob in rows:
+            if doc_id == exclude:
+                continue
+            score = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (doc_id, score)
+        return best
+
+    def links(self, kept: str) -> List[str]:
+        """Ids that were skipped as near-duplicates of `kept`."""
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT id FROM links WHERE kept=?", (kept,))]
+
+    # ---------------- Writes ----------------
+    def add_many(self, docs: Iterable[Tuple[str, np.ndarray]], links: Iterable[Tuple[str, str]] = ()):
+        """
+        Index (id, signature) pairs and record (skipped id, kept id) links, in one
+        transaction. An id indexed again has its signature replaced; a skipped id
+        loses the signature it was stored with.
+        """
+        links = list(links)
+        with self._lock, self._conn:
+            for doc_id, sig in docs:
+                self._drop(doc_id)
+                doc = self._conn.execute("INSERT INTO docs (id, sig) VALUES (?, ?)",
+                                         (doc_id, sig.tobytes())).lastrowid
+                self._conn.executemany("INSERT OR IGNORE INTO bands (key, doc) VALUES (?, ?)",
+                                       [(key, doc) for key in band_keys(sig)])
+                self._conn.execute("DELETE FROM links WHERE id=?", (doc_id,))
+            for doc_id, _ in links:
+                self._drop(doc_id)
+            self._conn.executemany("INSERT OR REPLACE INTO links (id, kept) VALUES (?, ?)", links)
+
+    def _drop(self, doc_id: str):
+        """Remove one id's signature and bands. Caller holds the lock and the transaction."""
+        row = self._conn.execute("SELECT doc FROM docs WHERE id=?", (doc_id,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM bands WHERE doc=?", (row[0],))
+            self._conn.execute("DELETE FROM docs WHERE doc=?", (row[0],))
+
+    def delete(self, ids: List[str]):
+        with self._lock, self._conn:
+            for start in range(0, len(ids), _SQL_CHUNK):
+                part = ids[start:start + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                self._conn.execute(
+                    f"DELETE FROM bands WHERE doc IN (SELECT doc FROM docs WHERE id IN ({marks}))", part)
+                self._conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", part)
+                self._conn.execute(f"DELETE FROM links WHERE id IN ({marks}) OR kept IN ({marks})", part + part)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("DELETE FROM links")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class NearDuplicateFilter:
+    """
+    One ingest run against an index: each chunk is checked against the index
+    and against chunks kept earlier in the run. Nothing is persisted until
+    `commit()`, which callers run once the kept chunks are stored.
+    """
+
+    def __init__(self, index: NearDuplicateIndex):
+        self.index = index
+        self.skipped = 0
+        self._kept: List[Tuple[str, np.ndarray]] = []
+        self._links: List[Tuple[str, str]] = []
+        self._bands: Dict[int, List[int]] = {}  # band key -> positions in _kept
+
+    def duplicate_of(self, doc_id: str, text: str) -> Optional[str]:
+        """Id of the chunk `text` nearly repeats (and record the link), or None to keep it."""
+        sig = minhash(text)
+        keys = band_keys(sig)
+        # A chunk re-ingested under its own id is compared with everything but its old version
+        match = self.index.find(sig, keys, exclude=doc_id)
+        best, score = match if match else (None, 0.0)
+        for pos in {p for key in keys for p in self._bands.get(key, ())}:
+            kept_id, kept_sig = self._kept[pos]
+            s = similarity(sig, kept_sig)
+            if kept_id != doc_id and s >= self.index.threshold and s > score:
+                best, score = kept_id, s
+        if best is not None:
+            self.skipped += 1
+            self._links.append((doc_id, best))
+            return best
+        for key in keys:
+            self._bands.setdefault(key, []).append(len(self._kept))
+        self._kept.append((doc_id, sig))
+        return None
+
+    @property
+    def skipped_ids(self) -> List[str]:
+        """Ids skipped in this run; an upserting caller deletes whatever they held before."""
+        return [doc_id for doc_id, _ in self._links]
+
+    def commit(self):
+        self.index.add_many(self._kept, self._links)
+        self._kept, self._links, self._bands = [], [], {}
@@ -1,46 +1,283 @@
 import re
+from typing import List, Optional, Tuple
 
-# Regex patterns to capture Playwright actions
-ACTION_PATTERNS = {
-    "goto": re.compile(r'page\.goto\(["\'](.*?)["\']\)'),
-    "click": re.compile(r'page\.(getByRole|getByText|getByLabel|getByTitle|locator)\(.*?\)\.click\(\)'),
-    "fill": re.compile(r'page\.(getByRole|getByLabel|getByTitle|locator)\(.*?\)\.fill\(["\'].*?["\']\)'),
-    "select_option": re.compile(r'page\.(getByRole|getByLabel|locator)\(.*?\)\.selectOption\(["\'].*?["\']\)'),
+_QSTR = r"""'[^'\\\n]*(?:\\.[^'\\\n]*)*'|"[^"\\\n]*(?:\\.[^"\\\n]*)*\""""
+_STR = rf"""{_QSTR}|`[^`\\]*(?:\\.[^`\\]*)*`"""
+# Tokenizer; whitespace and comments are skipped, so chains split across lines
+# (prettier-formatted codegen) read as one expression.
+_SKIP = re.compile(r"(?:\s+|//[^\n]*|/\*.*?\*/)*", re.DOTALL)
+_TOKEN = re.compile(rf"""
+    (?P<str>{_STR})
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<num>\d+(?:\.\d+)?)
+  | (?P<punct>=>|[^\s\w])
+""", re.VERBOSE | re.DOTALL)
+# A `/` right after one of these starts a regex literal, e.g. getByText(/save/i)
+_REGEX_LITERAL = re.compile(r"/(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*")
+_REGEX_PREV = {"(", ",", "=", ":", "[", "!", "&", "|", "?", "{", "}", ";", "=>"}
+
+# Fast path: a goto or a locator-chain action written on one line, with plain
+# quoted strings and at most one level of {} / [] in its arguments (what codegen
+# emits). Anything else (multiline chains, nested calls, regex literals,
+# page-level actions, expect) falls through to the tokenizer.
+_PLAIN = r"""[^'"`()/\n{}\[\]]*"""
+_INNER = rf"{_PLAIN}(?:(?:{_QSTR}){_PLAIN})*"
+_ARGS = rf"{_PLAIN}(?:(?:{_QSTR}|\{{{_INNER}\}}|\[{_INNER}\]){_PLAIN})*"
+_FAST = rf"""
+    (?P<goto>(?:await[ \t]+)?page\d*\.goto\([ \t]*(?P<url>{_QSTR})(?:[ \t]*,{_ARGS})?[ \t]*\))
+  | (?P<sel>(?:await[ \t]+)?page\d*(?:\.[A-Za-z_$][\w$]*\({_ARGS}\))+)
+    \.(?P<action>click|fill|selectOption|press|check|uncheck)\((?P<args>{_ARGS})\)
+"""
+# The chain must end there: no member, call or comment may follow, even on the next line
+_END = r"(?!\s*(?:[.(\[]|/[/*]))"
+
+# Where statements start: `page.`, `page1.` ... (popups) or `expect(`. Strings and
+# comments are stepped over whole; a head not taken by the fast path is parsed
+# by the tokenizer. The leading lookahead lets the scan skip other characters cheaply.
+_HEAD = re.compile(rf"""
+    (?=[/'"`ape])
+    (?:   //[^\n]*|/\*.*?\*/|{_STR}
+        | (?<![\w$.])(?:(?P<fast>{_FAST}){_END}|(?P<head>(?:await\s+)?(?:page\d*\s*\.|expect\s*\()))
+    )
+""", re.VERBOSE | re.DOTALL)
+_QSTR_ONLY = re.compile(rf"\s*({_QSTR})\s*")
+
+_ESCAPE = re.compile(r"\\(.)")
+_LINE_BREAK = re.compile(r"\s*\n\s*")
+
+# Chain method -> step action
+ACTIONS = {
+    "goto": "goto",
+    "click": "click",
+    "fill": "fill",
+    "selectOption": "select_option",
+    "press": "press",
+    "check": "check",
+    "uncheck": "uncheck",
 }
+# Values typed into fields are never stored
+_REDACTED_VALUE = {"fill", "select_option"}
 
-def parse_playwright_code(code: str):
+Token = Tuple[str, str, int, int]  # (kind, text, start, end)
+
+
+class _Tokens:
+    """Tokens of `code` from `pos` on, scanned lazily as the parser looks ahead."""
+
+    def __init__(self, code: str, pos: int):
+        self.code = code
+        self.pos = pos
+        self.items: List[Token] = []
+
+    def __getitem__(self, i: int) -> Optional[Token]:
+        items = self.items
+        while len(items) <= i and self._scan():
+            pass
+        return items[i] if 0 <= i < len(items) else None
+
+    def _scan(self) -> bool:
+        code, items = self.code, self.items
+        while True:
+            pos = _SKIP.match(code, self.pos).end()
+            if pos >= len(code):
+                self.pos = pos
+                return False
+            if code[pos] == "/" and (not items or items[-1][1] in _REGEX_PREV):
+                m = _REGEX_LITERAL.match(code, pos)
+                if m:
+                    items.append(("regex", m.group(0), pos, m.end()))
+                    self.pos = m.end()
+                    return True
+            m = _TOKEN.match(code, pos)
+            if not m:  # stray character, e.g. an unterminated string
+                self.pos = pos + 1
+                continue
+            self.pos = m.end()
+            items.append((m.lastgroup, m.group(0), pos, m.end()))
+            return True
+
+
+def _close_paren(tokens: _Tokens, i: int) -> int:
+    """Index of the `)` matching the `(` at tokens[i] (one past the last token if unbalanced)."""
+    depth = 0
+    j = i
+    while tokens[j] is not None:
+        kind, text = tokens[j][0], tokens[j][1]
+        if kind == "punct" and text in ("(", "[", "{"):
+            depth += 1
+        elif kind == "punct" and text in (")", "]", "}"):
+            depth -= 1
+            if depth == 0:
+                return j
+        j += 1
+    return j
+
+
+def _args(tokens: _Tokens, open_idx: int, close_idx: int) -> List[Tuple[int, int]]:
+    """Top-level arguments of the call whose parens are at open_idx/close_idx, as (first, last) token indices."""
+    args, start, j = [], open_idx + 1, open_idx + 1
+    while j < close_idx and tokens[j] is not None:
+        if tokens[j][1] in ("(", "[", "{"):
+            j = _close_paren(tokens, j)
+        elif tokens[j][1] == ",":
+            if j > start:
+                args.append((start, j - 1))
+            start = j + 1
+        j += 1
+    if start < min(j, close_idx):
+        args.append((start, min(j, close_idx) - 1))
+    return args
+
+
+def _is(token: Optional[Token], text: str) -> bool:
+    return token is not None and token[1] == text
+
+
+def _unquote(literal: Optional[str]) -> Optional[str]:
+    if not literal:
+        return None
+    body = literal[1:-1]
+    return _ESCAPE.sub(r"\1", body) if "\\" in body else body
+
+
+def _source(code: str, start: int, end: int) -> str:
+    """Source slice with line breaks (and their indentation) removed."""
+    text = code[start:end]
+    return _LINE_BREAK.sub("", text) if "\n" in text else text
+
+
+def _arg_value(code: str, tokens: _Tokens, arg: Optional[Tuple[int, int]]) -> Optional[str]:
+    """A string literal argument unquoted, anything else as its source text."""
+    if arg is None:
+        return None
+    first, last = arg
+    if first == last and tokens[first][0] == "str":
+        return _unquote(tokens[first][1])
+    return _source(code, tokens[first][2], tokens[last][3])
+
+
+def _parse_chain(tokens: _Tokens, i: int):
     """
-    Parse pasted Playwright TypeScript code and return a list of steps.
+    Parse `ident(.member(args)?)*` starting at tokens[i].
+    Returns (members, end) where members are (name, open_idx, close_idx, dot_idx).
     """
-    steps = []
-    for line in code.splitlines():
-        line = line.strip()
+    members = []
+    j = i + 1
+    while _is(tokens[j], ".") and tokens[j + 1] is not None and tokens[j + 1][0] == "ident":
+        dot, name = j, tokens[j + 1][1]
+        j += 2
+        if _is(tokens[j], "("):
+            close = _close_paren(tokens, j)
+            members.append((name, j, close, dot))
+            j = close + 1
+        else:
+            members.append((name, None, None, dot))
+    return members, j
 
-        # Goto
-        match = ACTION_PATTERNS["goto"].search(line)
-        if match:
-            steps.append({"action": "goto", "url": match.group(1)})
-            continue
 
-        # Fill
-        match = ACTION_PATTERNS["fill"].search(line)
-        if match:
-            selector = line.split(".fill")[0]
-            steps.append({"action": "fill", "selector": selector, "value": "<PLACEHOLDER>"})
-            continue
+def _action_step(code: str, tokens: _Tokens, start: int, members) -> Optional[dict]:
+    """
+    Step for a page chain whose last member is a call in ACTIONS. On a locator
+    the selector is the chain before the call; called on the page itself
+    (`page.fill('#user', 'bob')`) the first argument is the selector.
+    """
+    name, open_idx, close_idx, dot_idx = members[-1]
+    if name not in ACTIONS or open_idx is None:
+        return None
+    action = ACTIONS[name]
+    args = _args(tokens, open_idx, close_idx)
+    if action == "goto":
+        return {"action": "goto", "url": _arg_value(code, tokens, args[0] if args else None)}
+    if len(members) == 1:
+        if not args:
+            return None
+        selector, args = _arg_value(code, tokens, args[0]), args[1:]
+    else:
+        selector = _source(code, start, tokens[dot_idx][2])
+    step = {"action": action, "selector": selector}
+    if action in _REDACTED_VALUE:
+        step["value"] = "<PLACEHOLDER>"
+    elif action == "press" and args:
+        step["key"] = _arg_value(code, tokens, args[0])
+    return step
 
-        # Click
-        match = ACTION_PATTERNS["click"].search(line)
-        if match:
-            selector = line.split(".click")[0]
-            steps.append({"action": "click", "selector": selector})
-            continue
 
-        # Select option
-        match = ACTION_PATTERNS["select_option"].search(line)
-        if match:
-            selector = line.split(".selectOption")[0]
-            steps.append({"action": "select_option", "selector": selector, "value": "<PLACEHOLDER>"})
-            continue
+def _expect_step(code: str, tokens: _Tokens, i: int):
+    """Parse `expect(<chain>)[.not].<assertion>(args)` at tokens[i] == 'expect'; returns (step, end)."""
+    open_idx = i + 1
+    close_idx = _close_paren(tokens, open_idx)
+    j = close_idx + 1
+    negated = False
+    if _is(tokens[j], ".") and _is(tokens[j + 1], "not"):
+        negated = True
+        j += 2
+    if not (_is(tokens[j], ".") and tokens[j + 1] is not None and tokens[j + 1][0] == "ident"
+            and _is(tokens[j + 2], "(")):
+        return None, close_idx + 1
+
+    args_close = _close_paren(tokens, j + 2)
+    assertion = tokens[j + 1][1]
+    inner = _source(code, tokens[open_idx + 1][2], tokens[close_idx - 1][3]) if open_idx + 1 < close_idx else ""
+    step = {"action": "expect", "selector": inner.strip(), "assertion": assertion}
+    if negated:
+        step["negated"] = True
+    first = tokens[j + 3] if j + 3 < args_close else None
+    if first is not None and first[0] == "str":
+        step["expected"] = "<PLACEHOLDER>" if assertion == "toHaveValue" else _unquote(first[1])
+    return step, args_close + 1
 
-    return steps
+
+def _parse_statement(code: str, start: int):
+    """Tokenize the chain beginning at `start`; returns (step or None, offset to resume scanning)."""
+    tokens = _Tokens(code, start)
+    i = 1 if _is(tokens[0], "await") else 0
+    if _is(tokens[i], "expect"):
+        step, end = _expect_step(code, tokens, i)
+    else:
+        members, end = _parse_chain(tokens, i)
+        # The selector keeps a leading `await`, as recorded flows always have
+        step = _action_step(code, tokens, start, members) if members else None
+    last = tokens[end - 1]
+    return step, last[3] if last is not None else len(code)
+
+
+def _fast_step(m) -> Optional[dict]:
+    """Step for a `_FAST` match; None when it needs the tokenizer after all."""
+    if m.group("goto"):
+        return {"action": "goto", "url": _unquote(m.group("url"))}
+    action = ACTIONS[m.group("action")]
+    step = {"action": action, "selector": m.group("sel")}
+    if action in _REDACTED_VALUE:
+        step["value"] = "<PLACEHOLDER>"
+    elif action == "press":
+        key = _QSTR_ONLY.fullmatch(m.group("args"))
+        if not key:
+            return None
+        step["key"] = _unquote(key.group(1))
+    return step
+
+
+def parse_playwright_code(code: str):
+    """
+    Parse pasted Playwright TypeScript code and return a list of steps.
+    The source is scanned once; chains may span several lines.
+    """
+    steps = []
+    pos = 0
+    while True:
+        m = _HEAD.search(code, pos)
+        if not m:
+            return steps
+        if m.group("fast"):
+            step = _fast_step(m)
+            if step:
+                steps.append(step)
+                pos = m.end()
+                continue
+        elif m.group("head") is None:  # string or comment
+            pos = m.end()
+            continue
+        step, end = _parse_statement(code, m.start())
+        if step:
+            steps.append(step)
+        pos = max(end, m.start() + 1)
@@ -1,10 +1,22 @@
 # sources/documents.py
+import gc
+import hashlib
 import os
 import logging
-from typing import Iterator, Tuple, Dict, Optional
-from urllib.parse import urlparse, urljoin
+import multiprocessing
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Empty
+from typing import Callable, Iterator, Tuple, Dict, List, Optional
+from urllib.parse import urlparse, urljoin, urldefrag
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from metrics import METRICS
+from sources.http_cache import CrawlCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +32,18 @@ except ImportError:
     except ImportError:
         _HAVE_LC_LOADERS = False
 
+# --- Optional: psutil for RSS outside Linux ---
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Pause parse workers while the consuming process is above this RSS (0 disables)
+DOCUMENT_MAX_RSS_MB = int(os.getenv("DOCUMENT_MAX_RSS_MB", "0"))
+# How parse workers are started. Callers (Streamlit, job workers, the API) run
+# threads, and forking a threaded process can deadlock, so workers are spawned.
+DOCUMENT_PARSE_START_METHOD = os.getenv("DOCUMENT_PARSE_START_METHOD", "spawn")
+
 
 # --------------------------
 # Utilities
@@ -29,28 +53,81 @@ def _is_url(path_or_url: str) -> bool:
     return p.scheme in ("http", "https")
 
 
-def _chunk_text_by_words(text: str, chunk_size_words: int = 400, overlap_words: int = 50) -> Iterator[str]:
-    """Yield chunks of text instead of building large list in memory."""
+# Default Chroma embedder (all-MiniLM-L6-v2) reads at most 256 word pieces, 2 of them [CLS]/[SEP];
+# longer chunks would be truncated silently, so chunks are also capped by an estimated token count.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+_SPECIAL_TOKENS = 2
+# Rough WordPiece estimate that errs high: letters in runs of 6, digits in runs of 3, one per symbol
+_TOKEN_PIECE = re.compile(r"[^\W\d_]{1,6}|\d{1,3}|[^\s\w]|_")
+_WORD = re.compile(r"\S+")
+
+
+def iter_chunk_spans(text: str, chunk_size_words: int = 400, overlap_words: int = 50,
+                     max_tokens: Optional[int] = CHUNK_MAX_TOKENS) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) character offsets of word-aligned chunks of `text`.
+    The text is scanned once; only the current window of word offsets is held.
+    A chunk ends at `chunk_size_words` words or at `max_tokens` estimated tokens
+    (None disables the token budget); consecutive chunks share `overlap_words` words.
+    """
     if not text:
         return
-    words = text.split()
-    n = len(words)
-    if n <= chunk_size_words:
-        yield " ".join(words)
-        return
+    budget = max_tokens - _SPECIAL_TOKENS if max_tokens else None
+    window = deque()  # (start, end, tokens) per word
+    window_tokens = 0
+    fresh = 0  # words not yet covered by a yielded chunk
+    for word in _iter_words(text):
+        if window and (len(window) >= chunk_size_words
+                       or (budget is not None and window_tokens + word[2] > budget)):
+            yield window[0][0], window[-1][1]
+            keep = min(overlap_words, len(window) - 1)
+            while len(window) > keep or (window and budget is not None and window_tokens + word[2] > budget):
+                window_tokens -= window.popleft()[2]
+            fresh = 0
+        window.append(word)
+        window_tokens += word[2]
+        fresh += 1
+    if fresh:
+        yield window[0][0], window[-1][1]
 
-    start = 0
-    while start < n:
-        end = min(start + chunk_size_words, n)
-        yield " ".join(words[start:end])
-        if end == n:
-            break
-        start = max(0, end - overlap_words)
 
+def _iter_words(text: str) -> Iterator[Tuple[int, int, int]]:
+    """(start, end, estimated tokens) for each whitespace-separated word."""
+    for m in _WORD.finditer(text):
+        word = m.group(0)
+        tokens = 1 if len(word) <= 6 and word.isalpha() else len(_TOKEN_PIECE.findall(word))
+        yield m.start(), m.end(), tokens
 
-def _extract_text_from_html(html: str) -> Tuple[str, str]:
-    """Extract title and main text from HTML using <article>/<main> or <p> tags."""
-    soup = BeautifulSoup(html, "html.parser")
+
+def _timed_spans(text: str, chunk_size_words: int, overlap_words: int,
+                 max_tokens: Optional[int]) -> List[Tuple[int, int]]:
+    """Chunk offsets for one page, recorded as the `chunk` stage (offsets only, so cheap to hold)."""
+    with METRICS.timer("chunk") as ctx:
+        spans = list(iter_chunk_spans(text, chunk_size_words, overlap_words, max_tokens))
+        ctx["items"] = len(spans)
+    return spans
+
+
+def _timed_pages(pages: Iterator[str]) -> Iterator[str]:
+    """Yield pages, recording the time spent producing each as the `parse` stage."""
+    while True:
+        started = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            return
+        METRICS.observe("parse", time.perf_counter() - started, 1)
+        yield page
+
+
+def _chunk_text_by_words(text: str, chunk_size_words: int = 400, overlap_words: int = 50,
+                         max_tokens: Optional[int] = CHUNK_MAX_TOKENS) -> Iterator[str]:
+    """Yield chunk strings; slices of `text` at the offsets from iter_chunk_spans."""
+    for start, end in iter_chunk_spans(text, chunk_size_words, overlap_words, max_tokens):
+        yield text[start:end]
+
+
+def _extract_text_from_soup(soup: BeautifulSoup) -> Tuple[str, str]:
     title = soup.title.string.strip() if soup.title and soup.title.string else ""
     article = soup.find("article") or soup.find("main")
     paragraphs = article.find_all("p") if article else soup.find_all("p")
@@ -60,115 +137,413 @@ def _extract_text_from_html(html: str) -> Tuple[str, str]:
     return title, text
 
 
-def _fetch_url_page(url: str, timeout: int = 10) -> Tuple[str, str]:
-    """Fetch a single URL and return (title, cleaned_text)."""
-    resp = requests.get(url, timeout=timeout)
-    resp.raise_for_status()
-    return _extract_text_from_html(resp.text)
+def _extract_text_from_html(html: str) -> Tuple[str, str]:
+    """Extract title and main text from HTML using <article>/<main> or <p> tags."""
+    return _extract_text_from_soup(BeautifulSoup(html, "html.parser"))
+
+
+def _parse_page(html: str, url: str) -> Tuple[str, str, List[str]]:
+    """Parse HTML once and return (title, text, absolute links without fragments)."""
+    soup = BeautifulSoup(html, "html.parser")
+    links = [urldefrag(urljoin(url, a["href"]))[0] for a in soup.find_all("a", href=True)]
+    title, text = _extract_text_from_soup(soup)
+    return title, text, links
+
+
+def _make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def crawl_site(
+    start_url: str,
+    crawl_depth: int = 0,
+    max_pages: Optional[int] = 50,
+    max_workers: int = 8,
+    per_host_limit: int = 4,
+    timeout: int = 10,
+    session: requests.Session = None,
+    cache: Optional[CrawlCache] = None,
+    revalidate: bool = True,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Breadth-first crawl restricted to the start URL's host.
+    Pages are fetched concurrently on a pooled session, each URL exactly once, and
+    text and links come from the same response. Yields (url, title, text) in
+    frontier order, so output matches a sequential crawl.
+
+    With a `cache`, requests are conditional (If-None-Match / If-Modified-Since).
+    A 304, or a body whose hash matches the last crawl, is not parsed or yielded;
+    the crawl follows that page's cached links instead. revalidate=False fetches
+    and yields every page but still refreshes the cache. `stats` is filled with
+    fetched / not_modified / unchanged / changed / failed page counts.
+    """
+    start_url = urldefrag(start_url)[0]
+    netloc = urlparse(start_url).netloc
+    session = session or _make_session(max_workers)
+    host_slots: Dict[str, threading.BoundedSemaphore] = {}
+    slots_lock = threading.Lock()
+    stats = stats if stats is not None else {}
+    for key in ("fetched", "not_modified", "unchanged", "changed", "failed"):
+        stats.setdefault(key, 0)
+
+    def _fetch(url: str) -> Tuple[str, Optional[str], Optional[str], List[str]]:
+        """(status, title, text, links); title and text are None unless the page changed."""
+        host = urlparse(url).netloc
+        with slots_lock:
+            slot = host_slots.setdefault(host, threading.BoundedSemaphore(per_host_limit))
+        cached = cache.get(url) if cache is not None else None
+        headers = CrawlCache.conditional_headers(cached) if revalidate else {}
+        with slot, METRICS.timer("fetch", items=1):
+            resp = session.get(url, timeout=timeout, headers=headers)
+        if resp.status_code == 304 and cached and revalidate:
+            return "not_modified", None, None, cached["links"]
+        resp.raise_for_status()
+        body_hash = hashlib.sha256(resp.content).hexdigest()
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if cached and revalidate and cached["body_hash"] == body_hash:
+            cache.stage(url, etag, last_modified, body_hash, cached["links"], cached, changed=False)
+            return "unchanged", None, None, cached["links"]
+        with METRICS.timer("parse", items=1):
+            title, text, links = _parse_page(resp.text, url)
+        if cache is not None:
+            cache.stage(url, etag, last_modified, body_hash, links, cached, changed=True)
+        return "changed", title, text, links
+
+    seen = {start_url}
+    frontier = deque([(start_url, 0)])
+    in_flight = deque()
+    scheduled = 0
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while frontier or in_flight:
+            # Keep the pool busy with a bounded look-ahead
+            while frontier and len(in_flight) < 2 * max_workers and (max_pages is None or scheduled < max_pages):
+                url, depth = frontier.popleft()
+                in_flight.append((url, depth, pool.submit(_fetch, url)))
+                scheduled += 1
+            if not in_flight:
+                break
+
+            url, depth, future = in_flight.popleft()
+            try:
+                status, title, text, links = future.result()
+            except Exception as e:
+                logger.warning("Failed to fetch URL %s: %s", url, e)
+                stats["failed"] += 1
+                continue
+
+            stats[status] += 1
+            if status != "not_modified":
+                stats["fetched"] += 1
+            if status == "changed":
+                yield url, title, text
+
+            # enqueue new links if depth allows
+            if depth < crawl_depth:
+                for new_url in links:
+                    if urlparse(new_url).netloc == netloc and new_url not in seen:
+                        seen.add(new_url)
+                        frontier.append((new_url, depth + 1))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --------------------------
+# Memory guard
+# --------------------------
+def _rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size of a process in MB, or None where it can't be read."""
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 2**20
+        except psutil.Error:
+            pass
+    return None
+
+
+class RSSGuard:
+    """
+    Holds a producer back while a process is above `max_rss_mb`.
+    `wait(flushed)` returns once RSS is under the limit or `flushed()` reports that
+    downstream has taken everything produced so far; after `timeout` it gives up
+    with a warning rather than stall the load.
+    """
+
+    def __init__(self, max_rss_mb: float, pid: Optional[int] = None, poll: float = 0.05, timeout: float = 30.0):
+        self.max_rss_mb = max_rss_mb
+        self.pid = pid
+        self.poll = poll
+        self.timeout = timeout
+        self.pauses = 0
+
+    def over(self) -> bool:
+        rss = _rss_mb(self.pid)
+        return bool(self.max_rss_mb) and rss is not None and rss > self.max_rss_mb
+
+    def wait(self, flushed: Callable[[], bool] = lambda: True):
+        if not self.over():
+            return
+        gc.collect()
+        if not self.over():
+            return
+        self.pauses += 1
+        deadline = time.monotonic() + self.timeout
+        while not flushed():
+            if time.monotonic() > deadline:
+                logger.warning("RSS above %s MB and downstream not flushing; continuing.", self.max_rss_mb)
+                return
+            time.sleep(self.poll)
+            if not self.over():
+                return
 
 
 # --------------------------
 # Main loader
 # --------------------------
+def web_chunk_id(url: str, index: int) -> str:
+    return f"{url}::chunk_{index}"
+
+
 def load_documents(
     path_or_url: str,
     chunk_size_words: int = 400,
     overlap_words: int = 50,
     crawl_depth: int = 0,
-    max_pages: Optional[int] = 50
+    max_pages: Optional[int] = 50,
+    max_workers: int = 8,
+    per_host_limit: int = 4,
+    workers: Optional[int] = None,
+    max_tokens: Optional[int] = CHUNK_MAX_TOKENS,
+    http_cache: Optional[CrawlCache] = None,
+    revalidate: bool = True,
+    crawl_stats: Optional[Dict[str, int]] = None,
 ) -> Iterator[Tuple[str, str, Dict]]:
     """
     Yield documents from local files or web pages.
     Returns an iterator of (doc_id, content, metadata).
+    `workers` > 1 parses local files in that many processes.
+    Chunk metadata carries `char_start`/`char_end` offsets into the extracted text.
+    With `http_cache`, web pages unchanged since the last crawl yield nothing (see crawl_site).
     """
 
     # --- Case A: URL ---
     if _is_url(path_or_url):
-        visited = set()
-        to_visit = [(path_or_url, 0)]
-
-        while to_visit and (max_pages is None or len(visited) < max_pages):
-            url, depth = to_visit.pop(0)
-            if url in visited or depth > crawl_depth:
-                continue
-            visited.add(url)
-
-            try:
-                title, text = _fetch_url_page(url)
-            except Exception as e:
-                logger.warning("Failed to fetch URL %s: %s", url, e)
-                continue
-
-            for i, chunk in enumerate(_chunk_text_by_words(text, chunk_size_words, overlap_words)):
-                doc_id = f"{url}::chunk_{i}"
+        for url, title, text in crawl_site(
+            path_or_url,
+            crawl_depth=crawl_depth,
+            max_pages=max_pages,
+            max_workers=max_workers,
+            per_host_limit=per_host_limit,
+            cache=http_cache,
+            revalidate=revalidate,
+            stats=crawl_stats,
+        ):
+            for i, (start, end) in enumerate(_timed_spans(text, chunk_size_words, overlap_words, max_tokens)):
+                doc_id = web_chunk_id(url, i)
                 metadata = {
                     "source": "web",
                     "url": url,
                     "title": title,
                     "chunk_index": i,
+                    "char_start": start,
+                    "char_end": end,
                 }
-                yield (doc_id, chunk, metadata)
-
-            # enqueue new links if depth allows
-            if depth < crawl_depth:
-                try:
-                    resp = requests.get(url, timeout=10)
-                    soup = BeautifulSoup(resp.text, "html.parser")
-                    for link in soup.find_all("a", href=True):
-                        new_url = urljoin(url, link["href"])
-                        if urlparse(new_url).netloc == urlparse(path_or_url).netloc:
-                            if new_url not in visited:
-                                to_visit.append((new_url, depth + 1))
-                except Exception as e:
-                    logger.warning("Could not parse links from %s: %s", url, e)
+                yield (doc_id, text[start:end], metadata)
 
         return  # generator ends here
 
     # --- Case B: Local path ---
-    path = os.path.expanduser(path_or_url)
-    files = []
-    if os.path.isdir(path):
-        for root, _, filenames in os.walk(path):
-            for fn in filenames:
-                files.append(os.path.join(root, fn))
-    else:
-        files = [path]
+    yield from load_files(list_files(path_or_url), chunk_size_words, overlap_words,
+                          workers=workers, max_tokens=max_tokens)
 
-    for fpath in files:
-        if not os.path.exists(fpath):
-            continue
-        ext = os.path.splitext(fpath)[1].lower()
 
-        # Use LangChain loaders if available
-        if _HAVE_LC_LOADERS:
+def list_files(path: str) -> List[str]:
+    """The file itself, or every file under a directory."""
+    path = os.path.expanduser(path)
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(root, fn) for root, _, filenames in os.walk(path) for fn in filenames]
+
+
+def load_files(
+    files: List[str],
+    chunk_size_words: int = 400,
+    overlap_words: int = 50,
+    workers: Optional[int] = None,
+    queue_size: int = 64,
+    max_tokens: Optional[int] = CHUNK_MAX_TOKENS,
+    max_rss_mb: int = DOCUMENT_MAX_RSS_MB,
+    on_file: Optional[Callable[[str], None]] = None,
+) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Yield (doc_id, content, metadata) chunks for local files, page by page.
+    With workers > 1, files are parsed in a process pool and their chunks are
+    merged through a bounded queue (at most `queue_size` batches buffered);
+    chunk order is kept within each file but files interleave. With `max_rss_mb`,
+    workers also wait before each page while this process is above that RSS,
+    until every batch they queued has been handed downstream.
+    A single-process load is pull-driven and never runs ahead of the consumer.
+    `on_file(path)` is called once every chunk of that file has been yielded.
+    """
+    files = [f for f in files if os.path.exists(f)]
+    if not workers or workers <= 1 or len(files) <= 1:
+        for fpath in files:
+            yield from _load_file(fpath, chunk_size_words, overlap_words, max_tokens)
+            if on_file:
+                on_file(fpath)
+        return
+
+    ctx = multiprocessing.get_context(DOCUMENT_PARSE_START_METHOD)
+    queue = ctx.Queue(maxsize=queue_size)
+    pending = ctx.Value("i", 0)  # batches queued but not yet handed downstream
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(files)), mp_context=ctx,
+                               initializer=_init_parse_worker, initargs=(queue, pending, os.getpid(), max_rss_mb))
+    futures = [pool.submit(_load_file_into_queue, fpath, chunk_size_words, overlap_words, max_tokens)
+               for fpath in files]
+    try:
+        remaining = len(files)
+        while remaining:
             try:
-                if ext == ".pdf":
-                    loader = PyPDFLoader(fpath)
-                    docs = loader.load()
-                elif ext in (".docx", ".doc"):
-                    loader = UnstructuredWordDocumentLoader(fpath)
-                    docs = loader.load()
-                else:
-                    loader = TextLoader(fpath)
-                    docs = loader.load()
-
-                for i, doc in enumerate(docs):
-                    text = getattr(doc, "page_content", str(doc))
-                    for j, chunk in enumerate(_chunk_text_by_words(text, chunk_size_words, overlap_words)):
-                        doc_id = f"{fpath}::p{i}::c{j}"
-                        metadata = {"source": "document", "file": fpath, "page_index": i, "chunk_index": j}
-                        yield (doc_id, chunk, metadata)
+                batch = queue.get(timeout=1.0)
+            except Empty:
+                # A worker that died without its end marker would otherwise hang us
+                if all(f.done() for f in futures):
+                    logger.warning("Document parser pool exited with %d file(s) unfinished.", remaining)
+                    return
                 continue
-            except Exception as e:
-                logger.warning("LangChain loader failed for %s: %s — fallback to plain text.", fpath, e)
+            if isinstance(batch, str):  # a worker's end marker names its file
+                remaining -= 1
+                if on_file:
+                    on_file(batch)
+                continue
+            if isinstance(batch, dict):  # stage timings from a worker
+                METRICS.merge(batch)
+                continue
+            yield from batch
+            with pending.get_lock():
+                pending.value -= 1
+    finally:
+        # On early exit, drop queued files and drain so running workers can finish
+        for f in futures:
+            f.cancel()
+        while not all(f.done() for f in futures):
+            try:
+                queue.get(timeout=0.1)
+            except Empty:
+                pass
+        pool.shutdown()
+
+
+_parse_queue = None
+_parse_pending = None
+_parse_guard: Optional[RSSGuard] = None
+
+
+def _init_parse_worker(queue, pending, consumer_pid: int, max_rss_mb: int):
+    global _parse_queue, _parse_pending, _parse_guard
+    _parse_queue = queue
+    _parse_pending = pending
+    _parse_guard = RSSGuard(max_rss_mb, pid=consumer_pid) if max_rss_mb else None
+    METRICS.reset()  # a forked worker would start with the parent's numbers; ship only its own
+
 
-        # Fallback: read as plain text
+def _put_batch(batch):
+    with _parse_pending.get_lock():
+        _parse_pending.value += 1
+    _parse_queue.put(batch)
+
+
+def _wait_for_memory():
+    """Called before each page in a worker; blocks while the consumer is over its RSS limit."""
+    if _parse_guard is not None:
+        _parse_guard.wait(lambda: _parse_pending.value <= 0)
+
+
+def _load_file_into_queue(fpath: str, chunk_size_words: int, overlap_words: int,
+                          max_tokens: Optional[int] = CHUNK_MAX_TOKENS, batch_size: int = 32):
+    """Process-pool worker: push chunk batches for one file, then the file path as its end marker."""
+    try:
+        batch = []
+        for item in _load_file(fpath, chunk_size_words, overlap_words, max_tokens):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                _put_batch(batch)
+                batch = []
+        if batch:
+            _put_batch(batch)
+    except Exception as e:
+        logger.warning("Failed to parse %s: %s", fpath, e)
+    finally:
+        _parse_queue.put(METRICS.drain())
+        _parse_queue.put(fpath)
+
+
+def _iter_pages(fpath: str, ext: str) -> Iterator[str]:
+    """Page texts from the LangChain loaders, parsed lazily one page at a time."""
+    if ext == ".pdf":
+        for doc in PyPDFLoader(fpath).lazy_load():
+            yield getattr(doc, "page_content", str(doc))
+    elif ext in (".docx", ".doc"):
+        # Elements arrive in order; group them by the page they were laid out on
+        page, parts = None, []
+        for element in UnstructuredWordDocumentLoader(fpath, mode="elements").lazy_load():
+            number = (getattr(element, "metadata", None) or {}).get("page_number")
+            if parts and number != page:
+                yield "\n\n".join(parts)
+                parts = []
+            page = number
+            parts.append(getattr(element, "page_content", str(element)))
+        if parts:
+            yield "\n\n".join(parts)
+    else:
+        for doc in TextLoader(fpath).lazy_load():
+            yield getattr(doc, "page_content", str(doc))
+
+
+def _load_file(fpath: str, chunk_size_words: int, overlap_words: int,
+               max_tokens: Optional[int] = CHUNK_MAX_TOKENS) -> Iterator[Tuple[str, str, Dict]]:
+    ext = os.path.splitext(fpath)[1].lower()
+
+    # Use LangChain loaders if available
+    if _HAVE_LC_LOADERS:
+        yielded = 0
         try:
-            with open(fpath, "r", encoding="utf-8", errors="ignore") as fh:
-                text = fh.read()
-            for j, chunk in enumerate(_chunk_text_by_words(text, chunk_size_words, overlap_words)):
-                doc_id = f"{fpath}::chunk_{j}"
-                metadata = {"source": "document", "file": fpath, "chunk_index": j}
-                yield (doc_id, chunk, metadata)
-        except Exception:
-            logger.warning("Unable to read %s as text. Skipping.", fpath)
+            for i, text in enumerate(_timed_pages(_iter_pages(fpath, ext))):
+                for j, (start, end) in enumerate(_timed_spans(text, chunk_size_words, overlap_words, max_tokens)):
+                    doc_id = f"{fpath}::p{i}::c{j}"
+                    metadata = {"source": "document", "file": fpath, "page_index": i, "chunk_index": j,
+                                "char_start": start, "char_end": end}
+                    yield (doc_id, text[start:end], metadata)
+                    yielded += 1
+                del text  # drop the page before waiting on memory
+                _wait_for_memory()
+            return
+        except Exception as e:
+            if yielded:
+                # Earlier chunks are already downstream; a plain-text re-read would duplicate them
+                logger.warning("LangChain loader failed for %s after %d chunk(s): %s", fpath, yielded, e)
+                return
+            logger.warning("LangChain loader failed for %s: %s — fallback to plain text.", fpath, e)
+
+    # Fallback: read as plain text
+    try:
+        with open(fpath, "r", encoding="utf-8", errors="ignore") as fh:
+            text = fh.read()
+        for j, (start, end) in enumerate(_timed_spans(text, chunk_size_words, overlap_words, max_tokens)):
+            doc_id = f"{fpath}::chunk_{j}"
+            metadata = {"source": "document", "file": fpath, "chunk_index": j,
+                        "char_start": start, "char_end": end}
+            yield (doc_id, text[start:end], metadata)
+    except Exception:
+        logger.warning("Unable to read %s as text. Skipping.", fpath)
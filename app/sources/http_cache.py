@@ -0,0 +1,105 @@
+# sources/http_cache.py
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class CrawlCache:
+    """
+    What the last crawl saw per URL: ETag / Last-Modified validators, a hash of
+    the body, the page's links and how many chunks it was stored as.
+
+    A crawl `stage()`s entries as it goes; nothing is persisted until the
+    ingest that consumed the crawl calls `commit()`, so a failed ingest never
+    leaves pages marked as up to date.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._staged: Dict[str, dict] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT NOT NULL,
+            links TEXT NOT NULL,
+            chunks INTEGER NOT NULL DEFAULT 0,
+            fetched REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body_hash, links, chunks FROM pages WHERE url=?", (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body_hash, links, chunks = row
+        return {"etag": etag, "last_modified": last_modified, "body_hash": body_hash,
+                "links": json.loads(links), "chunks": chunks}
+
+    def chunk_counts(self) -> Dict[str, int]:
+        """URL -> how many chunks its page was last stored as, for pages that had any."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT url, chunks FROM pages WHERE chunks > 0"))
+
+    def forget(self, urls: List[str]):
+        """Drop pages so the next crawl fetches and ingests them as new."""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM pages WHERE url=?", [(url,) for url in urls])
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    # ---------------- Staged crawl results ----------------
+    def stage(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str,
+              links: List[str], previous: Optional[dict], changed: bool):
+        """Record a fetched page; `changed` pages get their chunk count at commit."""
+        with self._lock:
+            self._staged[url] = {
+                "etag": etag, "last_modified": last_modified, "body_hash": body_hash, "links": links,
+                "changed": changed, "previous_chunks": previous["chunks"] if previous else 0,
+            }
+
+    @property
+    def staged(self) -> Dict[str, dict]:
+        with self._lock:
+            return dict(self._staged)
+
+    def commit(self, chunk_counts: Dict[str, int]):
+        """Persist staged pages; a changed page is stored with its count from `chunk_counts` (0 if absent)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, links, chunks, fetched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(url, e["etag"], e["last_modified"], e["body_hash"], json.dumps(e["links"]),
+                  chunk_counts.get(url, 0) if e["changed"] else e["previous_chunks"], now)
+                 for url, e in self._staged.items()])
+            self._staged = {}
+
+    def discard(self):
+        with self._lock:
+            self._staged = {}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages")
+            self._staged = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
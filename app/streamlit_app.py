@@ -3,15 +3,17 @@ import os
 import io
 import json
 import subprocess
+import time
 import pandas as pd
 import streamlit as st
 from hashstore import init_db
 from vector_db import VectorDBClient
 from test_case_generator import TestCaseGenerator
-from ingest_utils import ingest_artifact
-from ingest import ingest_jira, ingest_web_site, ingest_ui_crawl, ingest_document
+from ingest import DOCUMENT_PARSE_WORKERS
+from jobs import ACTIVE, JOB_WORKERS, JobQueue, start_workers
 from parse_playwright import parse_playwright_code
 from test_case_generator import map_llm_to_template
+from metrics import METRICS, Metrics
 
 # -------------------------- Constants --------------------------
 JSON_FLOW_DIR = os.path.join(os.getcwd(), "app", "saved_flows")
@@ -22,6 +24,31 @@ os.makedirs("uploads", exist_ok=True)
 init_db()
 db = VectorDBClient()
 
+
+@st.cache_resource
+def _ingest_workers():
+    """Worker processes for ingest jobs, started once per server (JOB_WORKERS=0 to run them elsewhere)."""
+    return start_workers(JOB_WORKERS)
+
+
+_ingest_workers()
+job_queue = JobQueue()
+
+
+@st.cache_resource
+def _schedule_store_migrations():
+    """
+    Once per server, queue the jobs an older store needs: building the BM25
+    index and stamping documents written before ingest_source existed.
+    """
+    active = {job["kind"] for job in job_queue.list_jobs(limit=1000, statuses=list(ACTIVE))}
+    for kind, needed in (("lexical_index", db.needs_lexical_rebuild), ("legacy_stamp", db.needs_legacy_stamp)):
+        if kind not in active and needed():
+            job_queue.submit(kind, {})
+
+
+_schedule_store_migrations()
+
 # -------------------------- Page Config --------------------------
 st.set_page_config(page_title="Test Artifact Recorder & Ingest", layout="wide")
 
@@ -54,25 +81,22 @@ if st.session_state["role"] == "admin":
     # ---------------- Jira ----------------
     st.subheader("Jira Ingestion")
     jql_input = st.text_input("Jira JQL", value="project=GEN_AI_PROJECT ORDER BY created DESC")
+    jira_incremental = st.checkbox("Only issues changed since the last sync", value=True)
     if st.button("Fetch & Ingest Jira"):
-        try:
-            results = ingest_jira(jql_input)
-            st.success(f"Jira stories ingested: {len(results)} issues ✅")
-        except Exception as e:
-            st.error(f"Jira ingestion failed: {e}")
+        job_id = job_queue.submit("jira", {"jql": jql_input, "incremental": jira_incremental})
+        st.success(f"Jira ingestion queued as job #{job_id} — see Ingestion Jobs below.")
 
     # ---------------- Website ----------------
     st.subheader("Website Ingestion")
     url = st.text_input("Website URL", value="https://docs.oracle.com/en/cloud/saas/index.html")
     max_depth = st.number_input("Max Depth", min_value=1, max_value=5, value=2)
+    refetch_all = st.checkbox("Re-ingest unchanged pages", value=False,
+                              help="By default pages unchanged since the last crawl are skipped.")
     if st.button("Fetch & Ingest Website"):
         if url.strip():
-            try:
-                with st.spinner(f"Crawling {url} up to depth {max_depth}..."):
-                    results = ingest_web_site(url, max_depth)
-                st.success(f"Website ingestion finished: {len(results)} docs added ✅")
-            except Exception as e:
-                st.error(f"Website ingestion failed: {e}")
+            job_id = job_queue.submit("website", {"url": url.strip(), "max_depth": int(max_depth),
+                                                  "force": refetch_all})
+            st.success(f"Crawl of {url} (depth {max_depth}) queued as job #{job_id}.")
         else:
             st.warning("Please enter a valid URL")
 
@@ -85,36 +109,67 @@ if st.session_state["role"] == "admin":
     )
 
     if uploaded_files:
+        parse_workers = st.number_input("Parser processes", min_value=1, max_value=os.cpu_count() or 1,
+                                        value=min(DOCUMENT_PARSE_WORKERS, os.cpu_count() or 1))
         if st.button("Ingest Uploaded Documents"):
-            all_results = []
             try:
+                temp_paths = []
                 for uploaded_file in uploaded_files:
-                    temp_path = os.path.join("uploads", uploaded_file.name)
+                    temp_path = os.path.abspath(os.path.join("uploads", uploaded_file.name))
                     with open(temp_path, "wb") as f:
                         f.write(uploaded_file.getbuffer())
-                    with st.spinner(f"Ingesting {uploaded_file.name}..."):
-                        results = ingest_document(temp_path)
-                        all_results.extend(results)
-                st.success(f"Document ingestion finished: {len(all_results)} docs added ✅")
+                    temp_paths.append(temp_path)
+                job_id = job_queue.submit("documents", {"paths": temp_paths, "workers": int(parse_workers)})
+                st.success(f"{len(temp_paths)} file(s) queued as job #{job_id}.")
             except Exception as e:
-                st.error(f"Document ingestion failed: {e}")
+                st.error(f"Document upload failed: {e}")
 
     # ---------------- UI Crawl ----------------
     st.subheader("UI Crawl Ingestion")
     crawl_file = st.file_uploader("Upload crawl JSON", type=["json"])
     if st.button("Ingest UI Crawl"):
         if crawl_file:
-            path = f"./uploads/{crawl_file.name}"
+            path = os.path.abspath(f"./uploads/{crawl_file.name}")
             with open(path, "wb") as f:
                 f.write(crawl_file.getbuffer())
-            try:
-                results = ingest_ui_crawl(path)
-                st.success(f"UI Crawl ingested: {len(results)} flows ✅")
-            except Exception as e:
-                st.error(f"UI Crawl ingestion failed: {e}")
+            job_id = job_queue.submit("ui_crawl", {"path": path})
+            st.success(f"UI Crawl ingestion queued as job #{job_id}.")
         else:
             st.warning("Please upload a crawl JSON file")
 
+    # ---------------- Ingestion Jobs ----------------
+    st.subheader("Ingestion Jobs")
+
+    def _jobs_panel():
+        jobs = job_queue.list_jobs(limit=20)
+        if not jobs:
+            st.info("No ingestion jobs yet.")
+            return
+        st.dataframe(pd.DataFrame([
+            {
+                "job": job["id"],
+                "kind": job["kind"],
+                "status": job["status"],
+                "chunks written": job["items"],
+                "skipped": job["skipped"],
+                "progress": f"{job['steps_done']}/{job['steps_total']}" if job["steps_total"] else "",
+                "chunks/s": job["rate"],
+                "attempts": job["attempts"],
+                "submitted": time.strftime("%H:%M:%S", time.localtime(job["created"])),
+                "error": job["error"] or "",
+            }
+            for job in jobs
+        ]))
+        queued = [job["id"] for job in jobs if job["status"] == "queued"]
+        if queued:
+            cancel_id = st.selectbox("Queued job", queued)
+            if st.button("Cancel queued job"):
+                st.info(f"Job #{cancel_id} cancelled." if job_queue.cancel(cancel_id) else "Job already started.")
+
+    # A fragment reruns on its own, so refreshing the job table never blocks the rest of the page
+    auto_refresh = st.checkbox("Auto-refresh job status", value=False)
+    st.fragment(run_every=2 if auto_refresh else None)(_jobs_panel)()
+
     # ---------------- Delete Management ----------------
     st.subheader("Manage Vector DB Documents")
     delete_mode = st.radio("Choose delete mode", ["By ID", "By Source"])
@@ -124,8 +179,11 @@ if st.session_state["role"] == "admin":
         if st.button("🗑️ Delete Document by ID"):
             if doc_id_input.strip():
                 try:
-                    db.delete_document(doc_id_input.strip())
-                    st.success(f"Document '{doc_id_input}' deleted successfully ✅")
+                    removed = db.delete_where(ids=[doc_id_input.strip()])
+                    if removed:
+                        st.success(f"Document '{doc_id_input}' deleted successfully ✅")
+                    else:
+                        st.warning(f"No document with ID '{doc_id_input}' found.")
                 except Exception as e:
                     st.error(f"Failed to delete document: {e}")
             else:
@@ -133,11 +191,30 @@ if st.session_state["role"] == "admin":
     
     elif delete_mode == "By Source":
         source_input = st.text_input("Enter Source (e.g. 'jira', 'ui_flow')")
+        with st.expander("Narrow down (optional)"):
+            artifact_type_input = st.text_input("Artifact type (e.g. 'website_doc', 'ui_flow')")
+            project_input = st.text_input("Project")
+            flow_name_input = st.text_input("Flow name")
+            use_date_range = st.checkbox("Only documents ingested in a date range")
+            if use_date_range:
+                ingested_after = st.date_input("Ingested on or after")
+                ingested_before = st.date_input("Ingested before")
         if st.button("🗑️ Delete All Documents by Source"):
             if source_input.strip():
                 try:
-                    db.delete_by_source(source_input.strip())
-                    st.success(f"All documents from source '{source_input}' deleted ✅")
+                    after = before = None
+                    if use_date_range:
+                        after = pd.Timestamp(ingested_after, tz="UTC")
+                        before = pd.Timestamp(ingested_before, tz="UTC")
+                    removed = db.delete_where(
+                        source=source_input.strip(),
+                        artifact_type=artifact_type_input.strip() or None,
+                        project=project_input.strip() or None,
+                        flow_name=flow_name_input.strip() or None,
+                        ingested_after=after,
+                        ingested_before=before,
+                    )
+                    st.success(f"{removed} documents from source '{source_input}' deleted ✅")
                 except Exception as e:
                     st.error(f"Failed to delete by source: {e}")
             else:
@@ -146,25 +223,68 @@ if st.session_state["role"] == "admin":
     # ---------------- Show Existing Docs ----------------
     if st.checkbox("📋 Show Existing Docs with Pagination"):
         try:
-            all_docs = db.list_all(limit=1000) # fetch up to 10k docs
-            if all_docs:
+            f1, f2, f3 = st.columns(3)
+            filters = {
+                "source": f1.text_input("Source", key="browse_source").strip() or None,
+                "artifact_type": f2.text_input("Artifact type", key="browse_artifact_type").strip() or None,
+                "project": f3.text_input("Project", key="browse_project").strip() or None,
+            }
+            # Only the requested page is fetched; the total comes from a count, not a scan
+            total_docs = db.count_where(**filters)
+            if total_docs:
                 page_size = st.number_input("Docs per page", min_value=5, max_value=100, value=20)
-                total_pages = (len(all_docs) + page_size - 1) // page_size
+                total_pages = (total_docs + page_size - 1) // page_size
                 current_page = st.number_input("Page", min_value=1, max_value=total_pages, value=1)
 
-                start_idx = (current_page - 1) * page_size
-                end_idx = start_idx + page_size
-                page_docs = all_docs[start_idx:end_idx]
+                page_docs = db.list_page(offset=(current_page - 1) * page_size, limit=page_size, **filters)
 
                 df = pd.DataFrame(page_docs)
                 st.dataframe(df)  # scrollable
 
-                st.write(f"Showing page {current_page} of {total_pages}")
+                st.write(f"Showing page {current_page} of {total_pages} ({total_docs} docs)")
             else:
                 st.info("No documents found in Vector DB.")
         except Exception as e:
             st.error(f"Failed to fetch documents: {e}")
 
+    # ---------------- Pipeline Metrics ----------------
+    if st.checkbox("⏱️ Show Pipeline Metrics"):
+        # This process (retrieval, generation) plus what the ingest workers last published
+        combined = Metrics()
+        combined.merge(METRICS.export())
+        for raw in job_queue.worker_metrics():
+            combined.merge(raw)
+        snap = combined.snapshot()
+        if snap["stages"]:
+            ingest_stage = snap["stages"].get("ingest_documents", {})
+            write_stage = snap["stages"].get("store_write", {})
+            col1, col2 = st.columns(2)
+            col1.metric("Ingest throughput (chunks/s)", ingest_stage.get("items_per_s") or "–")
+            col2.metric("Embed + write throughput (chunks/s)", write_stage.get("items_per_s") or "–")
+            st.dataframe(pd.DataFrame([
+                {
+                    "stage": name,
+                    "calls": s["count"],
+                    "p50 (ms)": round(s["p50_s"] * 1000, 1),
+                    "p95 (ms)": round(s["p95_s"] * 1000, 1),
+                    "total (s)": round(s["total_s"], 2),
+                    "items": s["items"],
+                    "items/s": s["items_per_s"],
+                }
+                for name, s in snap["stages"].items()
+            ]))
+        else:
+            st.info("No ingest or generation has run in this server process yet.")
+        if snap["counters"]:
+            st.json(snap["counters"])
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("Download JSON", json.dumps(snap, indent=2), "metrics.json", "application/json")
+        col2.download_button("Download Prometheus text", combined.to_prometheus(), "metrics.prom", "text/plain")
+        if col3.button("Reset metrics"):
+            METRICS.reset()
+            job_queue.clear_metrics()
+            st.rerun()
+
 # -------------------------- Playwright Recorder Panel --------------------------
 st.header("🎥 Playwright Recorder → Vector DB Ingestion")
 flow_name = st.text_input("Flow Name", "playwright-recorded-flow")
@@ -190,22 +310,11 @@ st.markdown("### Paste Playwright TS Codegen Output")
 ts_code = st.text_area("Paste code here...", height=300)
 if st.button("📥 Convert & Ingest") and ts_code.strip():
     try:
+        # Parse here for the preview; the job saves the flow JSON and writes it to the store
         steps = parse_playwright_code(ts_code)
-        artifact = {"flow_name": flow_name, "source": "playwright", "steps": steps}
-        json_path = os.path.join(JSON_FLOW_DIR, f"{flow_name}.json")
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(artifact, f, indent=4)
-        metadata = {
-            "artifact_type": "ui_flow",
-            "source": "playwright-recorder",
-            "flow_name": flow_name,
-            "steps_count": len(steps)
-        }
-        metadata = flatten_metadata(metadata)
-        doc_id = f"playwright_{abs(hash(flow_name))}"
-        db.add_document(source="ui_flow", doc_id=doc_id, content=json.dumps(artifact), metadata=metadata)
-        st.success(f"Flow '{flow_name}' ingested successfully ✅")
-        st.json(artifact)
+        job_id = job_queue.submit("playwright", {"code": ts_code, "flow_name": flow_name})
+        st.success(f"Flow '{flow_name}' ({len(steps)} steps) queued for ingestion as job #{job_id} ✅")
+        st.json({"flow_name": flow_name, "source": "playwright", "steps": steps})
     except Exception as e:
         st.error(f"Failed to convert & ingest: {e}")
 
@@ -218,7 +327,16 @@ template_file = st.file_uploader("Upload Template File (JSON / Excel / Text / Do
 if st.button("Generate & Download Test Cases") and jira_input.strip():
     try:
         tcg = TestCaseGenerator(db)
-        results = tcg.generate_test_cases(jira_input.strip())
+        # Render test cases as the model streams them
+        results = []
+        live_table = st.empty()
+        with st.spinner("Generating test cases..."):
+            for case in tcg.stream_test_cases(jira_input.strip()):
+                results.append(case)
+                live_table.dataframe(pd.DataFrame(results))
+        if not results:
+            st.warning("The model returned no parseable test cases.")
+            st.stop()
         if template_file:
             ext = os.path.splitext(template_file.name)[1].lower()
             if ext in [".xlsx", ".xls"]:
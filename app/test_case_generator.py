@@ -1,11 +1,34 @@
 import os
 import json
 import re
+import time
+from typing import Iterator
 import pandas as pd
 from vector_db import VectorDBClient
-from langchain.prompts import PromptTemplate
+from llm_cache import LLMResponseCache, get_default_cache, make_cache_key
+from json_stream import JSONArrayStreamParser
+from metrics import METRICS
 from langchain_openai import AzureChatOpenAI
 
+try:
+    from langchain.prompts import PromptTemplate
+except ImportError:
+    from langchain_core.prompts import PromptTemplate
+
+
+def _strip_fences(output: str) -> str:
+    """Remove the Markdown code fences models often wrap JSON in."""
+    output = re.sub(r"^```(?:json)?\s*", "", output, flags=re.DOTALL)
+    return re.sub(r"\s*```$", "", output, flags=re.DOTALL).strip()
+
+
+def _parses(output: str) -> bool:
+    try:
+        json.loads(_strip_fences(output))
+    except json.JSONDecodeError:
+        return False
+    return True
+
 
 class TemplateLoader:
     """Utility to load test case templates from different formats."""
@@ -40,18 +63,20 @@ class TemplateLoader:
 
 
 class TestCaseGenerator:
-    def __init__(self, db: VectorDBClient, template=None):
+    def __init__(self, db: VectorDBClient, template=None, llm=None, cache: LLMResponseCache = None):
         self.db = db
         self.template = template or {}
 
         # ✅ Use AzureChatOpenAI instead of ChatOpenAI
-        self.llm = AzureChatOpenAI(
+        self.llm = llm or AzureChatOpenAI(
             openai_api_version=os.getenv("OPENAI_API_VERSION"),
             azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "GPT-4o"),
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
             api_key=os.getenv("AZURE_OPENAI_KEY"),
             temperature=0.2,
         )
+        # Shared by default so identical requests from any session hit one cache entry
+        self.cache = cache or get_default_cache()
 
         self.prompt = PromptTemplate(
             input_variables=["context", "story"],
@@ -64,31 +89,81 @@ class TestCaseGenerator:
             ),
         )
 
-    def generate_test_cases(self, story: str):
+    def _prepare(self, story: str):
+        """Retrieve context and return (prompt, cache key) for a story."""
         # Retrieve supporting context from vector DB
-        context = self.db.query(story, top_k=3)
+        with METRICS.timer("retrieval", items=1):
+            context = self.db.hybrid_query(story, top_k=3)
         ctx = "\n".join([c["content"] for c in context])
         query = self.prompt.format(context=ctx, story=story)
+        key = make_cache_key(
+            template=self.prompt.template,
+            story=story,
+            context_ids=[c["id"] for c in context],
+            deployment=self._model_id(),
+            temperature=getattr(self.llm, "temperature", None),
+        )
+        return query, key
 
-        # LLM call
-        resp = self.llm.invoke(query)
-        output = resp.content if hasattr(resp, "content") else str(resp)
+    def generate_test_cases(self, story: str):
+        query, key = self._prepare(story)
 
-        # Remove code fences if any
-        output = re.sub(r"^```(?:json)?\s*", "", output, flags=re.DOTALL)
-        output = re.sub(r"\s*```$", "", output, flags=re.DOTALL).strip()
-        output = output.strip()
+        # LLM call, served from cache when the same prompt/story/context was just sent;
+        # only output that parses is kept for later
+        output = self.cache.get_or_compute(key, lambda: self._invoke(query), cacheable=_parses)
+        output = _strip_fences(output)
 
         # Parse JSON
         try:
             test_cases = json.loads(output)
         except json.JSONDecodeError as e:
+            # keep whatever complete test cases arrived before a truncation
+            partial = JSONArrayStreamParser().feed(output)
+            if partial:
+                print(f"⚠️ JSON parse error: {e}; kept {len(partial)} complete test cases")
+                return partial
             # fallback: return raw string
             print(f"❌ JSON parse error: {e}\nOutput:\n{output}")
             return output
 
         return test_cases
 
+    def stream_test_cases(self, story: str) -> Iterator[dict]:
+        """
+        Yield test cases one by one as the model streams them.
+        A truncated completion still yields every case that was closed before the cut.
+        Cached output is replayed, and concurrent identical requests share one stream.
+        """
+        query, key = self._prepare(story)
+        parser = JSONArrayStreamParser()
+        started = []
+
+        def _stream():
+            started.append(time.perf_counter())
+            for chunk in self.llm.stream(query):
+                yield chunk.content if hasattr(chunk, "content") else str(chunk)
+            METRICS.observe("llm", time.perf_counter() - started[0], 1)
+
+        cases = 0
+        for text in self.cache.stream_or_compute(key, _stream, cacheable=_parses):
+            for case in parser.feed(text):
+                if started and not cases:
+                    METRICS.observe("llm_first_case", time.perf_counter() - started[0], 1)
+                cases += 1
+                yield case
+
+    def _invoke(self, query: str) -> str:
+        with METRICS.timer("llm", items=1):
+            resp = self.llm.invoke(query)
+        return resp.content if hasattr(resp, "content") else str(resp)
+
+    def _model_id(self) -> str:
+        for attr in ("deployment_name", "model_name", "model"):
+            value = getattr(self.llm, attr, None)
+            if value:
+                return str(value)
+        return type(self.llm).__name__
+
     def _generate_from_template(self, story: str):
         """Fill test cases using the selected template."""
         lines = [line.strip() for line in story.splitlines() if line.strip()]
@@ -1,66 +1,536 @@
 # vector_db.py
 import chromadb
 from chromadb.utils import embedding_functions
+import json
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from embedding_cache import CachedEmbeddingFunction
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from near_duplicates import NearDuplicateFilter, NearDuplicateIndex
+from metrics import METRICS
+
+# Defaults for bulk writes: a batch is flushed when it reaches either limit.
+DEFAULT_BATCH_SIZE = int(os.getenv("VECTOR_DB_BATCH_SIZE", "256"))
+DEFAULT_BATCH_CHARS = int(os.getenv("VECTOR_DB_BATCH_CHARS", "500000"))
+# Embedding cache file, relative to the store directory; set to "" to disable.
+DEFAULT_EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+# BM25 index file, relative to the store directory; set to "" to disable hybrid retrieval.
+DEFAULT_LEXICAL_INDEX = os.getenv("LEXICAL_INDEX_PATH", "lexical_index.db")
+# MinHash LSH index of chunk texts, relative to the store directory; set to "" to disable near-duplicate skipping.
+DEFAULT_NEAR_DUP_INDEX = os.getenv("NEAR_DUP_INDEX_PATH", "near_dup_index.db")
+# Queries that are a single issue key skip embedding and use the lexical index only
+_EXACT_KEY = re.compile(r"^[A-Za-z][A-Za-z0-9]+-\d+$")
+# Entries kept in each in-memory query cache (embeddings and results); 0 disables it.
+DEFAULT_QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+# Write counter shared by every process on a store, relative to the store directory
+WRITE_VERSION_FILE = "write_version.db"
+# Written in the store directory once documents from before write stamping carry `ingest_source`
+LEGACY_STAMP_MARKER = "legacy_stamped"
+# Characters of content shown per document when browsing the store
+DEFAULT_PREVIEW_CHARS = 300
+
+
+def store_id(source: str, doc_id: str) -> str:
+    """Id a document is stored under: writes prefix the caller's id with its source."""
+    return f"{source}-{doc_id}"
+
+
+def _iter_batches(docs: Iterable[Tuple[str, str, dict]],
+                  batch_size: int,
+                  batch_chars: int) -> Iterator[List[Tuple[str, str, dict]]]:
+    """Group (doc_id, content, metadata) tuples by count and total characters."""
+    batch, chars = [], 0
+    for doc in docs:
+        size = len(doc[1] or "")
+        if batch and (len(batch) >= batch_size or chars + size > batch_chars):
+            yield batch
+            batch, chars = [], 0
+        batch.append(doc)
+        chars += size
+    if batch:
+        yield batch
+
+
+class QueryCache:
+    """
+    LRU caches for query embeddings and query results, shared by every client on
+    the same store path. Results are tagged with the write version they were
+    computed at; any add, upsert or delete bumps the version and drops them.
+
+    With `version_path` the version is a row in SQLite, read on every lookup,
+    so writes from job workers and other API processes invalidate it too.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_QUERY_CACHE_SIZE, version_path: str = None):
+        self.max_entries = max_entries
+        self.write_version = 0
+        self.stats = {"result_hits": 0, "result_misses": 0, "embedding_hits": 0, "embedding_misses": 0}
+        self._results: "OrderedDict[tuple, list]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if version_path:
+            self._conn = sqlite3.connect(version_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS write_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO write_version (id, version) VALUES (0, 0)")
+            self._conn.commit()
+            self._sync()
+
+    def _sync(self):
+        """Adopt the shared version, dropping results if another process wrote since. Caller holds the lock."""
+        if self._conn is None:
+            return
+        version = self._conn.execute("SELECT version FROM write_version WHERE id=0").fetchone()[0]
+        if version != self.write_version:
+            self.write_version = version
+            self._results.clear()
+
+    def current_version(self) -> int:
+        with self._lock:
+            self._sync()
+            return self.write_version
+
+    def bump(self):
+        with self._lock:
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("UPDATE write_version SET version = version + 1 WHERE id=0")
+                self._sync()
+            else:
+                self.write_version += 1
+            self._results.clear()
+
+    def _get(self, store: OrderedDict, key, counter: str):
+        with self._lock:
+            if store is self._results:
+                self._sync()
+            value = store.get(key)
+            if value is None:
+                self.stats[f"{counter}_misses"] += 1
+                return None
+            store.move_to_end(key)
+            self.stats[f"{counter}_hits"] += 1
+            return value
+
+    def _put(self, store: OrderedDict, key, value):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self.max_entries:
+            store.popitem(last=False)
+
+    def get_result(self, key):
+        return self._get(self._results, key, "result")
+
+    def put_result(self, key, version: int, value):
+        with self._lock:
+            self._sync()
+            # A write that landed while we were querying makes this result stale
+            if version == self.write_version and self.max_entries:
+                self._put(self._results, key, value)
+
+    def get_embedding(self, text: str):
+        return self._get(self._embeddings, text, "embedding")
+
+    def put_embedding(self, text: str, vector):
+        with self._lock:
+            if self.max_entries:
+                self._put(self._embeddings, text, vector)
+
+
+_query_caches: Dict[str, QueryCache] = {}
+_query_caches_lock = threading.Lock()
+
+
+def _shared_query_cache(path: str) -> QueryCache:
+    path = os.path.abspath(path)
+    with _query_caches_lock:
+        if path not in _query_caches:
+            _query_caches[path] = QueryCache(version_path=os.path.join(path, WRITE_VERSION_FILE))
+        return _query_caches[path]
+
 
 class VectorDBClient:
-    def __init__(self, path: str = "./vector_store"):
+    def __init__(self, path: str = "./vector_store",
+                 embedding_function=None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 batch_chars: int = DEFAULT_BATCH_CHARS,
+                 embedding_cache_path: str = DEFAULT_EMBEDDING_CACHE,
+                 lexical_index_path: str = DEFAULT_LEXICAL_INDEX,
+                 near_dup_index_path: str = DEFAULT_NEAR_DUP_INDEX):
+        self.path = path
         self.client = chromadb.PersistentClient(path=path)
+        embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
         self.collection = self.client.get_or_create_collection(
             name="gen_ai",
-            embedding_function=embedding_functions.DefaultEmbeddingFunction()
+            embedding_function=embedding_function
         )
+        # Vectors are computed here and passed explicitly, so the collection's
+        # persisted embedding-function config stays untouched by the cache.
+        self.embedder = embedding_function
+        if embedding_cache_path:
+            self.embedder = CachedEmbeddingFunction(
+                embedding_function, path=os.path.join(path, embedding_cache_path))
+        # Never exceed what the backing store accepts in a single call
+        self.batch_size = min(batch_size, self.client.get_max_batch_size())
+        self.batch_chars = batch_chars
+        # Streamlit rebuilds the client on every rerun, so the cache lives per store path
+        self.query_cache = _shared_query_cache(path)
+        # BM25 index maintained alongside the collection for exact-token retrieval
+        self.lexical = LexicalIndex(os.path.join(path, lexical_index_path)) if lexical_index_path else None
+        # Sketches of stored chunk texts, so ingestion can skip near-duplicates before embedding
+        self.near_dups = NearDuplicateIndex(os.path.join(path, near_dup_index_path)) if near_dup_index_path else None
 
     # ---------------- Add ----------------
     def add_document(self, source: str, doc_id: str, content: str, metadata: dict):
-        self.collection.add(
-            documents=[content],
-            metadatas=[metadata],
-            ids=[f"{source}-{doc_id}"]
-        )
+        self.add_documents(source, [(doc_id, content, metadata)])
+
+    # ---------------- Bulk add / upsert ----------------
+    def add_documents(self, source: str, docs: Iterable[Tuple[str, str, dict]],
+                      batch_size: int = None, batch_chars: int = None,
+                      on_written: Callable[[List[str]], None] = None) -> int:
+        """
+        Add (doc_id, content, metadata) tuples in batches.
+        Each batch is embedded in one call and committed once; `on_written`
+        gets the stored ids of each batch after its commit.
+        Existing ids are left untouched. Returns the number of documents sent.
+        """
+        return self._write_batched(self.collection.add, source, docs, batch_size, batch_chars,
+                                   keep_last=False, on_written=on_written)
+
+    def upsert_documents(self, source: str, docs: Iterable[Tuple[str, str, dict]],
+                         batch_size: int = None, batch_chars: int = None,
+                         on_written: Callable[[List[str]], None] = None) -> int:
+        """Same as `add_documents`, but overwrites documents whose id already exists."""
+        return self._write_batched(self.collection.upsert, source, docs, batch_size, batch_chars,
+                                   keep_last=True, on_written=on_written)
+
+    def _write_batched(self, write, source, docs, batch_size, batch_chars, keep_last: bool,
+                       on_written=None) -> int:
+        total = 0
+        for batch in _iter_batches(docs, batch_size or self.batch_size, batch_chars or self.batch_chars):
+            # Stamp every write so predicate deletes can match it server-side
+            stamp = {"ingest_source": source, "ingested_at": int(time.time())}
+            # Chroma rejects duplicate ids inside one call; mirror one-call-per-doc semantics
+            by_id = {}
+            for doc_id, content, metadata in batch:
+                full_id = store_id(source, doc_id)
+                if keep_last or full_id not in by_id:
+                    by_id[full_id] = (content, {**(metadata or {}), **stamp})
+            documents = [c for c, _ in by_id.values()]
+            try:
+                with METRICS.timer("embed", items=len(documents)):
+                    embeddings = self.embedder(documents)
+                with METRICS.timer("store_write", items=len(documents)):
+                    write(
+                        ids=list(by_id),
+                        documents=documents,
+                        embeddings=embeddings,
+                        metadatas=[m for _, m in by_id.values()],
+                    )
+                    if self.lexical is not None:
+                        self.lexical.upsert_many(zip(by_id, documents), replace=keep_last)
+            finally:
+                self.query_cache.bump()
+            total += len(by_id)
+            if on_written:
+                on_written(list(by_id))
+        return total
 
     # ---------------- Query ----------------
-    def query(self, query: str, top_k: int = 3):
-        results = self.collection.query(query_texts=[query], n_results=top_k)
+    def query(self, query: str, top_k: int = 3, where: dict = None):
+        with METRICS.timer("query", items=1):
+            return self._query(query, top_k, where)
+
+    def _query(self, query: str, top_k: int, where: dict):
+        key = (query, top_k, json.dumps(where, sort_keys=True) if where else None)
+        cached = self.query_cache.get_result(key)
+        if cached is not None:
+            return list(cached)
+
+        version = self.query_cache.current_version()
+        embedding = self.query_cache.get_embedding(query)
+        if embedding is None:
+            embedding = self.embedder([query])[0]
+            self.query_cache.put_embedding(query, embedding)
+
+        results = self.collection.query(query_embeddings=[embedding], n_results=top_k, where=where)
         if not results or "documents" not in results:
             return []
-        return [
+        docs = [
             {"id": results["ids"][0][i], "content": results["documents"][0][i]}
             for i in range(len(results["documents"][0]))
         ]
+        self.query_cache.put_result(key, version, docs)
+        return list(docs)
+
+    # ---------------- Hybrid query ----------------
+    def hybrid_query(self, query: str, top_k: int = 3, where: dict = None, rrf_k: int = 60):
+        """
+        Fuse dense (Chroma) and lexical (BM25) rankings with reciprocal-rank fusion.
+        A query that is just an issue key (e.g. TEST-123) is answered from the
+        lexical index alone, without embedding, unless no document holds it.
+        Falls back to `query` when the lexical index is disabled or empty; a
+        store created before the index existed is indexed by the
+        `lexical_index` job (see `needs_lexical_rebuild`), never inside a query.
+        """
+        if self.lexical is None or not len(self.lexical):
+            return self.query(query, top_k=top_k, where=where)
+        with METRICS.timer("hybrid_query", items=1):
+            return self._hybrid_query(query, top_k, where, rrf_k)
+
+    def _hybrid_query(self, query: str, top_k: int, where: dict, rrf_k: int):
+        key = ("hybrid", query, top_k, rrf_k, json.dumps(where, sort_keys=True) if where else None)
+        cached = self.query_cache.get_result(key)
+        if cached is not None:
+            return list(cached)
+        version = self.query_cache.current_version()
+
+        candidates = max(top_k * 4, 10)
+        ranked = []
+        if _EXACT_KEY.match(query.strip()):
+            ranked = self.lexical.lookup(query.strip(), limit=candidates)
+        if not ranked:  # not a key, or a key no document holds as a whole token
+            dense = [d["id"] for d in self.query(query, top_k=candidates, where=where)]
+            lexical = [doc_id for doc_id, _ in self.lexical.search(query, top_k=candidates)]
+            ranked = [doc_id for doc_id, _ in reciprocal_rank_fusion([dense, lexical], k=rrf_k)]
+
+        docs = self._fetch_ranked(ranked, top_k, where)
+        self.query_cache.put_result(key, version, docs)
+        return list(docs)
+
+    def _fetch_ranked(self, ranked: List[str], top_k: int, where: dict = None) -> List[dict]:
+        """Load contents for ranked ids, honouring `where`, keeping rank order."""
+        if not ranked:
+            return []
+        got = self.collection.get(ids=ranked, where=where, include=["documents"])
+        contents = dict(zip(got["ids"], got["documents"]))
+        return [{"id": doc_id, "content": contents[doc_id]} for doc_id in ranked if doc_id in contents][:top_k]
+
+    def needs_lexical_rebuild(self) -> bool:
+        """True when the lexical index is enabled but empty while the store holds documents."""
+        return self.lexical is not None and not len(self.lexical) and self.count() > 0
+
+    def rebuild_lexical_index(self, batch_size: int = 500) -> int:
+        """Re-index every stored document, e.g. for stores created before the index existed."""
+        if self.lexical is None:
+            return 0
+        self.lexical.clear()
+        total = 0
+        batch = []
+        for doc in self.iter_documents(batch_size=batch_size, include=("documents",)):
+            batch.append((doc["id"], doc["content"] or ""))
+            if len(batch) >= batch_size:
+                self.lexical.upsert_many(batch)
+                total += len(batch)
+                batch = []
+        self.lexical.upsert_many(batch)
+        self.query_cache.bump()
+        return total + len(batch)
+
+    def near_duplicate_filter(self) -> Optional[NearDuplicateFilter]:
+        """A filter for one ingest run (None when disabled); commit it after the kept chunks are written."""
+        return NearDuplicateFilter(self.near_dups) if self.near_dups is not None else None
+
+    def cache_stats(self) -> dict:
+        """Query cache hit/miss counters and the current write version."""
+        return {**self.query_cache.stats, "write_version": self.query_cache.current_version()}
 
     # ---------------- Count ----------------
     def count(self) -> int:
         try:
-            # Chroma v0.4+ does not have get_collection_stats; fallback to counting all docs
-            results = self.list_all(limit=10000)
-            return len(results)
+            return self.collection.count()
         except Exception:
             return 0
 
+    def existing_ids(self, ids: List[str], batch_size: int = None) -> set:
+        """The subset of `ids` currently stored, looked up by id in batches."""
+        batch_size = batch_size or self.batch_size
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            found.update(self.collection.get(ids=ids[start:start + batch_size], include=[])["ids"])
+        return found
+
+    # ---------------- Iterate ----------------
+    def iter_documents(self, batch_size: int = 500,
+                       include: Tuple[str, ...] = ("metadatas", "documents"),
+                       where: dict = None) -> Iterator[dict]:
+        """
+        Stream every stored document page by page using offset/limit `get` calls.
+        Pass include=("metadatas",) to fetch ids and metadata without contents.
+        """
+        include = list(include)
+        offset = 0
+        while True:
+            page = self.collection.get(where=where, limit=batch_size, offset=offset, include=include)
+            ids = page.get("ids") or []
+            for i, doc_id in enumerate(ids):
+                doc = {"id": doc_id}
+                if "documents" in include:
+                    doc["content"] = page["documents"][i]
+                if "metadatas" in include:
+                    doc["metadata"] = page["metadatas"][i] or {}
+                yield doc
+            if len(ids) < batch_size:
+                return
+            offset += batch_size
+
     # ---------------- List all ----------------
     def list_all(self, limit: int = 20):
         """Return up to `limit` documents with metadata for inspection."""
-        # Query with empty string to fetch all
-        results = self.collection.query(query_texts=[""], n_results=limit)
+        return list(islice(self.iter_documents(batch_size=max(1, min(limit, 500))), limit))
+
+    # ---------------- Browse ----------------
+    def count_where(self, source: str = None, artifact_type: str = None,
+                    project: str = None, flow_name: str = None) -> int:
+        """
+        Number of documents matching the filters. Unfiltered this is the store's
+        own counter; filtered, ids are fetched once and the count is cached
+        until the next write.
+        """
+        where = _build_where(source, artifact_type, project, flow_name, None, None)
+        if where is None:
+            return self.count()
+        key = ("count", json.dumps(where, sort_keys=True))
+        cached = self.query_cache.get_result(key)
+        if cached is not None:
+            return cached[0]
+        version = self.query_cache.current_version()
+        total = len(self.collection.get(where=where, include=[])["ids"])
+        self.query_cache.put_result(key, version, [total])
+        return total
+
+    def list_page(self, offset: int = 0, limit: int = 20,
+                  source: str = None, artifact_type: str = None,
+                  project: str = None, flow_name: str = None,
+                  preview_chars: int = DEFAULT_PREVIEW_CHARS) -> List[dict]:
+        """
+        One page of documents, selected by the store with offset/limit and the
+        same filters as `delete_where`. Contents are cut to `preview_chars`.
+        """
+        where = _build_where(source, artifact_type, project, flow_name, None, None)
+        page = self.collection.get(where=where, limit=limit, offset=offset,
+                                   include=["metadatas", "documents"])
         docs = []
-        for i, doc in enumerate(results["documents"][0]):
-            docs.append({
-                "id": results["ids"][0][i],
-                "content": doc,
-                "metadata": results["metadatas"][0][i] if "metadatas" in results else {}
-            })
+        for doc_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            content = content or ""
+            if len(content) > preview_chars:
+                content = content[:preview_chars] + "…"
+            docs.append({"id": doc_id, "content": content, "metadata": metadata or {}})
         return docs
 
     # ---------------- Delete by ID ----------------
-    def delete_document(self, doc_id: str):
+    def delete_document(self, doc_id: str) -> int:
         """Delete a single document by ID."""
-        self.collection.delete(ids=[doc_id])
+        return self.delete_where(ids=[doc_id])
 
     # ---------------- Delete by source ----------------
-    def delete_by_source(self, source: str):
-        """Delete all documents with the given source prefix."""
-        all_docs = self.list_all(limit=10000)
-        ids_to_delete = [d["id"] for d in all_docs if d["id"].startswith(f"{source}-")]
-        if ids_to_delete:
-            self.collection.delete(ids=ids_to_delete)
+    def delete_by_source(self, source: str) -> int:
+        """Delete all documents with the given source."""
+        return self.delete_where(source=source)
+
+    # ---------------- Delete by predicate ----------------
+    def delete_where(self, ids: List[str] = None,
+                     source: str = None,
+                     artifact_type: str = None,
+                     project: str = None,
+                     flow_name: str = None,
+                     ingested_after=None,
+                     ingested_before=None,
+                     batch_size: int = None) -> int:
+        """
+        Delete documents matching all given predicates, evaluated by the store.
+        `source` matches the ingest source or the metadata `source` field
+        (documents from before write stamping once `stamp_legacy_documents` ran);
+        `ingested_after`/`ingested_before` take epoch seconds or datetimes.
+        Returns the number of removed ids.
+        """
+        where = _build_where(source, artifact_type, project, flow_name, ingested_after, ingested_before)
+        if ids is None and where is None:
+            raise ValueError("delete_where needs at least one predicate")
+
+        batch_size = batch_size or self.batch_size
+        removed = 0
+        if ids is not None:
+            for start in range(0, len(ids), batch_size):
+                found = self.collection.get(ids=ids[start:start + batch_size], where=where, include=[])["ids"]
+                if found:
+                    self._delete_ids(found)
+                    removed += len(found)
+            return removed
+
+        while True:
+            # Always read from the head: the previous page is gone once deleted
+            found = self.collection.get(where=where, limit=batch_size, include=[])["ids"]
+            if not found:
+                break
+            self._delete_ids(found)
+            removed += len(found)
+        return removed
+
+    # ---------------- Migration ----------------
+    def needs_legacy_stamp(self) -> bool:
+        """True until `stamp_legacy_documents` has run on this store."""
+        return not os.path.exists(os.path.join(self.path, LEGACY_STAMP_MARKER))
+
+    def stamp_legacy_documents(self, batch_size: int = 500) -> int:
+        """
+        One-time migration: documents written before writes were stamped carry
+        their source only as the id prefix (`jira-KEY`). Give them that as
+        `ingest_source`, so `delete_where(source=...)` matches them server-side.
+        Returns the number stamped; later calls do nothing.
+        """
+        if not self.needs_legacy_stamp():
+            return 0
+        legacy = [(doc["id"], doc["metadata"])
+                  for doc in self.iter_documents(batch_size=batch_size, include=("metadatas",))
+                  if "-" in doc["id"] and "ingest_source" not in doc["metadata"]
+                  and "source" not in doc["metadata"]]
+        try:
+            for start in range(0, len(legacy), batch_size):
+                part = legacy[start:start + batch_size]
+                self.collection.update(ids=[doc_id for doc_id, _ in part],
+                                       metadatas=[{**meta, "ingest_source": doc_id.split("-", 1)[0]}
+                                                  for doc_id, meta in part])
+        finally:
+            self.query_cache.bump()
+        open(os.path.join(self.path, LEGACY_STAMP_MARKER), "w").close()
+        return len(legacy)
+
+    def _delete_ids(self, ids: List[str]):
+        try:
+            self.collection.delete(ids=ids)
+            if self.lexical is not None:
+                self.lexical.delete(ids)
+            if self.near_dups is not None:
+                self.near_dups.delete(ids)
+        finally:
+            self.query_cache.bump()
+
+
+def _epoch(value) -> int:
+    return int(value.timestamp()) if hasattr(value, "timestamp") else int(value)
+
+
+def _build_where(source, artifact_type, project, flow_name, ingested_after, ingested_before):
+    """Translate filter predicates into a Chroma `where` filter (None when empty)."""
+    clauses = []
+    if source:
+        clauses.append({"$or": [{"ingest_source": source}, {"source": source}]})
+    for key, value in (("artifact_type", artifact_type), ("project", project), ("flow_name", flow_name)):
+        if value:
+            clauses.append({key: value})
+    if ingested_after is not None:
+        clauses.append({"ingested_at": {"$gte": _epoch(ingested_after)}})
+    if ingested_before is not None:
+        clauses.append({"ingested_at": {"$lt": _epoch(ingested_before)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,272 @@
+# benchmarks/bench_ingest.py
+"""
+Micro-benchmarks for the ingestion hot paths on generated corpora.
+
+    python benchmarks/bench_ingest.py --out bench.json
+    python benchmarks/bench_ingest.py --scales 1 10 --only chunk html --compare bench.json
+
+Runs offline: the end-to-end case uses a temporary Chroma store and a deterministic
+fake embedder. Results are JSON; `--compare` reports the ratio against an earlier run
+and exits non-zero when a case got slower than `--tolerance`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from fake_embedding import FakeEmbeddingFunction  # noqa: E402
+from metadata_utils import canonical_sha256, canonicalize_for_hash, compute_sha256, sanitize_events  # noqa: E402
+from parse_playwright import parse_playwright_code  # noqa: E402
+from sources.documents import _chunk_text_by_words, _extract_text_from_html  # noqa: E402
+
+SEED = 1234
+WORDS = ("invoice purchase order vendor approval workflow supplier payment terms delivery "
+         "contract amendment budget requisition receipt ledger tax currency region audit").split()
+
+
+# ---------------- Corpora ----------------
+def make_text(words: int, seed: int = SEED) -> str:
+    rng = random.Random(seed)
+    lines, line = [], []
+    for i in range(words):
+        line.append(rng.choice(WORDS) if i % 11 else f"PO-{rng.randrange(10**6):06d}")
+        if len(line) >= 12:
+            lines.append(" ".join(line))
+            line = []
+    lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def make_events(n: int, seed: int = SEED) -> List[Dict]:
+    rng = random.Random(seed)
+    selectors = ["#username", "#password", "input[name=card]", "button.submit", "#search", "a.nav-link"]
+    return [{
+        "type": rng.choice(["click", "input", "change"]),
+        "selector": f"  {rng.choice(selectors)}  ",
+        "action": "fill" if i % 3 == 0 else "click",
+        "url": f"https://erp.example.com/page/{i % 50}",
+        "tag": rng.choice(["input", "button", "a"]),
+        "text": rng.choice(WORDS),
+        "value": rng.choice(WORDS) if i % 3 == 0 else None,
+        "parent_hierarchy": ["form", "div", "section"],
+        "timestamp": i,  # dropped by sanitize_events
+    } for i in range(n)]
+
+
+def make_html(paragraphs: int, seed: int = SEED) -> str:
+    rng = random.Random(seed)
+    body = "".join(f"<p>{' '.join(rng.choice(WORDS) for _ in range(40))}</p>" for _ in range(paragraphs))
+    nav = "".join(f'<li><a href="/p/{i}">link {i}</a></li>' for i in range(50))
+    return (f"<html><head><title>Manual</title><style>p {{}}</style></head><body><nav><ul>{nav}</ul></nav>"
+            f"<main>{body}</main><footer>footer</footer></body></html>")
+
+
+def make_spec(steps: int) -> str:
+    lines = [
+        "  await page.goto('https://erp.example.com/page/{i}');",
+        "  await page.getByRole('textbox', {{ name: 'Field {i}' }}).fill('value {i}');",
+        "  await page\n    .getByRole('button', {{ name: 'Save {i}' }})\n    .click();",
+        "  await expect(page.getByText('Saved {i}')).toBeVisible();",
+    ]
+    body = "\n".join(lines[i % len(lines)].format(i=i) for i in range(steps))
+    return "test('generated', async ({ page }) => {\n" + body + "\n});\n"
+
+
+# ---------------- Cases ----------------
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _peak_kb(fn: Callable[[], object]) -> int:
+    """Peak Python allocation during one call, in KiB (measured separately from timing)."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _case(name: str, size: int, unit: str, seconds: float, **extra) -> Dict:
+    return {"case": name, "size": size, "unit": unit, "seconds": round(seconds, 6),
+            "per_second": round(size / seconds, 1) if seconds else None, **extra}
+
+
+def bench_chunk(scale: int, repeat: int) -> Dict:
+    words = 20_000 * scale
+    text = make_text(words)
+    chunks = sum(1 for _ in _chunk_text_by_words(text))
+    return _case("chunk_text_by_words", words, "words",
+                 _time(lambda: sum(1 for _ in _chunk_text_by_words(text)), repeat), chunks=chunks)
+
+
+def _flow(scale: int) -> Dict:
+    events = make_events(1_000 * scale)
+    return {"flow_name": "bench", "steps": events, "url": None, "meta": {"recorded_by": "bench"}}
+
+
+def bench_hash(scale: int, repeat: int) -> Dict:
+    artifact = _flow(scale)
+    run = lambda: compute_sha256(canonicalize_for_hash(artifact))  # noqa: E731
+    return _case("canonicalize_and_sha256", len(artifact["steps"]), "events", _time(run, repeat),
+                 peak_kb=_peak_kb(run))
+
+
+def bench_hash_stream(scale: int, repeat: int) -> Dict:
+    artifact = _flow(scale)
+    run = lambda: canonical_sha256(artifact)  # noqa: E731
+    return _case("canonical_sha256_streaming", len(artifact["steps"]), "events", _time(run, repeat),
+                 peak_kb=_peak_kb(run))
+
+
+def bench_sanitize(scale: int, repeat: int) -> Dict:
+    events = make_events(1_000 * scale)
+    return _case("sanitize_events", len(events), "events", _time(lambda: sanitize_events(events), repeat))
+
+
+def bench_playwright(scale: int, repeat: int) -> Dict:
+    steps = 1_000 * scale
+    code = make_spec(steps)
+    return _case("parse_playwright_code", steps, "steps", _time(lambda: parse_playwright_code(code), repeat))
+
+
+def bench_html(scale: int, repeat: int) -> Dict:
+    html = make_html(200 * scale)
+    return _case("extract_text_from_html", len(html), "bytes",
+                 _time(lambda: _extract_text_from_html(html), repeat))
+
+
+def bench_ingest(scale: int, repeat: int) -> Dict:
+    """
+    End to end: load, chunk, sanitize and embed one text file into a fresh temporary
+    store; `reingest_seconds` is a second pass over the unchanged file.
+    """
+    words = 20_000 * scale
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    cwd = os.getcwd()
+    try:
+        # ingest.py opens ./vector_store and ./app/saved_flows on import; keep them in the temp dir
+        os.chdir(workdir)
+        import hashstore
+        import ingest
+        from vector_db import VectorDBClient
+
+        path = os.path.join(workdir, "manual.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(make_text(words))
+
+        best, again, chunks, stored = float("inf"), float("inf"), 0, 0
+        for run in range(repeat):
+            # File fingerprints live in the hashstore; a fresh one per run so the first pass parses
+            hashstore._default_store = hashstore.HashStore(os.path.join(workdir, f"hashes_{run}.db"))
+            ingest.db = VectorDBClient(path=os.path.join(workdir, f"store_{run}"),
+                                       embedding_function=FakeEmbeddingFunction(dim=384))
+            with contextlib.redirect_stdout(sys.stderr):  # ingest progress lines; stdout is the report
+                started = time.perf_counter()
+                chunks = len(ingest.ingest_document(path, workers=1))
+                best = min(best, time.perf_counter() - started)
+                stored = ingest.db.count()
+                started = time.perf_counter()
+                ingest.ingest_document(path, workers=1)
+                again = min(again, time.perf_counter() - started)
+        return _case("ingest_document", words, "words", best, chunks=chunks, stored_docs=stored,
+                     reingest_seconds=round(again, 6))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+CASES = {
+    "chunk": bench_chunk,
+    "hash": bench_hash,
+    "hash_stream": bench_hash_stream,
+    "sanitize": bench_sanitize,
+    "playwright": bench_playwright,
+    "html": bench_html,
+    "ingest": bench_ingest,
+}
+
+
+# ---------------- Reporting ----------------
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[Dict]:
+    """Ratio of new/old seconds per (case, size); `regressed` when slower than 1 + tolerance."""
+    old = {(r["case"], r["size"]): r["seconds"] for r in baseline}
+    rows = []
+    for r in results:
+        before = old.get((r["case"], r["size"]))
+        if before:
+            ratio = r["seconds"] / before
+            rows.append({"case": r["case"], "size": r["size"], "ratio": round(ratio, 3),
+                         "regressed": ratio > 1 + tolerance})
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingestion micro-benchmarks")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16],
+                        help="Corpus size multipliers, run in increasing order")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), help="Run only these cases")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is kept")
+    parser.add_argument("--out", help="Write JSON here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or CASES:
+        for scale in sorted(args.scales):
+            results.append({**CASES[name](scale, args.repeat), "scale": scale})
+            print(f"{name} x{scale}: {results[-1]['seconds']}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            report["comparison"] = compare(results, json.load(fh)["results"], args.tolerance)
+        status = 1 if any(row["regressed"] for row in report["comparison"]) else 0
+
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# benchmarks/bench_parse_playwright.py
+"""
+Compare the single-pass parse_playwright_code against the old per-line regex parser
+on generated codegen specs. Single-line chains take the regex fast path; multiline
+(prettier-formatted) chains go through the tokenizer.
+
+    python benchmarks/bench_parse_playwright.py --steps 1000 10000 50000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from parse_playwright import parse_playwright_code  # noqa: E402
+
+# ---------------- Legacy parser (per-line regexes, kept for comparison) ----------------
+LEGACY_PATTERNS = {
+    "goto": re.compile(r'page\.goto\(["\'](.*?)["\']\)'),
+    "click": re.compile(r'page\.(getByRole|getByText|getByLabel|getByTitle|locator)\(.*?\)\.click\(\)'),
+    "fill": re.compile(r'page\.(getByRole|getByLabel|getByTitle|locator)\(.*?\)\.fill\(["\'].*?["\']\)'),
+    "select_option": re.compile(r'page\.(getByRole|getByLabel|locator)\(.*?\)\.selectOption\(["\'].*?["\']\)'),
+}
+
+
+def legacy_parse(code: str):
+    steps = []
+    for line in code.splitlines():
+        line = line.strip()
+        match = LEGACY_PATTERNS["goto"].search(line)
+        if match:
+            steps.append({"action": "goto", "url": match.group(1)})
+            continue
+        if LEGACY_PATTERNS["fill"].search(line):
+            steps.append({"action": "fill", "selector": line.split(".fill")[0], "value": "<PLACEHOLDER>"})
+            continue
+        if LEGACY_PATTERNS["click"].search(line):
+            steps.append({"action": "click", "selector": line.split(".click")[0]})
+            continue
+        if LEGACY_PATTERNS["select_option"].search(line):
+            steps.append({"action": "select_option", "selector": line.split(".selectOption")[0],
+                          "value": "<PLACEHOLDER>"})
+    return steps
+
+
+# ---------------- Spec generation ----------------
+LINES = [
+    "  await page.goto('https://example.com/page/{i}');",
+    "  await page.getByRole('textbox', {{ name: 'Field {i}' }}).click();",
+    "  await page.getByRole('textbox', {{ name: 'Field {i}' }}).fill('value {i}');",
+    "  await page.getByLabel('Option {i}').selectOption('choice');",
+    "  await page.locator('#row-{i} > td:nth-child(2)').click();",
+]
+
+
+def make_spec(steps: int, multiline: bool = False) -> str:
+    """Generated codegen spec; `multiline` splits each chain the way prettier does."""
+    lines = (LINES[i % len(LINES)].format(i=i) for i in range(steps))
+    if multiline:
+        lines = (line.replace(").", ")\n    .").replace("page.", "page\n    .", 1) for line in lines)
+    body = "\n".join(lines)
+    return ("import { test, expect } from '@playwright/test';\n\n"
+            "test('generated', async ({ page }) => {\n" + body + "\n});\n")
+
+
+def _time(fn, code: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(code)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = []
+    for steps in args.steps:
+        # The legacy parser only reads single-line chains, so both layouts are
+        # compared against its time on the single-line spec of the same step count
+        single_line = make_spec(steps)
+        assert parse_playwright_code(single_line) == legacy_parse(single_line), "parsers disagree on single-line spec"
+        legacy = _time(legacy_parse, single_line, args.repeat)
+        for multiline in (False, True):
+            code = make_spec(steps, multiline)
+            found = len(parse_playwright_code(code))
+            assert found == steps, f"found {found} of {steps} steps"
+            single_pass = _time(parse_playwright_code, code, args.repeat)
+            results.append({
+                "steps": steps,
+                "layout": "multiline" if multiline else "single-line",
+                "bytes": len(code),
+                "legacy_single_line_s": round(legacy, 4),
+                "legacy_us_per_step": round(legacy / steps * 1e6, 2),
+                "single_pass_s": round(single_pass, 4),
+                "us_per_step": round(single_pass / steps * 1e6, 2),
+                "vs_legacy": round(single_pass / legacy, 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
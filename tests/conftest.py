@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# Modules under app/ import their siblings by bare name (they run from that directory)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from fake_embedding import FakeEmbeddingFunction  # noqa: E402
+
+
+@pytest.fixture
+def fake_embedder():
+    return FakeEmbeddingFunction()
+
+
+@pytest.fixture
+def vector_db(tmp_path, fake_embedder):
+    from app.vector_db import VectorDBClient
+    return VectorDBClient(path=str(tmp_path / "store"), embedding_function=fake_embedder)
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import create_app
+from metrics import METRICS
+
+
+class FakeGenerator:
+    def generate_test_cases(self, story: str):
+        return [{"id": 1, "title": f"covers {story}", "steps": [], "expected": "ok"}]
+
+
+@pytest.fixture
+def client(vector_db):
+    with TestClient(create_app(db=vector_db, generator=FakeGenerator(), threads=4)) as c:
+        yield c
+
+
+def _ndjson(records):
+    return "\n".join(json.dumps(r) for r in records) + "\n"
+
+
+def test_bulk_ingest_streams_batches(client, vector_db):
+    vector_db.batch_size = 4
+    records = [{"id": f"d{i}", "content": f"invoice approval step {i}", "metadata": {"n": i, "tags": ["a"]}}
+               for i in range(10)]
+
+    def body():  # arrives in small pieces, split mid-line
+        payload = _ndjson(records).encode()
+        for i in range(0, len(payload), 37):
+            yield payload[i:i + 37]
+
+    resp = client.post("/ingest/bulk?source=docs", content=body(),
+                       headers={"content-type": "application/x-ndjson"})
+    assert resp.status_code == 200
+    assert resp.json() == {"received": 10, "written": 10, "failed": 0, "errors": []}
+    assert vector_db.count() == 10
+    stored = vector_db.collection.get(ids=["docs-d3"])
+    assert stored["documents"] == ["invoice approval step 3"]
+    assert stored["metadatas"][0]["tags"] == "['a']"
+
+
+def test_bulk_ingest_reports_bad_lines(client, vector_db):
+    payload = _ndjson([{"id": "ok", "content": "fine"}]) + "not json\n" + '{"id": "x"}\n' + "\n" + "[1]"
+    resp = client.post("/ingest/bulk", content=payload)
+    body = resp.json()
+    assert body["received"] == 4 and body["written"] == 1 and body["failed"] == 3
+    assert [e["line"] for e in body["errors"]] == [2, 3, 5]
+    assert vector_db.count() == 1
+
+
+def test_retrieve_multi_query_keeps_order(client, vector_db):
+    vector_db.add_documents("docs", [
+        ("inv", "invoice approval workflow", {}),
+        ("pay", "payment terms for vendors", {}),
+        ("key", "TEST-42 login story", {}),
+    ])
+    resp = client.post("/retrieve", json={"queries": ["TEST-42", "invoice approval", "payment terms"],
+                                          "top_k": 1})
+    results = resp.json()["results"]
+    assert [r["query"] for r in results] == ["TEST-42", "invoice approval", "payment terms"]
+    assert results[0]["documents"][0]["id"] == "docs-key"
+    assert all(len(r["documents"]) == 1 for r in results)
+
+
+def test_retrieve_validates_body(client):
+    assert client.post("/retrieve", json={"queries": []}).status_code == 422
+
+
+def test_generate_batch(client):
+    resp = client.post("/generate", json={"stories": [{"key": "T-1", "text": "login"},
+                                                     {"key": "T-2", "text": "logout"}]})
+    body = resp.json()
+    assert body["summary"]["stories"] == 2 and body["summary"]["failed"] == 0
+    by_key = {r["key"]: r for r in body["records"]}
+    assert by_key["T-2"]["test_cases"][0]["title"] == "covers logout"
+
+
+def test_metrics_endpoint(client):
+    METRICS.reset()
+    client.post("/ingest/bulk", content=_ndjson([{"id": "a", "content": "text"}]))
+    text = client.get("/metrics").text
+    assert 'testgen_stage_items_total{stage="store_write"} 1' in text
+    METRICS.reset()
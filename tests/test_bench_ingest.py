@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_ingest  # noqa: E402
+
+
+def test_benchmarks_emit_comparable_json(tmp_path):
+    out = tmp_path / "bench.json"
+    assert bench_ingest.main(["--scales", "1", "--only", "chunk", "sanitize", "playwright",
+                              "--repeat", "1", "--out", str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert [r["case"] for r in report["results"]] == [
+        "chunk_text_by_words", "sanitize_events", "parse_playwright_code"]
+    assert all(r["seconds"] > 0 for r in report["results"])
+
+    slower = [{**r, "seconds": r["seconds"] / 10} for r in report["results"]]
+    rows = bench_ingest.compare(report["results"], slower, tolerance=0.2)
+    assert rows and all(row["regressed"] for row in rows)
+
+
+def test_fake_embedder_is_deterministic():
+    embed = bench_ingest.FakeEmbeddingFunction(dim=16)
+    first, second = ([list(map(float, v)) for v in embed(["a", "b"])] for _ in range(2))
+    assert first == second and first[0] != first[1]
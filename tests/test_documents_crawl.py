@@ -0,0 +1,199 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.sources.documents import crawl_site, load_documents
+
+# page -> links; every page links back to the index to exercise de-duplication
+SITE = {
+    "/": ["/a", "/b", "/c#section", "https://elsewhere.example/x"],
+    "/a": ["/", "/a1", "/a2"],
+    "/b": ["/", "/a", "/b1"],
+    "/c": ["/"],
+    "/a1": ["/deeper"],
+    "/a2": [],
+    "/b1": ["/missing"],
+    "/deeper": [],
+}
+
+
+@pytest.fixture
+def site():
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path not in SITE:
+                self.send_error(404)
+                return
+            links = "".join(f'<a href="{href}">link</a>' for href in SITE[self.path])
+            body = f"<html><title>{self.path}</title><body><p>page {self.path} body</p>{links}</body></html>"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_crawl_fetches_each_page_once_in_frontier_order(site):
+    base, hits = site
+    pages = [url[len(base):] for url, _, _ in crawl_site(base + "/", crawl_depth=2, max_workers=4)]
+
+    assert pages == ["/", "/a", "/b", "/c", "/a1", "/a2", "/b1"]
+    assert all(count == 1 for count in hits.values())
+    assert "/deeper" not in hits  # beyond crawl depth
+
+
+def test_crawl_respects_max_pages_and_skips_failures(site):
+    base, hits = site
+    pages = [url[len(base):] for url, _, _ in crawl_site(base + "/", crawl_depth=3, max_pages=3)]
+    assert pages == ["/", "/a", "/b"]
+
+    pages = [url[len(base):] for url, _, _ in crawl_site(base + "/b1", crawl_depth=1)]
+    assert pages == ["/b1"]  # /missing returns 404 and is skipped
+
+
+def test_load_documents_streams_chunks_from_crawl(site):
+    base, _ = site
+    docs = list(load_documents(base + "/", crawl_depth=1))
+    assert [meta["url"][len(base):] for _, _, meta in docs] == ["/", "/a", "/b", "/c"]
+    doc_id, chunk, meta = docs[1]
+    assert doc_id == f"{base}/a::chunk_0"
+    assert chunk.startswith("page /a body")
+    assert meta["title"] == "/a"
+
+
+@pytest.fixture
+def versioned_site():
+    """Pages whose bodies can change; /etag/* pages honour If-None-Match, /plain/* send no validators."""
+    pages = {
+        "/": '<a href="/etag/a">a</a><a href="/plain/b">b</a>',
+        "/etag/a": '<p>alpha page</p><a href="/etag/deep">deep</a>',
+        "/plain/b": "<p>beta page</p>",
+        "/etag/deep": "<p>deep page</p>",
+    }
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in pages:
+                self.send_error(404)
+                return
+            data = f"<html><title>{self.path}</title><body>{pages[self.path]}</body></html>".encode("utf-8")
+            etag = f'"{hash(data) & 0xffffffff:x}"'
+            use_etag = self.path == "/" or self.path.startswith("/etag/")
+            if use_etag and self.headers.get("If-None-Match") == etag:
+                requests_seen.append((self.path, 304))
+                self.send_response(304)
+                self.end_headers()
+                return
+            requests_seen.append((self.path, 200))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            if use_etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", pages, requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_recrawl_skips_not_modified_and_identical_pages(versioned_site, tmp_path):
+    from sources.http_cache import CrawlCache
+    from sources.documents import crawl_site as crawl
+
+    base, pages, seen = versioned_site
+    cache = CrawlCache(str(tmp_path / "http_cache.db"))
+
+    stats = {}
+    first = [url[len(base):] for url, _, _ in crawl(base + "/", crawl_depth=2, cache=cache, stats=stats)]
+    assert first == ["/", "/etag/a", "/plain/b", "/etag/deep"]
+    assert stats == {"fetched": 4, "not_modified": 0, "unchanged": 0, "changed": 4, "failed": 0}
+    cache.commit({})
+
+    # Nothing changed: 304s for ETag pages, a body-hash match for the plain one; links still followed
+    seen.clear()
+    stats = {}
+    assert list(crawl(base + "/", crawl_depth=2, cache=cache, stats=stats)) == []
+    assert stats == {"fetched": 1, "not_modified": 3, "unchanged": 1, "changed": 0, "failed": 0}
+    assert sorted(seen) == [("/", 304), ("/etag/a", 304), ("/etag/deep", 304), ("/plain/b", 200)]
+    cache.commit({})
+
+    pages["/etag/deep"] = "<p>deep page, revised</p>"
+    pages["/plain/b"] = "<p>beta page, revised</p>"
+    stats = {}
+    changed = [(url[len(base):], text) for url, _, text in crawl(base + "/", crawl_depth=2, cache=cache, stats=stats)]
+    assert changed == [("/plain/b", "beta page, revised"), ("/etag/deep", "deep page, revised")]
+    assert stats["changed"] == 2 and stats["not_modified"] == 2
+
+    # Not committed (the ingest failed, say): the next crawl still sees the changes
+    cache.discard()
+    again = [url[len(base):] for url, _, _ in crawl(base + "/", crawl_depth=2, cache=cache)]
+    assert again == ["/plain/b", "/etag/deep"]
+
+    # revalidate=False ignores the cache for skipping
+    assert len(list(crawl(base + "/", crawl_depth=2, cache=cache, revalidate=False))) == 4
+
+
+def test_ingest_web_site_recrawl(versioned_site, tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest opens ./vector_store on import
+    import ingest
+    monkeypatch.setattr(ingest, "db", vector_db)
+    base, pages, _ = versioned_site
+    pages["/plain/b"] = "<p>" + " ".join(f"beta{i}" for i in range(900)) + "</p>"  # several chunks
+
+    stats = {}
+    first = ingest.ingest_web_site(base + "/", max_depth=2, crawl_stats=stats)
+    assert stats["changed"] == 4
+    b_chunks = sum(1 for d in first if d["id"].startswith(base + "/plain/b::"))
+    assert b_chunks > 1
+    total = vector_db.count()
+
+    stats = {}
+    assert ingest.ingest_web_site(base + "/", max_depth=2, crawl_stats=stats) == []
+    assert stats["changed"] == 0 and stats["not_modified"] == 3 and stats["unchanged"] == 1
+
+    # /plain/b shrinks to one chunk: it is overwritten and its extra chunks removed
+    pages["/plain/b"] = "<p>beta page, short now</p>"
+    stats = {}
+    docs = ingest.ingest_web_site(base + "/", max_depth=2, crawl_stats=stats)
+    assert [d["content"] for d in docs] == ["beta page, short now"]
+    assert vector_db.count() == total - (b_chunks - 1)
+    stored = vector_db.collection.get(ids=[f"website-{base}/plain/b::chunk_0"])
+    assert stored["documents"] == ["beta page, short now"]
+
+    # /etag/deep now repeats /etag/a: skipped as a near-duplicate, its old chunk is removed
+    pages["/etag/deep"] = pages["/etag/a"]
+    assert ingest.ingest_web_site(base + "/", max_depth=2) == []
+    assert vector_db.collection.get(ids=[f"website-{base}/etag/deep::chunk_0"])["ids"] == []
+    assert vector_db.count() == total - b_chunks
+
+    # An admin deletes the site's chunks: the next crawl fetches and stores the pages again
+    vector_db.delete_where(source="website")
+    stats = {}
+    restored = ingest.ingest_web_site(base + "/", max_depth=2, crawl_stats=stats)
+    assert stats["not_modified"] == 0 and stats["changed"] == 4
+    assert {d["id"].split("::")[0][len(base):] for d in restored} == {"/", "/etag/a", "/plain/b"}
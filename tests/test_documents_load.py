@@ -0,0 +1,70 @@
+from app.sources.documents import _iter_words, iter_chunk_spans, load_documents, load_files
+
+
+def _write_corpus(tmp_path, n_files=5, words=1200):
+    for i in range(n_files):
+        (tmp_path / f"doc{i}.txt").write_text(" ".join(f"w{i}_{j}" for j in range(words)), encoding="utf-8")
+    return sorted(str(p) for p in tmp_path.iterdir())
+
+
+def test_parallel_directory_parse_matches_sequential(tmp_path):
+    _write_corpus(tmp_path)
+    sequential = list(load_documents(str(tmp_path), max_tokens=None))
+    parallel = list(load_documents(str(tmp_path), workers=3, max_tokens=None))
+
+    assert len(sequential) == 20
+    assert sorted(parallel, key=lambda d: d[0]) == sorted(sequential, key=lambda d: d[0])
+
+
+def test_parallel_keeps_per_file_order_and_closes_early(tmp_path):
+    files = _write_corpus(tmp_path, n_files=4, words=5000)
+    chunks = list(load_files(files, workers=2, queue_size=1))
+    for fpath in files:
+        indexes = [meta["chunk_index"] for _, _, meta in chunks if meta["file"] == fpath]
+        assert indexes == sorted(indexes)
+
+    stream = load_files(files, workers=2, queue_size=1)
+    next(stream)
+    stream.close()  # must not hang on workers blocked by the bounded queue
+
+
+def test_chunk_spans_slice_the_source_with_word_overlap():
+    text = "  alpha beta\n\ngamma   delta epsilon zeta eta  "
+    spans = list(iter_chunk_spans(text, chunk_size_words=3, overlap_words=1, max_tokens=None))
+    assert [text[s:e].split() for s, e in spans] == [
+        ["alpha", "beta", "gamma"], ["gamma", "delta", "epsilon"], ["epsilon", "zeta", "eta"]]
+    assert list(iter_chunk_spans("   ")) == []
+
+
+def test_chunk_spans_respect_token_budget():
+    text = " ".join(f"INV-{i:06d}" for i in range(2000))
+    for start, end in iter_chunk_spans(text, chunk_size_words=400, overlap_words=50, max_tokens=64):
+        assert sum(tokens for _, _, tokens in _iter_words(text[start:end])) <= 62
+
+
+def test_loaded_chunk_offsets_point_into_source(tmp_path):
+    path = tmp_path / "notes.txt"
+    text = "\n".join(f"line {i} with some words" for i in range(500))
+    path.write_text(text, encoding="utf-8")
+    chunks = list(load_files([str(path)]))
+    assert len(chunks) > 1
+    for _, content, meta in chunks:
+        assert text[meta["char_start"]:meta["char_end"]] == content
+
+
+def test_ingested_chunks_keep_their_spans_as_metadata(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest opens ./vector_store on import
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+    fpath = str(tmp_path / "doc.txt")
+    (tmp_path / "doc.txt").write_text(" ".join(f"word{j}" for j in range(900)), encoding="utf-8")
+    ingest.ingest_documents([fpath], workers=1)
+
+    got = vector_db.collection.get(where={"file": fpath}, include=["metadatas", "documents"])
+    assert len(got["ids"]) > 1
+    source = open(fpath, encoding="utf-8").read()
+    for content, meta in zip(got["documents"], got["metadatas"]):
+        assert {"file", "page_index", "chunk_index", "char_start", "char_end"} <= meta.keys()
+        assert source[meta["char_start"]:meta["char_end"]] == content
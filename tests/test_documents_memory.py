@@ -0,0 +1,92 @@
+import tracemalloc
+
+from langchain_core.documents import Document
+
+from app.sources import documents
+from app.sources.documents import RSSGuard, load_files
+
+PAGES = 1000
+PAGE_WORDS = 500  # ~4 KB of text per page, ~4 MB for the whole document
+
+
+class FakePDFLoader:
+    """Synthetic 1,000-page PDF; pages are produced only as they are requested."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        raise AssertionError("loader.load() materializes every page")
+
+    def lazy_load(self):
+        for page in range(PAGES):
+            yield Document(page_content=f"page {page} clause " * (PAGE_WORDS // 3), metadata={"page": page})
+
+
+class FakeWordLoader:
+    def __init__(self, path, mode="single"):
+        assert mode == "elements"
+
+    def lazy_load(self):
+        for text, page in (("Title", 1), ("Intro", 1), ("Terms", 2)):
+            yield Document(page_content=text, metadata={"page_number": page})
+
+
+def test_pdf_pages_stream_with_bounded_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "_HAVE_LC_LOADERS", True)
+    monkeypatch.setattr(documents, "PyPDFLoader", FakePDFLoader, raising=False)
+    path = tmp_path / "manual.pdf"
+    path.write_bytes(b"%PDF-1.4")
+
+    tracemalloc.start()
+    try:
+        pages = set()
+        chunks = 0
+        for _, content, meta in load_files([str(path)]):
+            pages.add(meta["page_index"])
+            chunks += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(pages) == PAGES and chunks > PAGES
+    assert peak < 2**20, f"peak traced memory {peak / 2**20:.1f} MB"
+
+
+def test_docx_elements_are_grouped_by_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "_HAVE_LC_LOADERS", True)
+    monkeypatch.setattr(documents, "UnstructuredWordDocumentLoader", FakeWordLoader, raising=False)
+    path = tmp_path / "contract.docx"
+    path.write_bytes(b"PK")
+
+    chunks = [(meta["page_index"], content) for _, content, meta in load_files([str(path)])]
+    assert chunks == [(0, "Title\n\nIntro"), (1, "Terms")]
+
+
+def test_rss_guard_waits_for_flush_only_when_over_limit(monkeypatch):
+    rss = {"mb": 50.0}
+    monkeypatch.setattr(documents, "_rss_mb", lambda pid=None: rss["mb"])
+    guard = RSSGuard(100, poll=0.001, timeout=5)
+    calls = []
+
+    guard.wait(lambda: calls.append(1) or True)
+    assert guard.pauses == 0 and not calls
+
+    rss["mb"] = 500.0
+    guard.wait(lambda: calls.append(1) or len(calls) >= 3)
+    assert guard.pauses == 1 and len(calls) == 3
+
+    guard.timeout = 0.01
+    guard.wait(lambda: False)  # never flushes: gives up instead of hanging
+    assert guard.pauses == 2
+
+
+def test_parallel_load_with_tripped_guard_still_completes(tmp_path):
+    files = []
+    for i in range(3):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(" ".join(f"w{i}_{j}" for j in range(3000)), encoding="utf-8")
+        files.append(str(path))
+
+    guarded = list(load_files(files, workers=2, max_rss_mb=1))  # always over: workers wait on every page
+    assert sorted(d[0] for d in guarded) == sorted(d[0] for d in load_files(files))
@@ -0,0 +1,39 @@
+from app.embedding_cache import CachedEmbeddingFunction, embedding_key
+
+
+def test_identical_text_is_embedded_once_across_instances(tmp_path, fake_embedder):
+    path = str(tmp_path / "emb.db")
+    cached = CachedEmbeddingFunction(fake_embedder, path=path, model_id="fake")
+    first = cached(["hello  world", "other", "hello world"])
+    assert fake_embedder.texts == 2
+    assert cached.misses == 2 and cached.hits == 1
+    assert list(first[0]) == list(first[2])
+    cached.close()
+
+    # a new process/instance reuses the stored vectors
+    reopened = CachedEmbeddingFunction(fake_embedder, path=path, model_id="fake")
+    again = reopened(["hello world", "other"])
+    assert fake_embedder.texts == 2
+    assert [list(v) for v in again] == [list(first[0]), list(first[1])]
+
+
+def test_cache_key_includes_model_and_evicts_lru(tmp_path, fake_embedder):
+    assert embedding_key("a", "m1") != embedding_key("a", "m2")
+    assert embedding_key("a  b\n", "m1") == embedding_key("a b", "m1")
+
+    cached = CachedEmbeddingFunction(fake_embedder, path=str(tmp_path / "emb.db"), max_entries=2)
+    cached(["one"])
+    cached(["two"])
+    cached(["one"])  # refresh "one"
+    cached(["three"])  # evicts "two"
+    assert len(cached) == 2
+    cached(["one", "two"])
+    assert cached.misses == 4
+
+
+def test_vector_db_uses_cache(vector_db, fake_embedder):
+    vector_db.add_documents("web", [("a", "same text", {"i": 1})])
+    vector_db.upsert_documents("web", [("a", "same text", {"i": 2}), ("b", "same text", {"i": 3})])
+    assert fake_embedder.texts == 1
+    assert vector_db.query("same text", top_k=1)[0]["content"] == "same text"
+    assert fake_embedder.texts == 1
@@ -14,3 +14,62 @@ def test_add_and_check_new_content():
         assert store.is_new(content) is False  # already exists
     finally:
         os.remove(path)
+
+def test_is_changed_many_batches_and_persists(tmp_path):
+    path = str(tmp_path / "hashes.db")
+    with HashStore(path) as store:
+        flags = store.is_changed_many([("a", "1", None), ("b", "2", None), ("a", "1", None)])
+        assert flags == [True, True, False]
+        assert store.is_changed_many([("a", "1", None), ("b", "3", None)]) == [False, True]
+
+    # a fresh connection sees the committed hashes
+    with HashStore(path, cache_size=0) as store:
+        assert store.is_changed_many([("a", "1", None), ("b", "3", None)]) == [False, False]
+        assert store.get("missing") is None
+
+def test_memory_front_skips_sqlite(tmp_path):
+    path = str(tmp_path / "hashes.db")
+    with HashStore(path) as store:
+        store.set_many((f"k{i}", f"h{i}", None) for i in range(10))
+
+    with HashStore(path, cache_size=5) as store:
+        assert store.warm() == 5
+        statements = []
+        store._conn.set_trace_callback(statements.append)
+        cached = list(store._cache)
+        assert store.get_many(cached) == {k: "h" + k[1:] for k in cached}
+        assert statements == ["PRAGMA data_version"]  # no table reads
+
+
+def test_memory_front_is_dropped_when_another_connection_writes(tmp_path):
+    path = str(tmp_path / "hashes.db")
+    with HashStore(path) as reader, HashStore(path) as writer:
+        reader.set("k", "old")
+        assert reader.get("k") == "old"
+        writer.set("k", "new")
+        assert reader.get("k") == "new"
+        assert reader.check_many([("k", "content", None)])[0] is not None
+
+def test_changed_files_uses_stat_then_content(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("alpha")
+    b.write_text("beta")
+    with HashStore(str(tmp_path / "hashes.db")) as store:
+        changed = store.changed_files([str(a), str(b), str(tmp_path / "missing.txt")])
+        assert sorted(changed) == [str(a), str(b)]
+        assert changed[str(a)]["previous"] is None
+        for fp in changed.values():
+            store.record_file(fp, ["document-x"])
+        assert store.changed_files([str(a), str(b)]) == {}
+
+        # Touched but identical: unchanged, and the new mtime is remembered
+        os.utime(a, ns=(1, 1))
+        assert store.changed_files([str(a)]) == {}
+        assert store.changed_files([str(a)]) == {}
+
+        b.write_text("beta v2")
+        changed = store.changed_files([str(a), str(b)])
+        assert list(changed) == [str(b)]
+        assert changed[str(b)]["previous"]["chunks"] == ["document-x"]
+
+        assert sorted(store.changed_files([str(a), str(b)], force=True)) == [str(a), str(b)]
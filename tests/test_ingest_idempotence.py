@@ -1,3 +1,4 @@
+import os
 import pytest
 from app.vector_db import VectorDBClient
 from app.hashstore import HashStore
@@ -26,3 +27,136 @@ def test_idempotent_ingestion(tmp_path):
         store.add(content)
 
     assert len(vdb.data) == 1
+
+
+def test_ingest_documents_skips_unchanged_files(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest opens ./vector_store on import
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+    parsed = []
+    real_load_files = ingest.load_files
+    monkeypatch.setattr(ingest, "load_files", lambda files, **kw: parsed.extend(files) or real_load_files(files, **kw))
+
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "a.txt").write_text("invoice approval workflow for vendors " * 20)
+    (docs_dir / "b.txt").write_text("payment terms and delivery dates")
+
+    assert len(ingest.ingest_document(str(docs_dir), workers=1)) == 2
+    assert sorted(os.path.basename(p) for p in parsed) == ["a.txt", "b.txt"]
+
+    parsed.clear()
+    assert ingest.ingest_document(str(docs_dir), workers=1) == []
+    assert parsed == []  # nothing re-parsed
+
+    # A changed file is re-parsed alone and its old chunks are replaced
+    (docs_dir / "b.txt").write_text("payment terms changed to net sixty days, see appendix")
+    docs = ingest.ingest_document(str(docs_dir), workers=1)
+    assert [os.path.basename(p) for p in parsed] == ["b.txt"]
+    assert [chunk for _, chunk in docs] == ["payment terms changed to net sixty days, see appendix"]
+    assert vector_db.count() == 2  # b's previous chunk was deleted
+
+
+def test_ingest_artifacts_records_hashes_after_the_write(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest_utils opens ./vector_store on import
+    import hashstore
+    import ingest_utils
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest_utils, "db", vector_db)
+    artifacts = [({"id": f"T-{i}", "content": f"story {i}"}, {"source": "jira"}, f"T-{i}") for i in range(3)]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("store unavailable")
+
+    real_upsert = vector_db.upsert_documents
+    monkeypatch.setattr(vector_db, "upsert_documents", fail)
+    with pytest.raises(RuntimeError):
+        ingest_utils.ingest_artifacts("jira", artifacts)
+
+    # The failed chunk was not marked as stored, so a retry writes it
+    monkeypatch.setattr(vector_db, "upsert_documents", real_upsert)
+    assert [r["status"] for r in ingest_utils.ingest_artifacts("jira", artifacts)] == ["updated"] * 3
+    assert vector_db.count() == 3
+    assert [r["status"] for r in ingest_utils.ingest_artifacts("jira", artifacts)] == ["skipped"] * 3
+
+
+def test_changed_file_keeps_other_files_chunks(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+
+    # Chunks of equal length in different files must not share an id
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("invoice approval")
+    b.write_text("payment termsxyz")
+    assert len(ingest.ingest_documents([str(a), str(b)], workers=1)) == 2
+    assert vector_db.count() == 2
+
+    a.write_text("invoice approval for vendors")
+    assert len(ingest.ingest_documents([str(a), str(b)], workers=1)) == 1
+    assert vector_db.count() == 2
+    stored = {doc["id"] for doc in vector_db.iter_documents(include=())}
+    assert any(doc_id.startswith(f"document-{b}::") for doc_id in stored)
+
+
+def test_document_chunks_store_their_text(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+    doc = tmp_path / "orders.txt"
+    doc.write_text("purchase order PO-1234 awaits approval")
+    ingest.ingest_documents([str(doc)], workers=1)
+
+    hits = vector_db.hybrid_query("PO-1234")
+    assert [hit["content"] for hit in hits] == ["purchase order PO-1234 awaits approval"]
+    assert vector_db.count_where(artifact_type="document") == 1
+
+
+def test_ingest_documents_reports_each_file_once_stored(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+    paths = []
+    for name, words in (("a.txt", 900), ("b.txt", 5), ("c.txt", 5)):
+        (tmp_path / name).write_text(" ".join(f"{name}{j}" for j in range(words)))
+        paths.append(str(tmp_path / name))
+    ingest.ingest_documents(paths[2:], workers=1)  # c.txt is stored already
+
+    reports = []
+    on_file = lambda path, chunks: reports.append((os.path.basename(path), chunks, vector_db.count()))
+    docs = ingest.ingest_documents(paths, workers=1, on_file=on_file)
+
+    assert sorted(name for name, _, _ in reports) == ["a.txt", "b.txt", "c.txt"]
+    assert sum(chunks for _, chunks, _ in reports) == len(docs)
+    stored = {name: count for name, _, count in reports}
+    a_chunks = next(chunks for name, chunks, _ in reports if name == "a.txt")
+    assert stored["c.txt"] == 1  # unchanged, reported before any parse
+    assert stored["a.txt"] >= 1 + a_chunks  # its chunks were written before the report
+
+
+def test_file_whose_chunks_were_deleted_is_ingested_again(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)
+    import hashstore
+    import ingest
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest, "db", vector_db)
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("invoice approval workflow")
+    b.write_text("payment terms and delivery dates")
+    assert len(ingest.ingest_documents([str(a), str(b)], workers=1)) == 2
+
+    # An admin deletes a's chunks; re-uploading the same bytes restores them
+    vector_db.delete_where(ids=[doc["id"] for doc in vector_db.iter_documents(include=())
+                                if doc["id"].startswith(f"document-{a}::")])
+    docs = ingest.ingest_documents([str(a), str(b)], workers=1)
+    assert [chunk for _, chunk in docs] == ["invoice approval workflow"]
+    assert vector_db.count() == 2
+    assert ingest.ingest_documents([str(a), str(b)], workers=1) == []
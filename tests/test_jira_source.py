@@ -0,0 +1,82 @@
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from app.sources.jira import incremental_jql, iter_jira_issues, parse_jira_datetime
+
+ISSUES = [{"key": f"TEST-{i}", "fields": {"summary": f"story {i}", "updated": f"2024-01-01T10:{i:02d}:00.000+0000"}}
+          for i in range(23)]
+
+
+@pytest.fixture
+def jira():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            requests_seen.append(params)
+            start, size = int(params["startAt"]), min(int(params["maxResults"]), 5)  # server caps page size
+            body = json.dumps({"total": len(ISSUES), "issues": ISSUES[start:start + size]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_iter_jira_issues_fetches_all_pages_in_order(jira):
+    base_url, seen = jira
+    issues = list(iter_jira_issues("project=TEST", max_results=50, max_workers=3,
+                                   session=requests.Session(), base_url=base_url))
+
+    assert [i["key"] for i in issues] == [i["key"] for i in ISSUES]
+    assert sorted(int(p["startAt"]) for p in seen) == [0, 5, 10, 15, 20]
+    assert "updated" in seen[0]["fields"]
+
+
+def test_incremental_jql_rewrites_before_order_by():
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    since = parse_jira_datetime("2024-01-01T11:30:10.000+0000")
+
+    assert incremental_jql("project=TEST ORDER BY created DESC", since, now=now, overlap_minutes=1) == \
+        "(project=TEST) AND updated >= -31m ORDER BY created DESC"
+    # The default overlap covers clock skew between this host and Jira
+    assert incremental_jql("", since, now=now) == "updated >= -40m"
+
+
+def test_incremental_ingest_persists_the_watermark(jira, tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest opens ./vector_store on import
+    import hashstore
+    import ingest
+    import ingest_utils
+    base_url, seen = jira
+    monkeypatch.setattr(hashstore, "_default_store", hashstore.HashStore(str(tmp_path / "hashes.db")))
+    monkeypatch.setattr(ingest_utils, "db", vector_db)
+    monkeypatch.setattr(ingest, "iter_jira_issues",
+                        lambda jql: iter_jira_issues(jql, session=requests.Session(), base_url=base_url))
+
+    assert len(ingest.ingest_jira("project=TEST", incremental=True)) == 23
+    assert seen[0]["jql"] == "project=TEST"  # no watermark yet: full sync
+    assert hashstore.get_hash("jira-watermark::project=TEST") == "2024-01-01T10:22:00+00:00"
+
+    seen.clear()
+    results = ingest.ingest_jira("project=TEST", incremental=True)
+    assert seen[0]["jql"].startswith("(project=TEST) AND updated >= -")
+    assert len(results) == 23 and vector_db.count() == 23  # the stub ignores the filter; hashes skip repeats
+    assert hashstore.get_hash("jira-watermark::project=TEST") == "2024-01-01T10:22:00+00:00"
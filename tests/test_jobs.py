@@ -0,0 +1,169 @@
+import sys
+import time
+import types
+
+import pytest
+
+import jobs
+from jobs import JobQueue, run_job, run_worker
+from metrics import METRICS
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"))
+    yield q
+    q.close()
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def test_submit_claim_finish(queue, monkeypatch):
+    def fake(params, ctx):
+        METRICS.observe("store_write", 0.01, items=params["n"])
+        METRICS.incr("artifacts_skipped", 2)
+        return {"ok": True}
+
+    monkeypatch.setitem(jobs.HANDLERS, "fake", fake)
+    job_id = queue.submit("fake", {"n": 5})
+    assert queue.get(job_id)["status"] == "queued"
+
+    job = queue.claim("w1")
+    assert job["id"] == job_id and job["status"] == "running" and job["attempts"] == 1
+    assert queue.claim("w2") is None  # nothing else to take
+
+    run_job(queue, job, "w1", heartbeat_seconds=60)
+    done = queue.get(job_id)
+    assert done["status"] == "done" and done["result"] == {"ok": True}
+    assert done["items"] == 5 and done["skipped"] == 2
+
+    # The worker's observations land in the queue and are drained from the process
+    [raw] = queue.worker_metrics()
+    assert raw["stages"]["store_write"][2] == 5
+    assert METRICS.snapshot()["stages"] == {}
+
+
+def test_unknown_kind_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nope", {})
+
+
+def test_failed_handler_records_error(queue, monkeypatch):
+    def boom(params, ctx):
+        raise RuntimeError("store offline")
+
+    monkeypatch.setitem(jobs.HANDLERS, "boom", boom)
+    job_id = queue.submit("boom", {})
+    run_job(queue, queue.claim("w1"), "w1", heartbeat_seconds=60)
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and "store offline" in job["error"]
+
+
+def test_cancel_only_queued(queue, monkeypatch):
+    monkeypatch.setitem(jobs.HANDLERS, "fake", lambda params, ctx: {})
+    first = queue.submit("fake", {})
+    second = queue.submit("fake", {})
+    queue.claim("w1")  # first is running now
+    assert not queue.cancel(first)
+    assert queue.cancel(second)
+    assert queue.get(second)["status"] == "cancelled"
+    assert queue.claim("w2") is None
+
+
+def test_stale_job_is_reclaimed_with_checkpoint(queue, monkeypatch):
+    monkeypatch.setitem(jobs.HANDLERS, "fake", lambda params, ctx: {})
+    job_id = queue.submit("fake", {})
+    job = queue.claim("dead-worker")
+    assert queue.heartbeat(job_id, "dead-worker", checkpoint={"done": ["a"]}, items=7)
+
+    # Still fresh: not up for grabs
+    assert queue.claim("w2", stale_after=60) is None
+
+    time.sleep(0.02)
+    again = queue.claim("w2", stale_after=0.01)
+    assert again["id"] == job["id"] and again["worker"] == "w2" and again["attempts"] == 2
+    assert again["checkpoint"] == {"done": ["a"]} and again["items"] == 7
+    # The old worker no longer owns it
+    assert not queue.heartbeat(job_id, "dead-worker", items=8)
+
+
+def test_orphan_fails_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setitem(jobs.HANDLERS, "fake", lambda params, ctx: {})
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 2)
+    job_id = queue.submit("fake", {})
+    queue.claim("w1")
+    time.sleep(0.02)
+    queue.claim("w2", stale_after=0.01)
+    time.sleep(0.02)
+    assert queue.claim("w3", stale_after=0.01) is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "worker lost"
+
+
+def test_run_worker_once_drains_queue(queue, monkeypatch):
+    seen = []
+    monkeypatch.setitem(jobs.HANDLERS, "fake", lambda params, ctx: seen.append(params["i"]) or {})
+    ids = [queue.submit("fake", {"i": i}) for i in range(3)]
+    run_worker(queue.path, once=True)
+    assert seen == [0, 1, 2]
+    assert [queue.get(i)["status"] for i in ids] == ["done"] * 3
+
+
+def test_documents_job_resumes_from_checkpoint(queue, monkeypatch):
+    ingested = []
+    fake_ingest = types.ModuleType("ingest")
+
+    def ingest_documents(paths, workers=1, on_file=None):
+        ingested.append(list(paths))
+        for path in paths:
+            on_file(path, 1)
+        return ["chunk"] * len(paths)
+
+    fake_ingest.ingest_documents = ingest_documents
+    monkeypatch.setitem(sys.modules, "ingest", fake_ingest)
+
+    job_id = queue.submit("documents", {"paths": ["a.pdf", "b.pdf", "c.pdf"], "workers": 1})
+    job = queue.claim("w1")
+    # A previous attempt finished a.pdf before its worker died
+    queue.heartbeat(job_id, "w1", checkpoint={"done": ["a.pdf"], "chunks": 1}, steps_done=1)
+    run_job(queue, queue.get(job_id), "w1", heartbeat_seconds=60)
+
+    assert ingested == [["b.pdf", "c.pdf"]]  # one pass, so one parse pool
+    done = queue.get(job_id)
+    assert done["status"] == "done" and done["result"] == {"files": 3, "chunks": 3}
+    assert done["steps_done"] == 3 and done["steps_total"] == 3
+    assert done["checkpoint"]["done"] == ["a.pdf", "b.pdf", "c.pdf"]
+    assert job["id"] == job_id
+
+
+def test_lexical_index_job_rebuilds_the_store_index(queue, monkeypatch, vector_db):
+    fake_ingest = types.ModuleType("ingest")
+    fake_ingest.db = vector_db
+    monkeypatch.setitem(sys.modules, "ingest", fake_ingest)
+    vector_db.collection.add(ids=["web-p1"], documents=["invoice approval"],
+                             embeddings=vector_db.embedder(["invoice approval"]))
+    assert vector_db.needs_lexical_rebuild()
+
+    job_id = queue.submit("lexical_index", {})
+    run_job(queue, queue.claim("w1"), "w1", heartbeat_seconds=60)
+    assert queue.get(job_id)["result"] == {"documents": 1}
+    assert vector_db.lexical.lookup("invoice") == ["web-p1"]
+
+
+def test_legacy_stamp_job_stamps_once(queue, monkeypatch, vector_db):
+    fake_ingest = types.ModuleType("ingest")
+    fake_ingest.db = vector_db
+    monkeypatch.setitem(sys.modules, "ingest", fake_ingest)
+    vector_db.collection.add(ids=["jira-OLD-1"], documents=["old story"],
+                             embeddings=vector_db.embedder(["old story"]), metadatas=[{"project": "A"}])
+
+    job_id = queue.submit("legacy_stamp", {})
+    run_job(queue, queue.claim("w1"), "w1", heartbeat_seconds=60)
+    assert queue.get(job_id)["result"] == {"documents": 1}
+    assert not vector_db.needs_legacy_stamp()
+    assert vector_db.delete_where(source="jira") == 1
@@ -0,0 +1,35 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.json_stream import JSONArrayStreamParser, iter_json_array
+from app.llm_cache import LLMResponseCache
+from app.test_case_generator import TestCaseGenerator
+
+OUTPUT = '```json\n[{"id": 1, "title": "a } tricky \\" title", "steps": ["x", "y"]},\n {"id": 2, "title": "b", "steps": []}]\n```'
+
+
+class StubDB:
+    def hybrid_query(self, query, top_k=3):
+        return []
+
+
+def test_parser_yields_each_object_when_its_brace_closes():
+    parser = JSONArrayStreamParser()
+    emitted = [(i, item["id"]) for i, ch in enumerate(OUTPUT) for item in parser.feed(ch)]
+
+    assert [item_id for _, item_id in emitted] == [1, 2]
+    assert OUTPUT[emitted[0][0]] == "}"  # first case emitted before the rest arrived
+    assert parser.done and parser.errors == 0
+
+
+def test_truncated_output_keeps_completed_cases():
+    truncated = OUTPUT[:OUTPUT.index('"b"')]
+    assert [c["id"] for c in iter_json_array([truncated])] == [1]
+
+
+def test_stream_test_cases_with_fake_model(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm.db"))
+    llm = FakeListChatModel(responses=[OUTPUT[:-25]])  # cut inside the second case
+    tcg = TestCaseGenerator(StubDB(), llm=llm, cache=cache)
+
+    assert [c["id"] for c in tcg.stream_test_cases("story")] == [1]
+    assert [c["id"] for c in tcg.generate_test_cases("story")] == [1]
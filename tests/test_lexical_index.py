@@ -0,0 +1,105 @@
+import sys
+from app.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("Click Save on PO-123 invoice_number") == [
+        "click", "save", "on", "po-123", "po", "123", "invoice_number", "invoice", "number"]
+
+
+def test_bm25_ranks_and_updates_incrementally(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lex.db"))
+    index.upsert_many([
+        ("a", "create purchase order in procurement"),
+        ("b", "approve invoice payable"),
+        ("c", "purchase order purchase order approval"),
+    ])
+    assert [doc_id for doc_id, _ in index.search("purchase order")][:2] == ["c", "a"]
+
+    index.upsert_many([("c", "nothing relevant")])
+    index.upsert_many([("a", "ignored")], replace=False)
+    assert [doc_id for doc_id, _ in index.search("purchase order")] == ["a"]
+
+    index.delete(["a"])
+    assert index.search("purchase") == []
+    assert len(index) == 2
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]])
+    assert fused[0][0] == "y"
+    assert {doc_id for doc_id, _ in fused} == {"x", "y", "z", "w"}
+
+
+def test_hybrid_query_finds_exact_keys_without_embedding(vector_db, fake_embedder):
+    vector_db.add_documents("jira", [
+        ("GEN-101", "GEN-101 supplier onboarding form", {}),
+        ("GEN-102", "GEN-102 payment terms screen", {}),
+    ])
+    embeds = fake_embedder.calls
+
+    assert [d["id"] for d in vector_db.hybrid_query("GEN-102", top_k=1)] == ["jira-GEN-102"]
+    assert fake_embedder.calls == embeds
+
+    assert vector_db.hybrid_query("payment terms", top_k=1)[0]["id"] == "jira-GEN-102"
+    vector_db.delete_where(ids=["jira-GEN-102"])
+    assert "jira-GEN-102" not in [d["id"] for d in vector_db.hybrid_query("GEN-102")]
+
+
+def test_hybrid_query_key_missing_from_lexical_index_falls_back_to_fusion(vector_db):
+    vector_db.add_documents("jira", [("GEN-7", "ticket GEN 7: invoice approval", {})])
+    assert [d["id"] for d in vector_db.hybrid_query("GEN-7")] == ["jira-GEN-7"]
+
+
+def test_rebuild_lexical_index(vector_db):
+    vector_db.add_documents("web", [("p1", "Invoice approval workflow", {})])
+    vector_db.lexical.clear()
+    assert vector_db.rebuild_lexical_index() == 1
+    assert vector_db.lexical.lookup("invoice") == ["web-p1"]
+
+
+def test_store_without_lexical_index_falls_back_until_rebuilt(vector_db, fake_embedder):
+    # Written before the index existed: only Chroma has it
+    vector_db.collection.add(ids=["jira-GEN-7"], documents=["GEN-7 invoice approval"],
+                             embeddings=vector_db.embedder(["GEN-7 invoice approval"]))
+    assert vector_db.needs_lexical_rebuild()
+    assert [d["id"] for d in vector_db.hybrid_query("GEN-7")] == ["jira-GEN-7"]
+    assert len(vector_db.lexical) == 0  # a query never runs the collection scan
+
+    vector_db.rebuild_lexical_index()
+    assert not vector_db.needs_lexical_rebuild()
+    embeds = fake_embedder.calls
+    assert [d["id"] for d in vector_db.hybrid_query("GEN-7")] == ["jira-GEN-7"]
+    assert fake_embedder.calls == embeds
+
+
+def test_search_skips_stopwords_and_caps_postings(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lex.db"))
+    index.upsert_many([(f"d{i}", "the invoice " + "approval " * (i % 5)) for i in range(50)])
+    assert index.search("the") != []  # a query of stopwords alone still runs
+    with_stopword = index.search("the approval", top_k=50)
+    assert with_stopword == index.search("approval", top_k=50)
+    # Only the documents where the term is most frequent are scored
+    capped = index.search("approval", top_k=50, max_postings=10)
+    assert len(capped) == 10 and {doc_id for doc_id, _ in capped} == {f"d{i}" for i in range(4, 50, 5)}
+
+
+def test_collection_stats_follow_other_connections(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lex.db"))
+    index.upsert_many([("a", "purchase order")])
+    assert len(index) == 1
+    LexicalIndex(str(tmp_path / "lex.db")).upsert_many([("b", "invoice")])
+    assert len(index) == 2
+
+
+def test_hybrid_results_are_cached_per_rrf_k(vector_db, monkeypatch):
+    vector_db.add_documents("web", [("p1", "invoice approval", {}), ("p2", "approval workflow", {})])
+    vector_db_module = sys.modules[type(vector_db).__module__]
+    seen = []
+    real = vector_db_module.reciprocal_rank_fusion
+    monkeypatch.setattr(vector_db_module, "reciprocal_rank_fusion",
+                        lambda rankings, k: seen.append(k) or real(rankings, k=k))
+    vector_db.hybrid_query("invoice approval", rrf_k=60)
+    vector_db.hybrid_query("invoice approval", rrf_k=60)
+    vector_db.hybrid_query("invoice approval", rrf_k=1)
+    assert seen == [60, 1]
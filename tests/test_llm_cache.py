@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.llm_cache import LLMResponseCache
+from app.test_case_generator import TestCaseGenerator
+
+CASES = '[{"id": 1, "title": "Login", "steps": ["open"], "expected": "ok"}]'
+
+
+class StubDB:
+    def hybrid_query(self, query, top_k=3):
+        return [{"id": "jira-TEST-1", "content": "context"}]
+
+
+class CountingChatModel(FakeListChatModel):
+    calls: int = 0
+    delay: float = 0.0
+
+    def invoke(self, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return super().invoke(*args, **kwargs)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(path=str(tmp_path / "llm.db"))
+
+
+def test_repeated_story_is_served_from_cache(cache):
+    llm = CountingChatModel(responses=[f"```json\n{CASES}\n```"])
+    tcg = TestCaseGenerator(StubDB(), llm=llm, cache=cache)
+
+    first = tcg.generate_test_cases("As a user I can log in")
+    second = TestCaseGenerator(StubDB(), llm=llm, cache=cache).generate_test_cases("As a user I can log in")
+
+    assert first == second == [{"id": 1, "title": "Login", "steps": ["open"], "expected": "ok"}]
+    assert llm.calls == 1
+    tcg.generate_test_cases("A different story")
+    assert llm.calls == 2
+
+
+def test_concurrent_identical_requests_share_one_call(cache):
+    llm = CountingChatModel(responses=[CASES], delay=0.3)
+    results = []
+
+    def run():
+        results.append(TestCaseGenerator(StubDB(), llm=llm, cache=cache).generate_test_cases("story"))
+
+    threads = [threading.Thread(target=run) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert llm.calls == 1
+    assert len(results) == 5 and all(r == results[0] for r in results)
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm.db"), ttl_seconds=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+
+    cache._conn.execute("UPDATE responses SET created = created - 120 WHERE key='c'")
+    assert cache.get("c") is None
+
+
+def test_unparseable_output_is_not_cached(cache):
+    llm = CountingChatModel(responses=['[{"id": 1, "title": "cut', CASES])
+    tcg = TestCaseGenerator(StubDB(), llm=llm, cache=cache)
+
+    assert tcg.generate_test_cases("story") == '[{"id": 1, "title": "cut'
+    assert tcg.generate_test_cases("story") == [{"id": 1, "title": "Login", "steps": ["open"], "expected": "ok"}]
+    assert tcg.generate_test_cases("story")[0]["id"] == 1
+    assert llm.calls == 2
+
+
+def test_leader_rechecks_cache_after_claiming(cache, monkeypatch):
+    real_get = cache.get
+    lookups = []
+
+    def get(key):
+        # The first lookup misses; another leader stores the value before this one claims the key
+        lookups.append(key)
+        if len(lookups) == 1:
+            cache.set(key, "stored")
+            return None
+        return real_get(key)
+
+    monkeypatch.setattr(cache, "get", get)
+    assert cache.get_or_compute("k", lambda: pytest.fail("computed twice")) == "stored"
+    assert cache.hits == 1 and cache.misses == 0
+
+
+class CountingStreamModel(FakeListChatModel):
+    calls: int = 0
+    delay: float = 0.0
+
+    def stream(self, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return super().stream(*args, **kwargs)
+
+
+def test_streamed_requests_share_one_call_and_the_cache(cache):
+    llm = CountingStreamModel(responses=[CASES], delay=0.3)
+    results = []
+
+    def run():
+        results.append(list(TestCaseGenerator(StubDB(), llm=llm, cache=cache).stream_test_cases("story")))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert llm.calls == 1
+    assert results == [[{"id": 1, "title": "Login", "steps": ["open"], "expected": "ok"}]] * 4
+    # The finished stream was stored: both paths replay it
+    tcg = TestCaseGenerator(StubDB(), llm=llm, cache=cache)
+    assert list(tcg.stream_test_cases("story")) == results[0]
+    assert tcg.generate_test_cases("story") == results[0]
+    assert llm.calls == 1
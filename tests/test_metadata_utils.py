@@ -1,6 +1,6 @@
 # test_metadata_utils.py
 import pytest
-from app.metadata_utils import sanitize_events, canonicalize_for_hash, compute_sha256, prepare_artifact_and_metadata_for_ingest
+from app.metadata_utils import sanitize_events, canonicalize_for_hash, canonical_sha256, compute_sha256, prepare_artifact_and_metadata_for_ingest
 
 def sample_events():
     return [
@@ -31,5 +31,28 @@ def test_doc_id_contains_flow_name():
     artifact, metadata, doc_id = prepare_artifact_and_metadata_for_ingest(evs, flow_name="login_flow", user="tester")
     assert "login_flow" in doc_id
 
+def test_streaming_hash_matches_canonical_json():
+    steps = [{"type": "click", "selector": f"#b{i}", "text": "Säve \"now\"\n", "value": None, "empty": "",
+              "n": i, "ratio": i / 3, "flag": i % 2 == 0, "nested": {"z": [], "a": {"x": None}},
+              "pair": ("t", {"kept": None})} for i in range(300)]
+    artifacts = [
+        {"flow_name": "long", "steps": steps, "url": None, "meta": {"recorded_by": "tester"}},
+        {"outer": {"inner": [[1, None, ""]] * 100, "drop": None}, "b": [{}] * 70},
+        {1: "int key", 2.5: [None] * 70, 3: ""},
+        [{"x": None}] * 200,
+        {"only_none": None},
+        [],
+        "plain string",
+    ]
+    for artifact in artifacts:
+        assert canonical_sha256(artifact) == compute_sha256(canonicalize_for_hash(artifact))
+
+def test_prepare_uses_same_hash_as_before():
+    evs = sample_events() * 50
+    artifact, metadata, doc_id = prepare_artifact_and_metadata_for_ingest(evs, flow_name="long", user="tester")
+    h = compute_sha256(canonicalize_for_hash(artifact))
+    assert metadata["hash"] == h
+    assert doc_id == f"flow::long::{h[:8]}"
+
 if __name__ == "__main__":
     pytest.main(["-q"])
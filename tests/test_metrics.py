@@ -0,0 +1,69 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from metrics import METRICS, Metrics
+from app.llm_cache import LLMResponseCache
+from app.test_case_generator import TestCaseGenerator
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def test_snapshot_percentiles_and_throughput():
+    m = Metrics()
+    for ms in range(1, 101):
+        m.observe("embed", ms / 1000, items=10)
+    m.incr("artifacts_skipped", 3)
+
+    snap = m.snapshot()
+    embed = snap["stages"]["embed"]
+    assert embed["count"] == 100 and embed["items"] == 1000
+    assert embed["p50_s"] == pytest.approx(0.050, abs=0.002)
+    assert embed["p95_s"] == pytest.approx(0.095, abs=0.002)
+    assert embed["items_per_s"] == pytest.approx(1000 / 5.05, rel=0.01)
+    assert snap["counters"] == {"artifacts_skipped": 3}
+
+    text = m.to_prometheus()
+    assert 'testgen_stage_seconds{stage="embed",quantile="0.95"}' in text
+    assert "testgen_artifacts_skipped_total 3" in text
+
+
+def test_drain_and_merge_carry_worker_observations():
+    worker, parent = Metrics(), Metrics()
+    with worker.timer("parse") as ctx:
+        ctx["items"] = 4
+    worker.incr("pages", 2)
+    parent.merge(worker.drain())
+    assert worker.snapshot() == {"stages": {}, "counters": {}}
+    assert parent.snapshot()["stages"]["parse"]["items"] == 4
+    assert parent.snapshot()["counters"] == {"pages": 2}
+
+
+def test_vector_db_writes_and_queries_are_timed(vector_db):
+    vector_db.add_documents("document", [(f"d{i}", f"text {i}", {"i": i}) for i in range(5)])
+    vector_db.hybrid_query("text 3", top_k=2)
+
+    stages = METRICS.snapshot()["stages"]
+    assert stages["embed"]["items"] == 5 and stages["store_write"]["items"] == 5
+    assert stages["hybrid_query"]["count"] == 1 and stages["query"]["count"] == 1
+
+
+class StubDB:
+    def hybrid_query(self, query, top_k=3):
+        return [{"id": "jira-TEST-1", "content": "context"}]
+
+
+def test_generator_records_retrieval_and_llm(tmp_path):
+    llm = FakeListChatModel(responses=['[{"id": 1}, {"id": 2}]'])
+    tcg = TestCaseGenerator(StubDB(), llm=llm, cache=LLMResponseCache(path=str(tmp_path / "llm.db")))
+    tcg.generate_test_cases("story")
+    assert list(tcg.stream_test_cases("other story")) == [{"id": 1}, {"id": 2}]
+
+    stages = METRICS.snapshot()["stages"]
+    assert stages["retrieval"]["count"] == 2
+    assert stages["llm"]["count"] == 2
+    assert stages["llm_first_case"]["count"] == 1
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from metrics import METRICS
+from near_duplicates import NearDuplicateFilter, NearDuplicateIndex, minhash, similarity
+
+WORDS = ("invoice purchase order vendor approval workflow supplier payment terms delivery contract "
+         "amendment budget requisition receipt ledger tax currency region audit").split()
+
+
+def text(seed: int, n: int = 200) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(50)) for _ in range(n))
+
+
+def edit(s: str, every: int = 40) -> str:
+    """Replace one word in `every`: a near-duplicate (Jaccard of 3-grams ~0.9)."""
+    words = s.split()
+    return " ".join("changed" if i % every == 0 else w for i, w in enumerate(words))
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def test_minhash_estimates_similarity():
+    a = text(1)
+    assert similarity(minhash(a), minhash(a)) == 1.0
+    assert similarity(minhash(a), minhash(edit(a))) > 0.8
+    assert similarity(minhash(a), minhash(text(2))) < 0.1
+    # Case and punctuation do not matter; short texts still get a signature
+    assert similarity(minhash("Save the Invoice!"), minhash("save the invoice")) == 1.0
+    assert minhash("").shape == minhash("one").shape
+
+
+def test_filter_skips_within_run_and_across_runs(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "nd.db"))
+    base = text(1)
+
+    run = NearDuplicateFilter(index)
+    assert run.duplicate_of("doc-a", base) is None
+    assert run.duplicate_of("doc-b", edit(base)) == "doc-a"
+    assert run.duplicate_of("doc-c", text(2)) is None
+    assert run.skipped == 1
+    assert len(index) == 0  # nothing persisted before commit
+    run.commit()
+    assert len(index) == 2 and index.links("doc-a") == ["doc-b"]
+    index.close()
+
+    # Persisted: a fresh process sees the earlier run
+    reopened = NearDuplicateIndex(str(tmp_path / "nd.db"))
+    run = NearDuplicateFilter(reopened)
+    assert run.duplicate_of("doc-d", edit(base, every=50)) == "doc-a"
+    # Re-ingesting a stored chunk under its own id is not a duplicate of itself
+    assert run.duplicate_of("doc-c", text(2)) is None
+    assert run.skipped == 1
+
+
+def test_deletes_drop_sketches(vector_db):
+    run = vector_db.near_duplicate_filter()
+    assert run.duplicate_of("docs-a", text(1)) is None
+    vector_db.add_documents("docs", [("a", text(1), {})])
+    run.commit()
+    assert len(vector_db.near_dups) == 1
+
+    vector_db.delete_document("docs-a")
+    assert len(vector_db.near_dups) == 0
+    assert vector_db.near_duplicate_filter().duplicate_of("docs-b", edit(text(1))) is None
+
+
+def test_document_ingest_skips_near_duplicates(tmp_path, monkeypatch, vector_db):
+    monkeypatch.chdir(tmp_path)  # ingest opens ./vector_store on import
+    import ingest
+    monkeypatch.setattr(ingest, "db", vector_db)
+
+    base = text(1)
+    chunks = [("c1", base, {"source": "manual.txt"}),
+              ("c2", edit(base) + " extra", {"source": "manual.txt"}),
+              ("c3", text(2, n=150), {"source": "manual.txt"})]
+    docs = ingest._ingest_document_chunks(iter(chunks))
+
+    assert len(docs) == 2
+    assert vector_db.count() == 2
+    assert METRICS.snapshot()["counters"]["near_duplicates_skipped"] == 1
+    assert METRICS.snapshot()["stages"]["embed"]["items"] == 2
+
+
+def test_upserted_chunk_replaces_its_signature(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "nd.db"))
+    run = NearDuplicateFilter(index)
+    assert run.duplicate_of("page-a", text(1)) is None
+    run.commit()
+
+    # Page A changes; its new text is indexed under the same id
+    run = NearDuplicateFilter(index)
+    assert run.duplicate_of("page-a", text(3)) is None
+    run.commit()
+    assert len(index) == 1
+
+    # A's old text is no longer stored anywhere, so page B holding it is kept
+    run = NearDuplicateFilter(index)
+    assert run.duplicate_of("page-b", text(1)) is None
+    assert run.duplicate_of("page-c", edit(text(3))) == "page-a"
+    run.commit()
+    assert sorted(r[0] for r in index._conn.execute("SELECT id FROM docs")) == ["page-a", "page-b"]
@@ -0,0 +1,87 @@
+from app.parse_playwright import _parse_statement, parse_playwright_code
+
+CODEGEN = """
+import { test, expect } from '@playwright/test';
+
+test('test', async ({ page }) => {
+  await page.goto('https://example.com/login');
+  await page.getByRole('textbox', { name: 'User Name' }).click();
+  await page.getByRole('textbox', { name: 'User Name' }).fill('alice');
+  await page.getByLabel('Country').selectOption('UK');
+  // await page.getByText('commented out').click();
+  await page
+    .getByRole('button', { name: 'Sign In' })
+    .click();
+  await page.getByRole('textbox', { name: 'Search' }).press('Enter');
+  await page.getByLabel('Remember me').check();
+  await page.frameLocator('#editor').getByText(/save (draft)/i).click();
+  await expect(page.getByText('Welcome')).toBeVisible();
+  await expect(page.getByLabel('Email')).not.toHaveValue('secret');
+  const page1Promise = page.waitForEvent('popup');
+  await page1.getByRole('link', { name: 'Help' }).click();
+});
+"""
+
+
+def test_single_line_steps_match_recorded_flow_format():
+    steps = parse_playwright_code(CODEGEN)
+    assert steps[:4] == [
+        {"action": "goto", "url": "https://example.com/login"},
+        {"action": "click", "selector": "await page.getByRole('textbox', { name: 'User Name' })"},
+        {"action": "fill", "selector": "await page.getByRole('textbox', { name: 'User Name' })",
+         "value": "<PLACEHOLDER>"},
+        {"action": "select_option", "selector": "await page.getByLabel('Country')", "value": "<PLACEHOLDER>"},
+    ]
+
+
+def test_multiline_chains_and_new_actions():
+    steps = parse_playwright_code(CODEGEN)[4:]
+    assert steps == [
+        {"action": "click", "selector": "await page.getByRole('button', { name: 'Sign In' })"},
+        {"action": "press", "selector": "await page.getByRole('textbox', { name: 'Search' })", "key": "Enter"},
+        {"action": "check", "selector": "await page.getByLabel('Remember me')"},
+        {"action": "click", "selector": "await page.frameLocator('#editor').getByText(/save (draft)/i)"},
+        {"action": "expect", "selector": "page.getByText('Welcome')", "assertion": "toBeVisible"},
+        {"action": "expect", "selector": "page.getByLabel('Email')", "assertion": "toHaveValue",
+         "negated": True, "expected": "<PLACEHOLDER>"},
+        {"action": "click", "selector": "await page1.getByRole('link', { name: 'Help' })"},
+    ]
+
+
+def test_actions_called_on_the_page_take_the_selector_argument():
+    code = """
+    await page.click('#old-api');
+    page.fill('#user', 'bob');
+    await page.press("input[name=q]", 'Enter');
+    await page.click();
+    """
+    assert parse_playwright_code(code) == [
+        {"action": "click", "selector": "#old-api"},
+        {"action": "fill", "selector": "#user", "value": "<PLACEHOLDER>"},
+        {"action": "press", "selector": "input[name=q]", "key": "Enter"},
+    ]
+
+
+def test_unterminated_input_keeps_complete_steps():
+    code = "await page.goto('https://example.com');\nawait page.getByRole('button', { name: 'x"
+    assert parse_playwright_code(code) == [{"action": "goto", "url": "https://example.com"}]
+    assert parse_playwright_code("await page.getByText('Save').click(") == [
+        {"action": "click", "selector": "await page.getByText('Save')"}]
+    assert parse_playwright_code("") == []
+
+
+def test_fast_path_matches_the_tokenizer():
+    lines = [
+        "await page.goto('https://example.com/a\\'b', { waitUntil: 'load' });",
+        "await page.getByRole('row', { name: 'x' }).nth(2).getByRole('cell').click({ button: 'right' });",
+        "await page.getByLabel('Tags').selectOption(['a', 'b']);",
+        "await page.getByText('Search').press('Control+A', { delay: 3 });",
+        "await page.getByText('Search').press(key);",
+        "page2.getByTitle(\"say \\\"hi\\\"\").check();",
+        "await page.keyboard.press('Enter');",
+        "await page.locator('div').filter({ has: page.getByText('y') }).click();",
+    ]
+    for line in lines:
+        assert parse_playwright_code(line) == [_parse_statement(line, 0)[0]], line
+    # A chain that continues on the next line is not taken as a single-line step
+    assert parse_playwright_code("await page.getByText('a').click()\n  .then(done);") == []
@@ -0,0 +1,155 @@
+import pytest
+from app.vector_db import _iter_batches
+
+
+def test_iter_batches_respects_count_and_chars():
+    docs = [(str(i), "x" * 10, {}) for i in range(7)]
+    assert [len(b) for b in _iter_batches(docs, batch_size=3, batch_chars=1000)] == [3, 3, 1]
+    assert [len(b) for b in _iter_batches(docs, batch_size=100, batch_chars=25)] == [2, 2, 2, 1]
+
+
+def test_add_documents_embeds_once_per_batch(vector_db, fake_embedder):
+    docs = ((f"c{i}", f"chunk number {i}", {"chunk_index": i}) for i in range(10))
+    sent = vector_db.add_documents("document", docs, batch_size=4)
+
+    assert sent == 10
+    assert fake_embedder.calls == 3
+    assert vector_db.collection.count() == 10
+    assert vector_db.collection.get(ids=["document-c3"])["documents"] == ["chunk number 3"]
+
+
+def test_upsert_documents_overwrites_and_dedupes(vector_db):
+    vector_db.add_documents("jira", [("K-1", "old", {"v": 1})])
+    vector_db.add_documents("jira", [("K-1", "ignored", {"v": 2})])
+    assert vector_db.collection.get(ids=["jira-K-1"])["documents"] == ["old"]
+
+    vector_db.upsert_documents("jira", [("K-1", "first", {"v": 3}), ("K-1", "new", {"v": 4})])
+    got = vector_db.collection.get(ids=["jira-K-1"])
+    assert got["documents"] == ["new"]
+    assert got["metadatas"][0]["v"] == 4
+    assert got["metadatas"][0]["ingest_source"] == "jira"
+
+
+def test_iter_documents_pages_past_batch_and_skips_contents(vector_db, fake_embedder):
+    vector_db.add_documents("web", ((f"p{i}", f"page {i}", {"i": i}) for i in range(25)))
+    calls_before = fake_embedder.calls
+
+    docs = list(vector_db.iter_documents(batch_size=10, include=("metadatas",)))
+
+    assert len(docs) == 25
+    assert len({d["id"] for d in docs}) == 25
+    assert all("content" not in d and "metadata" in d for d in docs)
+    assert vector_db.count() == 25
+    assert len(vector_db.list_all(limit=7)) == 7
+    assert fake_embedder.calls == calls_before  # scanning never embeds
+
+
+def test_list_page_fetches_one_filtered_page_with_previews(vector_db, fake_embedder):
+    vector_db.add_documents("web", ((f"p{i:02d}", f"page {i} " + "x" * 50, {"project": "A" if i % 2 else "B"})
+                                    for i in range(30)))
+    vector_db.add_documents("jira", [("TEST-1", "story", {"project": "A"})])
+    calls_before = fake_embedder.calls
+
+    assert vector_db.count_where() == 31
+    assert vector_db.count_where(source="web") == 30
+    assert vector_db.count_where(source="web", project="A") == 15
+
+    pages = [vector_db.list_page(offset=o, limit=10, source="web", preview_chars=20) for o in (0, 10, 20, 30)]
+    assert [len(p) for p in pages] == [10, 10, 10, 0]
+    ids = [d["id"] for p in pages for d in p]
+    assert len(set(ids)) == 30 and all(i.startswith("web-") for i in ids)
+    assert all(len(d["content"]) == 21 and d["content"].endswith("…") for p in pages for d in p)
+
+    only_a = vector_db.list_page(limit=50, project="A")
+    assert len(only_a) == 16 and all(d["metadata"]["project"] == "A" for d in only_a)
+    assert fake_embedder.calls == calls_before  # browsing never embeds
+
+
+def test_count_where_is_cached_until_a_write(vector_db, monkeypatch):
+    vector_db.add_documents("web", [(f"p{i}", f"page {i}", {"project": "A"}) for i in range(3)])
+    assert vector_db.count_where(source="web") == 3
+
+    scans = []
+    real_get = vector_db.collection.get
+    monkeypatch.setattr(vector_db.collection, "get", lambda **kw: scans.append(kw) or real_get(**kw))
+    assert vector_db.count_where(source="web") == 3
+    assert scans == []
+
+    vector_db.add_documents("web", [("p9", "page 9", {"project": "B"})])
+    assert vector_db.count_where(source="web") == 4
+    assert vector_db.count_where(source="web", project="B") == 1
+    assert len(scans) == 2
+
+
+def test_delete_where_pushes_predicates_down(vector_db):
+    vector_db.add_documents("website", ((f"w{i}", f"web {i}", {"artifact_type": "website_doc"}) for i in range(30)))
+    vector_db.add_documents("ui_flow", [("f1", "flow", {"source": "playwright-recorder", "flow_name": "login"}),
+                                        ("f2", "flow", {"source": "playwright-recorder", "flow_name": "po"})])
+
+    assert vector_db.delete_where(source="ui_flow", flow_name="login") == 1
+    assert vector_db.delete_where(source="website", batch_size=7) == 30
+    assert vector_db.delete_where(ids=["ui_flow-f2", "ui_flow-missing"]) == 1
+    assert vector_db.count() == 0
+
+
+def test_delete_where_source_matches_stamped_legacy_ids(vector_db):
+    # Written before ingest_source stamping: only the id prefix names the source
+    texts = ["old story", "old flow", "other"]
+    vector_db.collection.add(ids=["jira-OLD-1", "jira-OLD-2", "website-x"], documents=texts,
+                             embeddings=vector_db.embedder(texts),
+                             metadatas=[{"project": "A"}, {"project": "B"}, {"project": "A"}])
+    vector_db.add_documents("jira", [("NEW-1", "new story", {"project": "A"})])
+    assert vector_db.needs_legacy_stamp()
+    assert vector_db.stamp_legacy_documents() == 3
+    assert not vector_db.needs_legacy_stamp() and vector_db.stamp_legacy_documents() == 0
+
+    assert vector_db.collection.get(ids=["jira-OLD-2"])["metadatas"] == [{"project": "B", "ingest_source": "jira"}]
+    assert vector_db.delete_where(source="jira", project="A") == 2
+    assert vector_db.delete_where(source="jira") == 1
+    assert vector_db.collection.get(include=[])["ids"] == ["website-x"]
+
+
+def test_delete_where_by_ingestion_time(vector_db):
+    vector_db.add_documents("jira", [("K-1", "story", {"project": "TEST"})])
+    stamped = vector_db.collection.get(ids=["jira-K-1"])["metadatas"][0]["ingested_at"]
+
+    assert vector_db.delete_where(project="TEST", ingested_before=stamped) == 0
+    assert vector_db.delete_where(project="TEST", ingested_after=stamped) == 1
+
+
+def test_delete_where_requires_a_predicate(vector_db):
+    with pytest.raises(ValueError):
+        vector_db.delete_where()
+
+
+def test_query_cache_hits_until_a_write_bumps_the_version(vector_db, fake_embedder):
+    vector_db.add_documents("jira", [("K-1", "login story", {"project": "A"})])
+    first = vector_db.query("login", top_k=1)
+    embeds = fake_embedder.calls
+
+    assert vector_db.query("login", top_k=1) == first
+    assert fake_embedder.calls == embeds
+    stats = vector_db.cache_stats()
+    assert stats["result_hits"] == 1 and stats["result_misses"] == 1
+
+    version = stats["write_version"]
+    vector_db.upsert_documents("jira", [("K-2", "login again", {"project": "B"})])
+    assert vector_db.cache_stats()["write_version"] > version
+    assert len(vector_db.query("login", top_k=2)) == 2
+    assert vector_db.cache_stats()["embedding_hits"] == 1  # embedding survives writes
+
+    assert [d["id"] for d in vector_db.query("login", top_k=2, where={"project": "B"})] == ["jira-K-2"]
+    vector_db.delete_where(project="B")
+    assert vector_db.query("login", top_k=2, where={"project": "B"}) == []
+
+
+def test_query_cache_sees_writes_from_other_processes(vector_db, tmp_path):
+    from app.vector_db import QueryCache, WRITE_VERSION_FILE
+    vector_db.add_documents("jira", [("K-1", "login story", {})])
+    assert len(vector_db.query("login", top_k=5)) == 1
+
+    # Another process writes to the same store: its own cache instance bumps the shared version
+    vector_db.collection.add(ids=["jira-K-2"], documents=["login again"],
+                             embeddings=vector_db.embedder(["login again"]))
+    QueryCache(version_path=f"{vector_db.path}/{WRITE_VERSION_FILE}").bump()
+    assert len(vector_db.query("login", top_k=5)) == 2